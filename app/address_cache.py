@@ -0,0 +1,186 @@
+"""
+Created by Cameron Rogers
+"""
+import atexit
+import json
+import os
+import sqlite3
+import sys
+import threading
+from collections import OrderedDict
+from pathlib import Path
+
+DEFAULT_MAX_SIZE = 10000
+DEFAULT_MAX_STORE_SIZE = 500000
+# Addresses written to the store in one transaction, fewer are written by flush
+STORE_BATCH_SIZE = 1000
+APP_DATA_DIR_NAME = 'gc_tools'
+STORE_FILE_NAME = 'address_cache.sqlite3'
+
+
+def canonicalize_address(address: str):
+    """Returns the cache key of a raw address: upper case, no commas or periods, single spaces"""
+    return " ".join(address.upper().replace(',', ' ').replace('.', ' ').split())
+
+
+def default_data_dir():
+    """Returns the application's directory in the user's data directory"""
+    if sys.platform == 'win32':
+        data_dir = Path(os.environ.get('APPDATA', Path.home()))
+    elif sys.platform == 'darwin':
+        data_dir = Path.home() / 'Library' / 'Application Support'
+    else:
+        data_dir = Path(os.environ.get('XDG_DATA_HOME', Path.home() / '.local' / 'share'))
+    return data_dir / APP_DATA_DIR_NAME
+
+
+def default_store_path():
+    """Returns the path of the persistent cache in the user's data directory"""
+    return default_data_dir() / STORE_FILE_NAME
+
+
+class AddressCache:
+    """
+    Memoizes scourgify address normalization.
+
+    Results are kept in an in-memory LRU of at most max_size addresses and,
+    when a store_path is given, in a SQLite store that survives restarts and
+    keeps at most max_store_size addresses (oldest evicted first). New
+    addresses are written to the store STORE_BATCH_SIZE at a time, flush
+    writes the rest (the normalization pool flushes after each parse, close
+    and interpreter exit do too). Only successful normalizations are cached,
+    so unparseable addresses raise the original scourgify error every time.
+    """
+    def __init__(self, max_size=DEFAULT_MAX_SIZE, store_path=None,
+                 max_store_size=DEFAULT_MAX_STORE_SIZE):
+        self.max_size = max_size
+        self.max_store_size = max_store_size
+        self.hits = 0
+        self.misses = 0
+        self._memory = OrderedDict()
+        # Stored addresses not written to the store yet
+        self._unwritten = OrderedDict()
+        self._lock = threading.Lock()
+        self._connection = None
+        self._store_size = 0
+        if store_path is not None:
+            Path(store_path).parent.mkdir(parents=True, exist_ok=True)
+            self._connection = sqlite3.connect(str(store_path), check_same_thread=False)
+            self._connection.execute(
+                "CREATE TABLE IF NOT EXISTS addresses (key TEXT PRIMARY KEY, parsed TEXT NOT NULL)")
+            self._connection.commit()
+            self._store_size = self._count_store()
+            atexit.register(self.flush)
+
+    def __len__(self):
+        return len(self._memory)
+
+    def close(self):
+        with self._lock:
+            if self._connection is not None:
+                self._write_unwritten()
+                self._connection.close()
+                self._connection = None
+
+    def flush(self):
+        """Writes the addresses stored since the last write to the store"""
+        with self._lock:
+            self._write_unwritten()
+
+    def stats(self):
+        return {"hits": self.hits, "misses": self.misses, "size": len(self._memory)}
+
+    def lookup(self, address: str):
+        """Returns the cached normalized address or None"""
+        key = canonicalize_address(address)
+        with self._lock:
+            if key in self._memory:
+                self._memory.move_to_end(key)
+                self.hits += 1
+                return self._memory[key]
+            parsed = self._unwritten.get(key)
+            if parsed is None:
+                parsed = self._load(key)
+            if parsed is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._remember(key, parsed)
+            return parsed
+
+    def store(self, address: str, parsed: dict):
+        self.store_many([(address, parsed)])
+
+    def store_many(self, address_results):
+        """Caches a batch of (address, normalized address) pairs"""
+        rows = [(canonicalize_address(address), parsed) for address, parsed in address_results]
+        with self._lock:
+            for key, parsed in rows:
+                self._remember(key, parsed)
+            if self._connection is not None:
+                self._unwritten.update(rows)
+                if len(self._unwritten) >= STORE_BATCH_SIZE:
+                    self._write_unwritten()
+
+    def normalize(self, address: str):
+        """Normalizes an address with scourgify, reusing the cached result when there is one"""
+        parsed = self.lookup(address)
+        if parsed is None:
+            # scourgify is slow to import, it is only loaded once an address needs normalizing
+            from scourgify import normalize_address_record
+            parsed = normalize_address_record(address)
+            self.store(address, parsed)
+        return parsed
+
+    def _remember(self, key, parsed):
+        self._memory[key] = parsed
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_size:
+            self._memory.popitem(last=False)
+
+    def _load(self, key):
+        if self._connection is None:
+            return None
+        row = self._connection.execute(
+            "SELECT parsed FROM addresses WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            return None
+        return json.loads(row[0], object_pairs_hook=OrderedDict)
+
+    def _write_unwritten(self):
+        """Writes the unwritten addresses in one transaction, the lock must be held"""
+        if self._connection is None or not self._unwritten:
+            return
+        changes = self._connection.total_changes
+        # Normalization is deterministic, an address another process stored is already right
+        self._connection.executemany(
+            "INSERT OR IGNORE INTO addresses (key, parsed) VALUES (?, ?)",
+            [(key, json.dumps(parsed)) for key, parsed in self._unwritten.items()])
+        self._unwritten.clear()
+        self._store_size += self._connection.total_changes - changes
+        # The running size misses what other processes add, it is recounted before evicting
+        if self._store_size > self.max_store_size:
+            self._store_size = self._count_store()
+            if self._store_size > self.max_store_size:
+                self._connection.execute(
+                    "DELETE FROM addresses WHERE rowid IN "
+                    "(SELECT rowid FROM addresses ORDER BY rowid LIMIT ?)",
+                    (self._store_size - self.max_store_size,))
+                self._store_size = self.max_store_size
+        self._connection.commit()
+
+    def _count_store(self):
+        return self._connection.execute("SELECT COUNT(*) FROM addresses").fetchone()[0]
+
+
+_default_cache = AddressCache()
+
+
+def get_default_cache():
+    """Returns the cache shared by GratiCardEntry.parse_address and the normalization pool"""
+    return _default_cache
+
+
+def set_default_cache(cache: AddressCache):
+    global _default_cache  # pylint: disable=global-statement
+    _default_cache = cache
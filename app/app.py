@@ -1,20 +1,36 @@
 """
 Created by Cameron Rogers
 """
-import csv
-import docx
+import importlib
+import os
+import sqlite3
 import sys
+from itertools import islice
 from os import path
-import re
 from pathlib import Path
 from PySide2 import QtCore, QtGui, QtWidgets
 # pylint: disable=no-name-in-module
 from PySide2.QtUiTools import QUiLoader
 # pylint: enable=no-name-in-module
-from fuzzywuzzy import process
 
-from graticard_entry import GratiCardEntry
-from parser import parse_data_to_graticard_entry, validate_column_map, InvalidColumnMapError
+from address_cache import AddressCache, default_store_path, set_default_cache
+from column_inference import infer_column_map
+from dedup import EXACT, HOUSEHOLD, format_duplicate_report
+from export import write_csv
+from file_loaders import (CSV_PREVIEW_ROW_LIMIT, DOCX_RULES, collect_rows, iter_csv_rows, iter_docx_rows,
+                          iter_xlsx_rows, xlsx_sheet_names)
+from instrumentation import get_instrumentation, timer
+from loader_worker import FileLoader
+from parallel_csv import iter_large_csv_rows, reader_options, sniff_csv
+from merge import MergeEngine
+from parser import InvalidColumnMapError
+from parse_cache import ParseCache
+from session_store import (SESSION_FILE_EXTENSION, FileState, SessionStore, default_state_store_path,
+                           file_content_hash)
+from table_model import RowTableModel
+
+MAIN_WINDOW_UI = '../ui/mainwindow.ui'
+COMPILED_MAIN_WINDOW_MODULE = 'ui_mainwindow'
         
 
 def load_ui(ui_file_name):
@@ -24,35 +40,125 @@ def load_ui(ui_file_name):
     return loader.load(ui_file)
 
 
+class CompiledMainWindow(QtWidgets.QMainWindow):
+    """Main window built from a pyside2-uic generated class, with its widgets as attributes like load_ui"""
+    def __init__(self, ui_class):
+        super().__init__()
+        self._ui = ui_class()
+        self._ui.setupUi(self)
+
+    def __getattr__(self, name):
+        ui = self.__dict__.get('_ui')
+        if ui is None:
+            raise AttributeError(name)
+        return getattr(ui, name)
+
+
+def load_main_window(ui_file_name=MAIN_WINDOW_UI):
+    """
+    Builds the main window from the module precompiled by bin/compile_ui.sh,
+    which skips parsing the .ui file at startup. Falls back to load_ui when
+    the module is missing or older than the .ui file
+    """
+    try:
+        compiled = importlib.import_module(COMPILED_MAIN_WINDOW_MODULE)
+    except ImportError:
+        return load_ui(ui_file_name)
+    if path.exists(ui_file_name) and path.getmtime(ui_file_name) > path.getmtime(compiled.__file__):
+        return load_ui(ui_file_name)
+    return CompiledMainWindow(compiled.Ui_MainWindow)
+
+
 class App(QtWidgets.QApplication):
     def __init__(self, *args):
         super().__init__(*args)
-        self.main_window = MainWindowManager()
+        set_default_cache(AddressCache(store_path=default_store_path()))
+        self.state_store = SessionStore(default_state_store_path())
+        # GC_TOOLS_PROFILE=<file> captures a cProfile of every timed stage and writes it on exit
+        self.profile_path = os.environ.get("GC_TOOLS_PROFILE")
+        if self.profile_path:
+            get_instrumentation().start_profiling()
+            self.aboutToQuit.connect(self._dump_profile)
+        self.main_window = MainWindowManager(self.state_store)
         self.main_window.ui.show()
 
+    def _dump_profile(self):
+        get_instrumentation().dump_profile(self.profile_path)
+
 
 class FileManager:
-    def __init__(self, parser_ui):
+    def __init__(self, parser_ui, state_store=None):
         self.files = []
         self.parser_ui = parser_ui
         self.parser_idx = 0
+        self.state_store = state_store
         
     def add_file(self, file_paths: list):
+        """Adds handlers for the files, restoring the work saved in the state store for unchanged files"""
         for file_path in file_paths:
-            if isinstance(file_path, str) and path.exists(file_path):
-                if file_path.split('.')[-1] == "csv":
-                    self.files.append(CsvFile(file_path, self.parser_ui))
-                elif file_path.split('.')[-1] == "docx":
-                    self.files.append(DocxFile(file_path, self.parser_ui))
-                else:
-                    raise Exception('Unknown file type')
-            else:
-                raise Exception('Unable to add file')
+            handler = self._create_handler(file_path)
+            if isinstance(handler, XlsxFile):
+                handler.choose_sheet()
+            if self.state_store is not None:
+                handler.restore_state_when_hashed(self.state_store)
+            self.files.append(handler)
+
+    def _create_handler(self, file_path):
+        if isinstance(file_path, str) and path.exists(file_path):
+            if file_path.split('.')[-1] == "csv":
+                return CsvFile(file_path, self.parser_ui)
+            if file_path.split('.')[-1] == "docx":
+                return DocxFile(file_path, self.parser_ui)
+            if file_path.split('.')[-1] == "xlsx":
+                return XlsxFile(file_path, self.parser_ui)
+            raise Exception('Unknown file type')
+        raise Exception('Unable to add file')
+
+    def open_session(self, session_store):
+        """
+        Adds the files of a saved session. Files whose content is unchanged
+        get their saved state back, changed ones start over. Returns the paths
+        of the session files that no longer exist
+        """
+        missing = []
+        for file_path, content_hash in session_store.load_session():
+            if not path.exists(file_path):
+                missing.append(file_path)
+                continue
+            handler = self._create_handler(file_path)
+            if not handler.restore_state(session_store, content_hash) and self.state_store is not None:
+                handler.restore_state(self.state_store)
+            handler.state_store = self.state_store
+            self.files.append(handler)
+        return missing
+
+    def save_session(self, session_store):
+        session_store.save_session([f.get_state() for f in self.files])
         
     def remove_file(self, row_index):
-        self.files.pop(row_index)
+        self.files.pop(row_index).cancel_loading()
+
+    def preload_all(self):
+        """Starts loading every added file that still has to be parsed in the background"""
+        for f in self.files:
+            if f.get_status() != "Complete":
+                f.start_loading()
         
+    def reopen(self, row_index):
+        """
+        Shows the parser of an already parsed file again so its columns can be
+        re-mapped, its parse cache only normalizes the rows that changed.
+        Returns False while another file is being parsed
+        """
+        if any(f.shown for f in self.files):
+            return False
+        self.files[row_index].reopen()
+        return True
+
     def show_parser(self):
+        # Files restored from a saved state are already parsed
+        while self.parser_idx < len(self.files) and self.files[self.parser_idx].get_status() == "Complete":
+            self.parser_idx += 1
         if self.parser_idx < len(self.files):
             self.files[self.parser_idx].setup_and_show()
             self.parser_idx += 1
@@ -69,9 +175,9 @@ class FileManager:
 
 class MainWindowManager(QtCore.QObject):
     """Ui wrapper"""
-    def __init__(self):
+    def __init__(self, state_store=None):
         super().__init__()
-        self.ui = load_ui('../ui/mainwindow.ui')
+        self.ui = load_main_window()
         self.ui.ParseFilesPushButton.clicked.connect(self._show_next_data_parsers)
         self.ui.AddFilePushButton.clicked.connect(self._add_file)
         self.files_model = QtGui.QStandardItemModel()
@@ -80,15 +186,67 @@ class MainWindowManager(QtCore.QObject):
         self.ui.CustomerNameLineEdit.textChanged.connect(self._update_label)
         self.ui.GenerateCsvPushButton.clicked.connect(self.merge)
         
-        self.file_manager = FileManager(self.ui)
+        self.file_manager = FileManager(self.ui, state_store)
         self.file_manager.connect_processed_signals_of_all_files(self._show_next_data_parsers)
 
+        self.timing_label = QtWidgets.QLabel()
+        self.ui.statusbar.addPermanentWidget(self.timing_label)
+        self.ui.menubar.addAction("Open session...").triggered.connect(self._open_session)
+        self.ui.menubar.addAction("Save session...").triggered.connect(self._save_session)
+        self.ui.menubar.addAction("Save timing report...").triggered.connect(self._save_timing_report)
+        self.ui.menubar.addAction("Re-map file").triggered.connect(self._reopen_file)
+
     def _add_file(self):
         file_paths, _ = QtWidgets.QFileDialog.getOpenFileNames(
             self.ui, "Open File", "~", "Files (*.csv *.docx *.xlsx)")
+        file_count = len(self.file_manager.files)
         self.file_manager.add_file(file_paths)
+        self._files_added(file_count)
+
+    def _files_added(self, file_count):
+        for f in self.file_manager.files[file_count:]:
+            f.processed.connect(self._show_timing_report)
+            f.restored.connect(self._show_files)
+        self.file_manager.preload_all()
         self._show_files()
+
+    def _open_session(self):
+        file_path, _ = QtWidgets.QFileDialog.getOpenFileName(
+            self.ui, "Open Session", "~", "Sessions (*.{})".format(SESSION_FILE_EXTENSION))
+        if not file_path:
+            return
+        file_count = len(self.file_manager.files)
+        with SessionStore(file_path) as session_store:
+            missing = self.file_manager.open_session(session_store)
+        self._files_added(file_count)
+        if missing:
+            self.warn('These files of the session no longer exist:\n{}'.format("\n".join(missing)))
+
+    def _save_session(self):
+        file_path, _ = QtWidgets.QFileDialog.getSaveFileName(
+            self.ui, "Save Session", "session.{}".format(SESSION_FILE_EXTENSION),
+            "Sessions (*.{})".format(SESSION_FILE_EXTENSION))
+        if not file_path:
+            return
+        try:
+            with SessionStore(file_path) as session_store:
+                self.file_manager.save_session(session_store)
+        except (OSError, sqlite3.Error) as err:
+            self.warn('Unable to write {}: {}'.format(file_path, err))
         
+    def _reopen_file(self):
+        index = self.ui.AddedFilesListView.currentIndex()
+        if not index.isValid():
+            self.warn('Select the file to re-map first')
+            return
+        if self.file_manager.files[index.row()].get_status() != "Complete":
+            self.warn('Only parsed files can be re-mapped')
+            return
+        if not self.file_manager.reopen(index.row()):
+            self.warn('Finish parsing the file shown first')
+            return
+        self._show_files()
+
     @QtCore.Slot(QtCore.QModelIndex)
     def _remove_file(self, index):
         self.file_manager.remove_file(index.row())
@@ -111,39 +269,64 @@ class MainWindowManager(QtCore.QObject):
     def _show_next_data_parsers(self):
         self.file_manager.show_parser()
         self._show_files()
+        self._show_timing_report()
+
+    def _show_timing_report(self):
+        """Shows the stage timings in the status bar, with the full report as its tooltip"""
+        snapshot = get_instrumentation().snapshot()
+        self.timing_label.setText("  ".join(
+            "{} {:.2f}s".format(name, stats["seconds"]) for name, stats in snapshot["timers"].items()
+            if "[" not in name))
+        lines = ["{}: {:.3f}s over {} call(s)".format(name, stats["seconds"], stats["calls"])
+                 for name, stats in snapshot["timers"].items()]
+        lines.extend("{}: {}".format(name, value) for name, value in snapshot["counters"].items())
+        lines.extend("{}: mean {:.1f} (min {}, max {})".format(name, stats["mean"], stats["min"], stats["max"])
+                     for name, stats in snapshot["values"].items())
+        self.timing_label.setToolTip("\n".join(lines))
+
+    def _save_timing_report(self):
+        file_path, _ = QtWidgets.QFileDialog.getSaveFileName(
+            self.ui, "Save timing report", "timing_report.json", "Json (*.json)")
+        if not file_path:
+            return
+        files = [{"name": f.get_name(), "status": f.get_status(), "rows": len(f.data)}
+                 for f in self.file_manager()]
+        try:
+            get_instrumentation().dump(file_path, {"files": files})
+        except OSError as err:
+            self.warn('Unable to write {}: {}'.format(file_path, err))
             
     def merge(self):
-        csv_entries_dict = None
-        docx_entries_dict = None
+        """Merges the gifts of every parsed docx file into the addresses of every parsed csv and xlsx file"""
+        engine = MergeEngine()
+        address_sources = 0
+        gift_sources = 0
         for file_ in self.file_manager():
             if file_.status == "Pending":
                 return
-            if file_.EXTENSION == 'csv':
-                csv_entries_dict = {obj.get_recipient_name(): obj for obj in file_.graticard_entry_objects}
+            if file_.EXTENSION in ('csv', 'xlsx'):
+                engine.add_address_source(file_.graticard_entry_objects, file_.get_name())
+                address_sources += 1
             elif file_.EXTENSION == 'docx':
-                docx_entries_dict = {obj.get_recipient_name(): obj for obj in file_.graticard_entry_objects}
+                engine.add_gift_source(file_.graticard_entry_objects, file_.get_name())
+                gift_sources += 1
 
         if self.ui.CsvFileNameLabel.text() == "":
             self.warn('You need to specify a file')
             return
         
-        if csv_entries_dict is None or docx_entries_dict is None:
+        if not address_sources or not gift_sources:
             self.warn('You need to parse data first')
             return
         
-        for csv_entry_name in csv_entries_dict:
-            if csv_entry_name in docx_entries_dict:
-                csv_entries_dict[csv_entry_name].set_gift(docx_entries_dict[csv_entry_name].get_gift())
-                continue
-            else:
-                all_docx_names = [docx_entry_name for docx_entry_name in docx_entries_dict]
-                matched_docx_name, confidence = process.extractOne(csv_entry_name, all_docx_names)
-                if confidence > 20:
-                    csv_entries_dict[csv_entry_name].set_gift(docx_entries_dict[matched_docx_name].get_gift())
-
-        # with open(self.ui.CsvFileNameLabel.text(), 'w') as csvfile:
-        #     csvwriter = csv.writer(csvfile)
-        #     csvwriter.writerows(address_list)
+        merged_entries = engine.merge()
+        self._show_timing_report()
+
+        try:
+            write_csv(merged_entries, self.ui.CsvFileNameLabel.text())
+        except OSError as err:
+            self.warn('Unable to write {}: {}'.format(self.ui.CsvFileNameLabel.text(), err))
+            return
         self.info('creating csv - the application will now exit')
         QtCore.QCoreApplication.quit()
         
@@ -169,13 +352,25 @@ class AbstractFileHandler(QtCore.QObject):
                          "Gift"]
     
     processed = QtCore.Signal()
+    restored = QtCore.Signal()
 
     def __init__(self, file_path: str, ui: QtWidgets.QWidget):
         super().__init__()
         self.path = Path(path.abspath(file_path))
         self.graticard_entry_objects = []
         self.data = []
+        self.row_ids = []
+        self.removed_row_ids = set()
         self.status = "Pending"
+        self.table_model = None
+        self.parse_cache = ParseCache()
+        self.loader = None
+        self.loaded = False
+        self.shown = False
+        self.content_hash = None
+        self.column_map = None
+        self.state_store = None
+        self.restore_pending = False
         self.ui = ui
         
     def setup_and_show(self):
@@ -183,18 +378,117 @@ class AbstractFileHandler(QtCore.QObject):
 
         # # Setup table
         # layout = QtWidgets.QHBoxLayout()
-        # self.ui.ParserTableWidget = QtWidgets.QTableWidget()
-        # self.ui.ParserTableWidget.setSelectionBehavior(QtWidgets.QAbstractItemView.SelectRows)
-        # layout.addWidget(self.ui.ParserTableWidget)
+        # self.ui.ParserTableView = QtWidgets.QTableView()
+        # self.ui.ParserTableView.setSelectionBehavior(QtWidgets.QAbstractItemView.SelectRows)
+        # layout.addWidget(self.ui.ParserTableView)
         # self.ui.widget_1.setLayout(layout)
         
         # Connect buttons
+        self.ui.AutoMapPushButton.clicked.connect(self.auto_map_columns)
         self.ui.RemovePushButton.clicked.connect(self.remove_selected_rows)
         self.ui.ParsePushButton.clicked.connect(self.parse)
 
-        self._load_data()
-        self._populate_table()
+        self.shown = True
+        if self.loaded:
+            self._populate_table()
+        else:
+            self.start_loading()
+
+    def start_loading(self):
+        """Starts reading the file on the global thread pool unless it is already loaded or loading"""
+        if self.loaded or self.loader is not None:
+            return
+        # The file is hashed along with the load, it takes as long as reading it
+        self.loader = FileLoader(self._row_source, self.get_name(),
+                                 self._content_key if self.content_hash is None else None)
+        self.loader.signals.hashed.connect(self._on_hashed)
+        self.loader.signals.progress.connect(self._on_load_progress)
+        self.loader.signals.loaded.connect(self._on_loaded)
+        self.loader.signals.failed.connect(self._on_load_failed)
+        self.loader.signals.cancelled.connect(self._on_load_cancelled)
+        QtCore.QThreadPool.globalInstance().start(self.loader)
+
+    def cancel_loading(self):
+        if self.loader is not None:
+            self.loader.cancel()
+
+    def _on_hashed(self, content_hash):
+        self.content_hash = content_hash
+        if self.restore_pending:
+            self.restore_pending = False
+            if self.restore_state(self.state_store):
+                self.restored.emit()
+
+    def _on_load_progress(self, row_count):
+        if self.shown:
+            self.ui.statusbar.showMessage("Loading {}: {} rows".format(self.get_name(), row_count))
+
+    def _on_loaded(self, data):
+        self.loader = None
+        self.data = data
+        self._apply_removed_rows()
+        self.loaded = True
+        if self.shown:
+            self.ui.statusbar.clearMessage()
+            self._populate_table()
+
+    def _on_load_failed(self, message):
+        self.loader = None
+        if self.shown:
+            self.ui.statusbar.clearMessage()
+        flags = QtWidgets.QMessageBox.StandardButton.Ok
+        QtWidgets.QMessageBox.warning(
+            self.ui, "Warning", "Unable to load {}: {}".format(self.get_name(), message), flags)
+
+    def _on_load_cancelled(self):
+        self.loader = None
+        if self.shown:
+            self.ui.statusbar.clearMessage()
         
+    def restore_state(self, state_store, content_hash=None):
+        """
+        Restores the column map, removed rows and parsed entries that
+        state_store saved for the current content of the file. Later parses
+        are saved to state_store. content_hash restores only if it is still
+        the hash of the file. Returns True when a state was restored
+        """
+        self.state_store = state_store
+        if self.content_hash is None:
+            self.content_hash = self._content_key()
+        if content_hash is not None and content_hash != self.content_hash:
+            return False
+        state = state_store.load_file_state(self.content_hash)
+        if state is None:
+            return False
+        self.column_map = state.column_map
+        self.removed_row_ids = set(state.removed_row_ids)
+        if state.status == "Complete":
+            self.graticard_entry_objects = state.entries
+            self.status = "Complete"
+        return True
+
+    def restore_state_when_hashed(self, state_store):
+        """Restores the state saved in state_store like restore_state, once the loader has hashed the file"""
+        self.state_store = state_store
+        self.restore_pending = self.content_hash is None
+        if not self.restore_pending:
+            self.restore_state(state_store)
+
+    def reopen(self):
+        """Shows the parser of a parsed file again, keeping its column map and removed rows"""
+        self.status = "Pending"
+        self.setup_and_show()
+
+    def get_state(self):
+        if self.content_hash is None:
+            self.content_hash = self._content_key()
+        return FileState(str(self.path), self.content_hash, self.status, self.column_map,
+                         sorted(self.removed_row_ids), self.graticard_entry_objects)
+
+    def _content_key(self):
+        """Returns the key the state of the file is saved under, the hash of its content"""
+        return file_content_hash(self.path)
+
     def get_name(self):
         return self.path.name
     
@@ -203,59 +497,167 @@ class AbstractFileHandler(QtCore.QObject):
     
     def parse(self):
         column_map = self._get_column_map()
+        failures = []
+        duplicates = [] if self.ui.DedupCheckBox.isChecked() else None
+        # Progress updates process events, the buttons must not start a second parse meanwhile
+        self._set_buttons_enabled(False)
         try:
-            validate_column_map(column_map)
+            with timer("parse", self.get_name()):
+                self.graticard_entry_objects = self.parse_cache.parse(self._iter_rows(), column_map,
+                                                                      failures=failures,
+                                                                      progress=self._show_parse_progress,
+                                                                      duplicates=duplicates)
         except InvalidColumnMapError as err:
             print('Falied validation - Popup thing here: {}'.format(err))
             return
+        finally:
+            self._set_buttons_enabled(True)
+        self.ui.statusbar.clearMessage()
+        if failures:
+            self._warn_failures(failures)
+        if duplicates:
+            self._report_duplicates(duplicates)
             
-        self.graticard_entry_objects = parse_data_to_graticard_entry(self.data,
-                                                                     column_map)
-        for obj in self.graticard_entry_objects:
-            obj.parse_address()
         self.status = "Complete"
+        self.column_map = column_map
+        if self.state_store is not None:
+            self.state_store.save_file_state(self.get_state())
         self._destroy()
         self.processed.emit()
         
+    def _set_buttons_enabled(self, enabled):
+        for button in (self.ui.AutoMapPushButton, self.ui.RemovePushButton, self.ui.ParsePushButton):
+            button.setEnabled(enabled)
+
+    def _show_parse_progress(self, done, total):
+        self.ui.statusbar.showMessage("Normalizing addresses {}/{}".format(done, total))
+        QtWidgets.QApplication.processEvents()
+
+    def _warn_failures(self, failures, max_listed=10):
+        lines = ["{}: {}".format(failure.entry.get_recipient_name(), failure.error)
+                 for failure in failures[:max_listed]]
+        if len(failures) > max_listed:
+            lines.append("... and {} more".format(len(failures) - max_listed))
+        flags = QtWidgets.QMessageBox.StandardButton.Ok
+        QtWidgets.QMessageBox.warning(
+            self.ui, "Warning",
+            "Unable to normalize {} address(es):\n{}".format(len(failures), "\n".join(lines)),
+            flags)
+
+    def _report_duplicates(self, duplicates, max_listed=10):
+        collapsed = sum(len(group.duplicates) for group in duplicates if group.reason == EXACT)
+        flagged = sum(len(group.duplicates) for group in duplicates if group.reason == HOUSEHOLD)
+        summary = []
+        if collapsed:
+            summary.append("Collapsed {} duplicate row(s) of {}.".format(collapsed, self.get_name()))
+        if flagged:
+            summary.append("Flagged {} row(s) of {} as sharing a household, they were kept.".format(
+                flagged, self.get_name()))
+        if not summary:
+            return
+        # Rows are numbered as in the table, after the combo box row
+        lines = format_duplicate_report(duplicates[:max_listed], row_offset=1)
+        if len(duplicates) > max_listed:
+            lines.append("... and {} more".format(len(duplicates) - max_listed))
+        flags = QtWidgets.QMessageBox.StandardButton.Ok
+        QtWidgets.QMessageBox.information(
+            self.ui, "Information", "{}\n{}".format("\n".join(summary), "\n".join(lines)), flags)
+
     def _load_data(self):
+        with timer("load", self.get_name()):
+            self.data = collect_rows(self._row_source())
+        self._apply_removed_rows()
+        self.loaded = True
+
+    def _apply_removed_rows(self):
+        """Sets row_ids and drops the rows removed before a saved state was restored"""
+        self.row_ids = [row_id for row_id in range(len(self.data)) if row_id not in self.removed_row_ids]
+        if len(self.row_ids) != len(self.data):
+            self.data[:] = [self.data[row_id] for row_id in self.row_ids]
+
+    def _row_source(self):
         # Method should be set by the inherited class
-        pass
+        return iter(())
+
+    def _iter_rows(self):
+        """
+        Yields every row to parse. Handlers that only load a preview into
+        self.data override this to stream the full file
+        """
+        return iter(self.data)
     
     def _destroy(self):
-        self.ui.ParserTableWidget.clear()
-        self.ui.ParserTableWidget.setRowCount(0)
-        self.ui.ParserTableWidget.setColumnCount(0)
+        self.ui.AutoMapPushButton.clicked.disconnect(self.auto_map_columns)
+        self.ui.RemovePushButton.clicked.disconnect(self.remove_selected_rows)
+        self.ui.ParsePushButton.clicked.disconnect(self.parse)
+        self.shown = False
+        self.table_model = RowTableModel([], 0)
+        self.ui.ParserTableView.setModel(self.table_model)
 
     def _populate_table(self):
         if self.data == []:
             return
         self.row_count = len(self.data)
         self.column_count = len(self.data[0])
-        self.ui.ParserTableWidget.setRowCount(self.row_count+1)
-        self.ui.ParserTableWidget.setColumnCount(self.column_count)
+        self.table_model = RowTableModel(self.data, self.column_count)
+        self.ui.ParserTableView.setModel(self.table_model)
 
         for j in range(self.column_count):
             cb = QtWidgets.QComboBox()
             cb.addItems(self.COMBO_BOX_OPTIONS)
-            self.ui.ParserTableWidget.setCellWidget(0, j, cb)
-
-        for i, row in enumerate(self.data):
-            for j, col in enumerate(row):
-                self.ui.ParserTableWidget.setItem(i+1, j, QtWidgets.QTableWidgetItem(col))
-            if i == self.ui.ParserTableWidget.rowCount():
-                break
+            # Column roles chosen in a previous session
+            if self.column_map is not None and j < len(self.column_map) and self.column_map[j]:
+                cb.setCurrentText(self.column_map[j])
+            self.ui.ParserTableView.setIndexWidget(self.table_model.index(0, j), cb)
 
     def remove_selected_rows(self):
-        for r in self.ui.ParserTableWidget.selectedRanges():
-            for row in range(r.topRow(), r.bottomRow()+1):
-                self.data.pop(row-1)
-        self._populate_table()
+        selected_rows = sorted({index.row() for index in
+                                self.ui.ParserTableView.selectionModel().selectedRows()
+                                if index.row() > 0}, reverse=True)
+        # Remove contiguous runs of rows, last run first so indices stay valid
+        runs = []
+        for row in selected_rows:
+            if runs and runs[-1][0] == row + 1:
+                runs[-1][0] = row
+            else:
+                runs.append([row, row])
+        for first, last in runs:
+            self.removed_row_ids.update(self.row_ids[first-1:last])
+            del self.row_ids[first-1:last]
+            self.table_model.removeRows(first, last - first + 1)
+        self.row_count = len(self.data)
+
+    def auto_map_columns(self):
+        """Sets every combo box to the inferred column role and removes a header row"""
+        if not self.data:
+            return
+        try:
+            guess = infer_column_map(self.data)
+        except InvalidColumnMapError as err:
+            self._warn_column_map(err)
+            return
+        for column_index, field in enumerate(guess.column_map[:self.column_count]):
+            combo_box = self.ui.ParserTableView.indexWidget(self.table_model.index(0, column_index))
+            combo_box.setCurrentText(field)
+            combo_box.setToolTip("{:.0%} confidence".format(guess.confidences[column_index]))
+        if guess.header_rows and self.row_ids[:1] == [0]:
+            self.removed_row_ids.add(0)
+            del self.row_ids[0]
+            self.table_model.removeRows(1, 1)
+            self.row_count = len(self.data)
+        confidences = [confidence for field, confidence in zip(guess.column_map, guess.confidences) if field]
+        self.ui.statusbar.showMessage("Mapped {} column(s) of {}, lowest confidence {:.0%}".format(
+            len(confidences), self.get_name(), min(confidences)))
+
+    def _warn_column_map(self, err):
+        flags = QtWidgets.QMessageBox.StandardButton.Ok
+        QtWidgets.QMessageBox.warning(self.ui, "Warning", "Unable to map the columns: {}".format(err), flags)
 
     def _get_column_map(self):
         """Requires that the name be found and optionally the address and gifts"""
         column_map = [None for j in range(self.column_count)]
         for column_index, _ in enumerate(column_map):
-            combo_box = self.ui.ParserTableWidget.cellWidget(0, column_index)
+            combo_box = self.ui.ParserTableView.indexWidget(self.table_model.index(0, column_index))
             column_map[column_index] = combo_box.currentText()
         return column_map
 
@@ -264,33 +666,83 @@ class CsvFile(AbstractFileHandler):
     EXTENSION = 'csv'
     def __init__(self, file_path: str, ui: QtWidgets.QWidget):
         super().__init__(file_path, ui)
-        
-    def _load_data(self):
-        with open(self.path.absolute(), 'r', encoding='latin-1') as fh:
-            self.data = [row for row in csv.reader(fh)]
+        self.csv_format = None
+
+    def _get_csv_format(self):
+        """Encoding and dialect sniffed from the start of the file, once"""
+        if self.csv_format is None:
+            self.csv_format = sniff_csv(self.path.absolute())
+        return self.csv_format
+
+    def _row_source(self):
+        csv_format = self._get_csv_format()
+        return islice(iter_csv_rows(self.path.absolute(), csv_format.encoding, **reader_options(csv_format)),
+                      CSV_PREVIEW_ROW_LIMIT)
+
+    def _iter_rows(self):
+        # Large files are split and read by worker processes
+        rows = iter_large_csv_rows(self.path.absolute(), self._get_csv_format())
+        for row_id, row in enumerate(rows):
+            if row_id not in self.removed_row_ids:
+                yield row
 
 
 class DocxFile(AbstractFileHandler):
     EXTENSION = 'docx'
     
-    RULES = [re.compile(r'(.*) -- (.*)'),
-             re.compile(r'(.*) (\$.*)')]
+    RULES = DOCX_RULES
 
     def __init__(self, file_path: str, ui: QtWidgets.QWidget):
         super().__init__(file_path, ui)
         
-    def _load_data(self):
-        document = docx.Document(self.path.absolute())
-        for paragraph in document.paragraphs:
-            temp_data = "".join([run.text for run in paragraph.runs])
-            if temp_data == "":
-                continue
-            for rule in self.RULES:
-                if rule.match(temp_data) is not None:
-                    match = rule.match(temp_data)
-                    temp_data = [match.group(1), match.group(2)]
-                    break
-            self.data.append(temp_data)
+    def _row_source(self):
+        return iter_docx_rows(self.path.absolute(), self.RULES)
+
+
+
+class XlsxFile(AbstractFileHandler):
+    EXTENSION = 'xlsx'
+    SHEET_SEPARATOR = '#'
+
+    def __init__(self, file_path: str, ui: QtWidgets.QWidget):
+        super().__init__(file_path, ui)
+        self.sheet_name = None
+
+    def choose_sheet(self):
+        """Asks which worksheet to read when the workbook has several, the first one is the default"""
+        try:
+            sheet_names = xlsx_sheet_names(self.path.absolute())
+        except Exception:  # pylint: disable=broad-except
+            # Unreadable workbooks are reported when loading
+            return
+        if len(sheet_names) > 1:
+            sheet_name, accepted = QtWidgets.QInputDialog.getItem(
+                self.ui, "Select Sheet", "Sheet of {} to read:".format(self.get_name()),
+                sheet_names, 0, False)
+            if accepted:
+                self.sheet_name = sheet_name
+
+    def restore_state(self, state_store, content_hash=None):
+        # The sheet a saved session read is part of its key
+        if content_hash is not None and self.SHEET_SEPARATOR in content_hash:
+            self.sheet_name = content_hash.split(self.SHEET_SEPARATOR, 1)[1] or None
+        return super().restore_state(state_store, content_hash)
+
+    def _content_key(self):
+        return "{}{}{}".format(super()._content_key(), self.SHEET_SEPARATOR, self.sheet_name or "")
+
+    def get_name(self):
+        if self.sheet_name is None:
+            return self.path.name
+        return "{} [{}]".format(self.path.name, self.sheet_name)
+
+    def _row_source(self):
+        return islice(iter_xlsx_rows(self.path.absolute(), self.sheet_name), CSV_PREVIEW_ROW_LIMIT)
+
+    def _iter_rows(self):
+        for row_id, row in enumerate(iter_xlsx_rows(self.path.absolute(), self.sheet_name)):
+            if row_id not in self.removed_row_ids:
+                yield row
 
 
 if __name__ == "__main__":
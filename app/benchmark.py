@@ -0,0 +1,251 @@
+"""
+Created by Cameron Rogers
+
+Times each stage of the parse -> normalize -> merge pipeline on synthetic
+data and records the results as json, so regressions show up between
+releases:
+
+    python benchmark.py --sizes 1000 10000 100000 --output results.json
+    python benchmark.py --output new.json --compare results.json
+
+The application startup time is measured too and checked against
+STARTUP_TARGET_SECONDS.
+"""
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+from pathlib import Path
+
+from address_cache import AddressCache, get_default_cache, set_default_cache
+from file_loaders import load_csv_rows, load_docx_rows
+from dedup import dedup_entries
+from merge import MergeEngine, merge_entries
+from parallel_csv import iter_large_csv_rows
+from parser import parse_data_to_graticard_entry
+from similarity import default_backend
+from synthetic_data import GIFT_COLUMN_MAP, GUEST_COLUMN_MAP, write_dataset
+
+DEFAULT_SIZES = [1000, 10000]
+DEFAULT_REPEAT = 3
+STAGES = ["csv_load_preview", "csv_load_full", "csv_load_parallel", "docx_load", "parse_entries", "dedup",
+          "parse_address", "fuzzy_merge", "multi_source_merge"]
+STARTUP_STAGES = ["import", "window", "process"]
+# Seconds from launching the interpreter to the main window being shown
+STARTUP_TARGET_SECONDS = 1.0
+
+_STARTUP_SCRIPT = """
+import time
+start = time.perf_counter()
+import app
+imported = time.perf_counter()
+application = app.App([])
+application.processEvents()
+shown = time.perf_counter()
+print(imported - start, shown - start)
+"""
+
+
+def _time(function, repeat):
+    """Runs function repeat times and returns (best seconds, last result)"""
+    best = None
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = function()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+def _parse_addresses(entries):
+    """Normalizes every address through a fresh cache so each run pays for scourgify"""
+    previous = get_default_cache()
+    set_default_cache(AddressCache())
+    try:
+        for entry in entries:
+            try:
+                entry.parse_address()
+            except Exception:  # pylint: disable=broad-except
+                pass
+    finally:
+        set_default_cache(previous)
+
+
+def _merge_halves(csv_entries, docx_entries):
+    """Merges the entries split into two address lists and two gift lists with a MergeEngine"""
+    engine = MergeEngine()
+    for entries, add_source in ((csv_entries, engine.add_address_source),
+                                (docx_entries, engine.add_gift_source)):
+        half = len(entries) // 2
+        add_source(entries[:half])
+        add_source(entries[half:])
+    return engine.merge()
+
+
+def run_size(directory: Path, size: int, typo_rate=0.1, repeat=DEFAULT_REPEAT, seed=0):
+    """Generates a dataset of size guests and returns the best time of each stage in seconds"""
+    # Importing the gui handlers requires PySide2, keep it out of the module import
+    from app import CsvFile, DocxFile
+
+    csv_path, docx_path = write_dataset(directory, size, typo_rate, seed)
+    csv_file = CsvFile(str(csv_path), None)
+    docx_file = DocxFile(str(docx_path), None)
+    timings = {}
+
+    timings["csv_load_preview"], _ = _time(csv_file._load_data, repeat)  # pylint: disable=protected-access
+    timings["csv_load_full"], csv_rows = _time(lambda: load_csv_rows(csv_path), repeat)
+    # One chunk per core whatever the size, the sizes benchmarked are under PARALLEL_MIN_SIZE
+    chunk_size = max(64 * 1024, os.path.getsize(csv_path) // (os.cpu_count() or 1) + 1)
+    timings["csv_load_parallel"], _ = _time(
+        lambda: list(iter_large_csv_rows(csv_path, chunk_size=chunk_size, min_size=0)), repeat)
+    timings["docx_load"], _ = _time(docx_file._load_data, repeat)  # pylint: disable=protected-access
+    docx_rows = load_docx_rows(docx_path)
+
+    csv_rows = csv_rows[1:]
+    timings["parse_entries"], csv_entries = _time(
+        lambda: parse_data_to_graticard_entry(csv_rows, GUEST_COLUMN_MAP), repeat)
+    docx_entries = parse_data_to_graticard_entry(docx_rows, GIFT_COLUMN_MAP)
+    timings["dedup"], _ = _time(lambda: dedup_entries(csv_entries), repeat)
+    # Normalization is by far the slowest stage, a single run is representative
+    timings["parse_address"], _ = _time(lambda: _parse_addresses(csv_entries), 1)
+    timings["fuzzy_merge"], _ = _time(lambda: merge_entries(csv_entries, docx_entries), repeat)
+    timings["multi_source_merge"], _ = _time(lambda: _merge_halves(csv_entries, docx_entries), repeat)
+    return timings
+
+
+def measure_startup(repeat=DEFAULT_REPEAT):
+    """
+    Starts the application in fresh interpreters and returns the best
+    seconds to import app.py, to show the main window and for the whole
+    process. Runs with the offscreen Qt platform unless QT_QPA_PLATFORM is set
+    """
+    env = dict(os.environ)
+    env.setdefault("QT_QPA_PLATFORM", "offscreen")
+    app_dir = os.path.dirname(os.path.abspath(__file__))
+    timings = {}
+    for _ in range(repeat):
+        start = time.perf_counter()
+        output = subprocess.run([sys.executable, "-c", _STARTUP_SCRIPT], cwd=app_dir, env=env,
+                                stdout=subprocess.PIPE, stderr=subprocess.DEVNULL,
+                                check=True, universal_newlines=True).stdout
+        process = time.perf_counter() - start
+        imported, shown = (float(value) for value in output.split()[-2:])
+        for stage, seconds in zip(STARTUP_STAGES, (imported, shown, process)):
+            timings[stage] = min(timings.get(stage, seconds), seconds)
+    return timings
+
+
+def run_benchmarks(sizes=None, typo_rate=0.1, repeat=DEFAULT_REPEAT, seed=0, progress=None, startup=True):
+    """
+    Runs every size, and the startup time unless startup is False, and
+    returns the results as a json serializable dict
+    """
+    sizes = sizes or DEFAULT_SIZES
+    results = {"python": platform.python_version(),
+               "platform": platform.platform(),
+               "timestamp": datetime.now().isoformat(timespec='seconds'),
+               "typo_rate": typo_rate,
+               "repeat": repeat,
+               "similarity_backend": default_backend(),
+               "results": {}}
+    if startup:
+        results["startup"] = dict(measure_startup(repeat), target=STARTUP_TARGET_SECONDS)
+    with tempfile.TemporaryDirectory() as directory:
+        for size in sizes:
+            if progress is not None:
+                progress(size)
+            results["results"][str(size)] = run_size(Path(directory), size, typo_rate, repeat, seed)
+    return results
+
+
+def compare(previous: dict, current: dict, threshold=0.1):
+    """
+    Returns one (size, stage, previous seconds, current seconds, ratio) tuple
+    per stage and size found in both results, and the list of those that are
+    more than threshold slower
+    """
+    rows = []
+    regressions = []
+    compared = list(current["results"].items())
+    if "startup" in current:
+        compared.append(("startup", current["startup"]))
+    for size, timings in compared:
+        if size == "startup":
+            previous_timings, stages = previous.get("startup", {}), STARTUP_STAGES
+        else:
+            previous_timings, stages = previous["results"].get(size, {}), STAGES
+        for stage in stages:
+            if stage not in timings or not previous_timings.get(stage):
+                continue
+            ratio = timings[stage] / previous_timings[stage]
+            row = (size, stage, previous_timings[stage], timings[stage], ratio)
+            rows.append(row)
+            if ratio > 1 + threshold:
+                regressions.append(row)
+    return rows, regressions
+
+
+def _print_results(results):
+    if "startup" in results:
+        print("startup (target {}s)".format(results["startup"]["target"]))
+        for stage in STARTUP_STAGES:
+            print("  {:<18} {:>10.4f}s".format(stage, results["startup"][stage]))
+    for size, timings in results["results"].items():
+        print("{} guests".format(size))
+        for stage in STAGES:
+            print("  {:<18} {:>10.4f}s".format(stage, timings[stage]))
+
+
+def main(argv=None):
+    arg_parser = argparse.ArgumentParser(description="Benchmark the parse, normalize and merge stages")
+    arg_parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES,
+                            help="Guest list sizes to generate (default: {})".format(DEFAULT_SIZES))
+    arg_parser.add_argument("--typo-rate", type=float, default=0.1,
+                            help="Fraction of gift list names carrying a typo")
+    arg_parser.add_argument("--repeat", type=int, default=DEFAULT_REPEAT,
+                            help="Runs per stage, the best time is kept")
+    arg_parser.add_argument("--seed", type=int, default=0)
+    arg_parser.add_argument("--no-startup", action="store_true",
+                            help="Skip measuring the application startup time")
+    arg_parser.add_argument("--output", help="json file to record the results to")
+    arg_parser.add_argument("--compare", help="json results of a previous run to compare against")
+    arg_parser.add_argument("--threshold", type=float, default=0.1,
+                            help="Slowdown ratio reported as a regression by --compare")
+    args = arg_parser.parse_args(argv)
+
+    results = run_benchmarks(args.sizes, args.typo_rate, args.repeat, args.seed,
+                             progress=lambda size: print("Benchmarking {} guests".format(size),
+                                                         file=sys.stderr),
+                             startup=not args.no_startup)
+    _print_results(results)
+    if args.output:
+        with open(args.output, 'w') as fh:
+            json.dump(results, fh, indent=2)
+
+    status = 0
+    if "startup" in results and results["startup"]["process"] > STARTUP_TARGET_SECONDS:
+        print("Startup took {:.2f}s, over the {}s target".format(results["startup"]["process"],
+                                                                 STARTUP_TARGET_SECONDS), file=sys.stderr)
+        status = 1
+
+    if args.compare:
+        with open(args.compare, 'r') as fh:
+            previous = json.load(fh)
+        rows, regressions = compare(previous, results, args.threshold)
+        for size, stage, before, after, ratio in rows:
+            print("{:>7} {:<18} {:>10.4f}s -> {:>10.4f}s  x{:.2f}".format(size, stage, before, after, ratio))
+        if regressions:
+            print("{} stage(s) regressed by more than {:.0%}".format(len(regressions), args.threshold),
+                  file=sys.stderr)
+            status = 1
+    return status
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,113 @@
+"""
+Created by Cameron Rogers
+
+Headless entry point that merges a csv address list with a docx gift list
+without starting the ui.
+
+Column map files are json objects holding one column map per input, using
+the same field names as the parser table combo boxes:
+
+    {"csv": ["Name", "", "Address Line 1", "City", "Postal Code", "", "State"],
+     "docx": ["Name", "Gift"]}
+
+Without a column map file the csv column map is inferred from the first
+rows of the csv file (see column_inference) and its header row is skipped.
+"""
+import argparse
+import json
+import sys
+
+from address_cache import AddressCache, default_store_path, set_default_cache
+from dedup import Deduplicator, format_duplicate_report
+from export import EXPORT_FORMATS
+from instrumentation import get_instrumentation
+from parser import InvalidColumnMapError, format_row
+from pipeline import DEFAULT_DOCX_COLUMN_MAP, infer_csv_column_map, run_merge
+
+
+def load_column_maps(file_path):
+    """Returns the csv and docx column maps stored in a column map file"""
+    with open(file_path, 'r') as fh:
+        column_maps = json.load(fh)
+    if "csv" not in column_maps:
+        raise InvalidColumnMapError("The column map file must contain a 'csv' column map")
+    return column_maps["csv"], column_maps.get("docx", DEFAULT_DOCX_COLUMN_MAP)
+
+
+def build_arg_parser():
+    arg_parser = argparse.ArgumentParser(
+        description="Merge a csv address list with a docx gift list without the ui")
+    arg_parser.add_argument('csv', help="csv file containing names and addresses")
+    arg_parser.add_argument('docx', help="docx file containing names and gifts")
+    arg_parser.add_argument('column_map', nargs='?', default=None,
+                            help="json file with the 'csv' and 'docx' column maps, inferred when omitted")
+    arg_parser.add_argument('output', help="file to write the merged entries to (.csv, .jsonl or .json)")
+    arg_parser.add_argument('--skip-csv-rows', type=int, default=None,
+                            help="number of leading csv rows (e.g. headers) to ignore, by default 0 or"
+                                 " the header row found when inferring the column map")
+    arg_parser.add_argument('--format', choices=sorted(EXPORT_FORMATS), default=None,
+                            help="output format, guessed from the output extension by default")
+    arg_parser.add_argument('--address-cache', default=str(default_store_path()),
+                            help="sqlite file that keeps normalized addresses between runs")
+    arg_parser.add_argument('--no-address-cache', action='store_true',
+                            help="only cache normalized addresses in memory for this run")
+    arg_parser.add_argument('--dedup', action='store_true',
+                            help="drop csv rows repeating the name and address of an earlier row")
+    arg_parser.add_argument('--metrics', default=None,
+                            help="json file to write the stage timings, counters and match statistics to")
+    arg_parser.add_argument('--profile', default=None,
+                            help="file to write a cProfile capture of the run to (pstats format)")
+    return arg_parser
+
+
+def main(argv=None):
+    args = build_arg_parser().parse_args(argv)
+    if not args.no_address_cache:
+        set_default_cache(AddressCache(store_path=args.address_cache))
+    instrumentation = get_instrumentation()
+    if args.profile:
+        instrumentation.start_profiling()
+    failures = []
+    docx_errors = []
+    deduplicator = Deduplicator() if args.dedup else None
+    try:
+        skip_rows = args.skip_csv_rows or 0
+        if args.column_map is None:
+            guess = infer_csv_column_map(args.csv)
+            csv_column_map, docx_column_map = guess.column_map, DEFAULT_DOCX_COLUMN_MAP
+            if args.skip_csv_rows is None:
+                skip_rows = guess.header_rows
+            print('Inferred csv column map: {}'.format(", ".join(
+                "{} ({:.0%})".format(field or "-", confidence)
+                for field, confidence in zip(guess.column_map, guess.confidences))), file=sys.stderr)
+        else:
+            csv_column_map, docx_column_map = load_column_maps(args.column_map)
+        entry_count = run_merge(args.csv, args.docx, csv_column_map, docx_column_map,
+                                args.output, csv_skip_rows=skip_rows,
+                                failures=failures, export_format=args.format, deduplicator=deduplicator,
+                                docx_errors=docx_errors)
+    except InvalidColumnMapError as err:
+        print('Invalid column map: {}'.format(err), file=sys.stderr)
+        return 1
+    for error in docx_errors:
+        print('Skipped docx paragraph {} ({}): {}'.format(error.index + 1, format_row(error.row), error.error),
+              file=sys.stderr)
+    for failure in failures:
+        row = failure.index if deduplicator is None else deduplicator.kept_rows[failure.index]
+        print('Unable to normalize the address of row {} ({}): {}'.format(
+            row + skip_rows, failure.entry.get_recipient_name(), failure.error),
+            file=sys.stderr)
+    if deduplicator is not None:
+        for line in format_duplicate_report(deduplicator.groups, skip_rows):
+            print(line, file=sys.stderr)
+    print('Wrote {} entries to {}'.format(entry_count, args.output))
+    if args.profile:
+        instrumentation.dump_profile(args.profile)
+        instrumentation.stop_profiling()
+    if args.metrics:
+        instrumentation.dump(args.metrics, {"rows": entry_count, "failures": len(failures)})
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
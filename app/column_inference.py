@@ -0,0 +1,212 @@
+"""
+Created by Cameron Rogers
+
+Guesses the column map of a file from a sample of its rows, so files can
+be parsed without choosing every column by hand. Each column is scored for
+each field from its header and from the shape of its values (postal codes,
+state names, street numbers, $ amounts, names). A header only counts when
+the values agree with it, exports often carry stale headers. The best
+scoring assignment that satisfies validate_column_map is returned.
+
+    guess = infer_column_map(rows)
+    entries = parse_data_to_graticard_entry(rows[guess.header_rows:], guess.column_map)
+"""
+import re
+from collections import namedtuple
+from itertools import islice
+
+from parser import ALL_ADDRESS_SETS, AVAILABLE_FIELDS, BLANK_FIELD, InvalidColumnMapError, validate_column_map
+
+DEFAULT_SAMPLE_ROWS = 200
+# Optional fields (gifts) need this confidence, fields completing a name + address set need less
+MIN_CONFIDENCE = 0.35
+MIN_REQUIRED_CONFIDENCE = 0.2
+CONTENT_WEIGHT = 0.7
+HEADER_WEIGHT = 0.3
+# Headers count only when at least this fraction of the values have the shape of the field
+HEADER_AGREEMENT = 0.5
+# Fields whose values have no recognizable shape, their header is trusted on its own
+HEADER_TRUSTED_FIELDS = ("Gift", "Address Line 2")
+
+FIELD_HEADERS = {"Name": ("name", "names", "fullname", "guest", "guests", "guestname", "recipient",
+                          "recipientname", "recipients", "addressee", "family"),
+                 "Street Address": ("streetaddress", "street", "fullstreetaddress"),
+                 "City State Postal Code": ("citystatezip", "citystatezipcode", "citystatepostalcode",
+                                            "citystatepostcode", "citystzip"),
+                 "Address Line 1": ("address", "address1", "addressline1", "addr", "addr1", "mailingaddress",
+                                    "streetaddress1"),
+                 "Address Line 2": ("address2", "addressline2", "addr2", "apt", "apartment", "unit", "suite",
+                                    "streetaddress2"),
+                 "City": ("city", "town", "citytown"),
+                 "State": ("state", "st", "province", "stateprovince", "region"),
+                 "Postal Code": ("zip", "zipcode", "postalcode", "postcode", "postal", "zip5"),
+                 "Gift": ("gift", "gifts", "present", "presents", "item", "giftdescription", "giftreceived")}
+
+US_STATES = {
+    "AL": "Alabama", "AK": "Alaska", "AZ": "Arizona", "AR": "Arkansas", "CA": "California",
+    "CO": "Colorado", "CT": "Connecticut", "DE": "Delaware", "DC": "District of Columbia", "FL": "Florida",
+    "GA": "Georgia", "HI": "Hawaii", "ID": "Idaho", "IL": "Illinois", "IN": "Indiana", "IA": "Iowa",
+    "KS": "Kansas", "KY": "Kentucky", "LA": "Louisiana", "ME": "Maine", "MD": "Maryland",
+    "MA": "Massachusetts", "MI": "Michigan", "MN": "Minnesota", "MS": "Mississippi", "MO": "Missouri",
+    "MT": "Montana", "NE": "Nebraska", "NV": "Nevada", "NH": "New Hampshire", "NJ": "New Jersey",
+    "NM": "New Mexico", "NY": "New York", "NC": "North Carolina", "ND": "North Dakota", "OH": "Ohio",
+    "OK": "Oklahoma", "OR": "Oregon", "PA": "Pennsylvania", "RI": "Rhode Island", "SC": "South Carolina",
+    "SD": "South Dakota", "TN": "Tennessee", "TX": "Texas", "UT": "Utah", "VT": "Vermont",
+    "VA": "Virginia", "WA": "Washington", "WV": "West Virginia", "WI": "Wisconsin", "WY": "Wyoming",
+    "PR": "Puerto Rico", "GU": "Guam", "VI": "Virgin Islands", "AS": "American Samoa",
+    "MP": "Northern Mariana Islands"}
+_STATE_VALUES = {value.lower() for item in US_STATES.items() for value in item}
+
+POSTAL_CODE_PATTERN = re.compile(r'^(\d{4,5}(-\d{4})?|[A-Za-z]\d[A-Za-z] ?\d[A-Za-z]\d)$')
+CITY_STATE_POSTAL_CODE_PATTERN = re.compile(
+    r"^[A-Za-z .'-]+(,\s*[A-Za-z][A-Za-z .]*|\s+[A-Za-z]{2}\.?),?\s+\d{5}(-\d{4})?$")
+STREET_PATTERN = re.compile(r'^(\d+[A-Za-z]?\s+\S+|p\.?\s*o\.?\s+box\b)', re.IGNORECASE)
+UNIT_PATTERN = re.compile(r'^(#\s*\w+|(apt|apartment|unit|suite|ste|bldg|building|floor|fl|room|rm)\b)',
+                          re.IGNORECASE)
+# Gift lists write amounts as in DOCX_RULES, e.g. "$100"
+GIFT_PATTERN = re.compile(r'\$\s?\d')
+WORD_PATTERN = re.compile(r"^([A-Za-z][A-Za-z.'-]*|&)$")
+DIGIT_PATTERN = re.compile(r'\d')
+
+ColumnGuess = namedtuple('ColumnGuess', ['column_map', 'confidences', 'header_rows'])
+
+
+def _normalize_header(text):
+    return re.sub(r'[^a-z0-9]', '', str(text).lower())
+
+
+_HEADER_FIELDS = {header: field for field, headers in FIELD_HEADERS.items() for header in headers}
+
+
+def header_field(text):
+    """Returns the field a header names, or None"""
+    return _HEADER_FIELDS.get(_normalize_header(text))
+
+
+def _fraction(values, predicate):
+    if not values:
+        return 0.0
+    return sum(1 for value in values if predicate(value)) / len(values)
+
+
+def _words(value):
+    words = value.split()
+    if not words or DIGIT_PATTERN.search(value):
+        return None
+    if not all(WORD_PATTERN.match(word) for word in words):
+        return None
+    return words
+
+
+def _is_name(value):
+    words = _words(value)
+    return words is not None and 2 <= len(words) <= 8
+
+
+def _is_city(value):
+    words = _words(value)
+    return words is not None and len(words) <= 3 and value.lower().strip(' .') not in _STATE_VALUES
+
+
+def content_scores(values):
+    """
+    Returns the fraction-based score, between 0 and 1, of a column holding
+    values for each field
+    """
+    values = [str(value).strip() for value in values]
+    row_count = len(values)
+    values = [value for value in values if value]
+    if not values:
+        return {field: 0.0 for field in AVAILABLE_FIELDS}
+    # Mostly empty columns are leftovers, except for the second address line and gifts
+    coverage = len(values) / row_count
+    # Names are mostly unique, cities repeat
+    distinct = len(set(value.lower() for value in values)) / len(values)
+    street = _fraction(values, STREET_PATTERN.match) * coverage
+    return {"Name": _fraction(values, _is_name) * (0.5 + 0.5 * distinct) * coverage,
+            "Street Address": street * 0.9,
+            "City State Postal Code": _fraction(values, CITY_STATE_POSTAL_CODE_PATTERN.match) * coverage,
+            "Address Line 1": street,
+            "Address Line 2": _fraction(values, UNIT_PATTERN.match),
+            "City": _fraction(values, _is_city) * (1 - 0.3 * distinct) * coverage,
+            "State": _fraction(values, lambda value: value.lower().strip(' .') in _STATE_VALUES) * coverage,
+            "Postal Code": _fraction(values, POSTAL_CODE_PATTERN.match) * coverage,
+            "Gift": _fraction(values, GIFT_PATTERN.search)}
+
+
+def score_column(header, values):
+    """Returns the confidence, between 0 and 1, that a column holds each field"""
+    named_field = None if header is None else header_field(header)
+    scores = {}
+    for field, content in content_scores(values).items():
+        score = CONTENT_WEIGHT * content
+        if field == named_field:
+            if field in HEADER_TRUSTED_FIELDS:
+                score += 2 * HEADER_WEIGHT
+            elif content >= HEADER_AGREEMENT:
+                score += HEADER_WEIGHT
+        scores[field] = min(score, 1.0)
+    return scores
+
+
+def is_header_row(row):
+    """A first row is a header when at least half of its non-empty cells name a field"""
+    cells = [cell for cell in row if str(cell).strip()]
+    if not cells:
+        return False
+    return sum(1 for cell in cells if header_field(cell) is not None) * 2 >= len(cells)
+
+
+def _assign(scores, fields, taken, min_confidence):
+    """Greedily gives each field its best scoring free column, returns {column: field} or None"""
+    assignment = {}
+    candidates = sorted(((column_scores[field], column, field)
+                         for column, column_scores in enumerate(scores) if column not in taken
+                         for field in fields), reverse=True)
+    for score, column, field in candidates:
+        if score < min_confidence:
+            break
+        if column in assignment or field in assignment.values():
+            continue
+        assignment[column] = field
+    if len(assignment) < len(fields):
+        return None
+    return assignment
+
+
+def infer_column_map(rows, sample_size=DEFAULT_SAMPLE_ROWS):
+    """
+    Proposes a column map for rows from its first sample_size rows. Returns
+    a ColumnGuess of the column map, the confidence of each column (0 for
+    blank columns) and the number of header rows to skip. Raises an
+    InvalidColumnMapError when no column looks like a name
+    """
+    sample = [list(row) for row in islice(rows, sample_size)]
+    column_count = max((len(row) for row in sample), default=0)
+    header_rows = 1 if sample and is_header_row(sample[0]) else 0
+    headers = sample[0] + [""] * (column_count - len(sample[0])) if header_rows else [None] * column_count
+    data = sample[header_rows:]
+    scores = [score_column(headers[column], [row[column] for row in data if column < len(row)])
+              for column in range(column_count)]
+
+    best = None
+    # Without address columns only names (and gifts) are mapped
+    for address_set in ((),) + ALL_ADDRESS_SETS:
+        assignment = _assign(scores, ("Name",) + address_set, set(), MIN_REQUIRED_CONFIDENCE)
+        if assignment is None:
+            continue
+        total = sum(scores[column][field] for column, field in assignment.items())
+        if best is None or total > best[0]:
+            best = (total, assignment)
+    if best is None:
+        raise InvalidColumnMapError("Unable to find a column of names")
+    assignment = best[1]
+    gift = _assign(scores, ("Gift",), set(assignment), MIN_CONFIDENCE)
+    if gift is not None:
+        assignment.update(gift)
+
+    column_map = [assignment.get(column, BLANK_FIELD) for column in range(column_count)]
+    confidences = [scores[column][assignment[column]] if column in assignment else 0.0
+                   for column in range(column_count)]
+    validate_column_map(column_map)
+    return ColumnGuess(column_map, confidences, header_rows)
@@ -0,0 +1,196 @@
+"""
+Created by Cameron Rogers
+
+Finds the same guest listed several times in one source before addresses
+are normalized and gifts merged, so each duplicate is only paid for once.
+
+Entries are duplicates when their name tokens (in any order, without
+"and", "&", "family"...) and their canonical address are equal: they are
+grouped by hashing that key, never compared pairwise. Entries at the same
+address whose names share a surname, e.g. a couple listed separately, are
+households: the addresses are sorted so each address is one block, and
+names are only compared within a block.
+
+    entries, groups = dedup_entries(entries)
+    for line in format_duplicate_report(groups):
+        ...
+"""
+import re
+from collections import namedtuple
+from itertools import groupby
+
+from address_cache import canonicalize_address
+from instrumentation import count
+from merge import GIFT_SEPARATOR, address_identity
+
+EXACT = "exact"
+HOUSEHOLD = "household"
+
+NAME_STOPWORDS = frozenset(("and", "the", "family", "mr", "mrs", "ms", "miss", "dr"))
+ADDRESS_ABBREVIATIONS = {"STREET": "ST", "AVENUE": "AVE", "ROAD": "RD", "DRIVE": "DR", "LANE": "LN",
+                         "BOULEVARD": "BLVD", "COURT": "CT", "PLACE": "PL", "PLAZA": "PLZ",
+                         "TERRACE": "TER", "CIRCLE": "CIR", "PARKWAY": "PKWY", "HIGHWAY": "HWY",
+                         "COUNTY": "CO", "APARTMENT": "APT", "SUITE": "STE", "NORTH": "N", "SOUTH": "S",
+                         "EAST": "E", "WEST": "W"}
+POSTAL_CODE_EXTENSION = re.compile(r'\b(\d{5})-\d{4}\b')
+NAME_TOKEN = re.compile(r'[a-z0-9]+')
+
+# kept and duplicates are indices in the deduplicated entries' source
+DuplicateGroup = namedtuple('DuplicateGroup', ['kept', 'duplicates', 'reason', 'names'])
+
+
+def name_key(name):
+    """Returns the sorted name tokens of a name, without punctuation, case or joining words"""
+    if not name:
+        return ()
+    return tuple(sorted(set(NAME_TOKEN.findall(name.lower())) - NAME_STOPWORDS))
+
+
+def address_key(entry):
+    """
+    Returns the address an entry is deduplicated on: the normalized address
+    once it has been parsed, otherwise the raw address canonicalized with
+    the common street abbreviations. None when the entry has no address
+    """
+    if entry.get_parsed_address() is not None:
+        return address_identity(entry)
+    address = entry.get_parsable_address()
+    if address is None:
+        return None
+    address = POSTAL_CODE_EXTENSION.sub(r'\1', canonicalize_address(address))
+    return " ".join(ADDRESS_ABBREVIATIONS.get(word, word) for word in address.split())
+
+
+def duplicate_key(entry):
+    return name_key(entry.get_recipient_name()), address_key(entry)
+
+
+def _surname(name):
+    tokens = NAME_TOKEN.findall((name or "").lower())
+    return tokens[-1] if tokens else None
+
+
+def household_name(name, other_name):
+    """
+    Returns one name for two people of a household: the fuller name when one
+    contains the other, "First and Other First Surname" when they share a
+    surname, otherwise both names joined by "and"
+    """
+    tokens, other_tokens = set(name_key(name)), set(name_key(other_name))
+    if other_tokens <= tokens:
+        return name
+    if tokens <= other_tokens:
+        return other_name
+    words, other_words = name.split(), other_name.split()
+    if len(words) > 1 and len(other_words) > 1 and _surname(name) == _surname(other_name):
+        return "{} and {} {}".format(" ".join(words[:-1]), " ".join(other_words[:-1]), words[-1])
+    return "{} and {}".format(name, other_name)
+
+
+def _merge_gift(entry, duplicate):
+    gift, duplicate_gift = entry.get_gift(), duplicate.get_gift()
+    if not duplicate_gift or duplicate_gift == gift:
+        return
+    entry.set_gift(duplicate_gift if not gift else gift + GIFT_SEPARATOR + duplicate_gift)
+
+
+class Deduplicator:
+    """
+    Drops entries whose duplicate_key was already seen while they stream
+    through, so it runs in a single pass in front of the normalization pool.
+    The gift of a dropped entry is added to the entry kept for it
+    """
+    def __init__(self):
+        self._kept = {}
+        self._groups = {}
+        # Source index of every entry yielded, in order
+        self.kept_rows = []
+
+    def iter_unique(self, entries):
+        for row, entry in enumerate(entries):
+            key = duplicate_key(entry)
+            kept = self._kept.get(key)
+            if kept is None:
+                self._kept[key] = (row, entry)
+                self.kept_rows.append(row)
+                yield entry
+                continue
+            kept_row, kept_entry = kept
+            _merge_gift(kept_entry, entry)
+            group = self._groups.get(key)
+            if group is None:
+                group = self._groups[key] = DuplicateGroup(kept_row, [], EXACT, [kept_entry.get_recipient_name()])
+            group.duplicates.append(row)
+            group.names.append(entry.get_recipient_name())
+        self.report()
+
+    @property
+    def groups(self):
+        return sorted(self._groups.values())
+
+    def report(self):
+        count("dedup.exact", sum(len(group.duplicates) for group in self._groups.values()))
+
+
+def find_households(entries):
+    """
+    Returns a HOUSEHOLD DuplicateGroup for every set of entries at the same
+    address sharing a surname. Entries are sorted by address key so each
+    address is a contiguous block, only names within a block are compared
+    """
+    keyed = [(key, index) for index, key in enumerate(address_key(entry) for entry in entries) if key is not None]
+    keyed.sort(key=lambda item: (repr(item[0]), item[1]))
+    groups = []
+    for _, block in groupby(keyed, key=lambda item: item[0]):
+        indices = [index for _, index in block]
+        if len(indices) < 2:
+            continue
+        by_surname = {}
+        for index in indices:
+            by_surname.setdefault(_surname(entries[index].get_recipient_name()), []).append(index)
+        for surname, members in by_surname.items():
+            if surname is not None and len(members) > 1:
+                groups.append(DuplicateGroup(members[0], members[1:], HOUSEHOLD,
+                                             [entries[index].get_recipient_name() for index in members]))
+    return sorted(groups)
+
+
+def dedup_entries(entries, collapse_households=False):
+    """
+    Removes exact duplicates from a list of entries and finds households.
+    Households are only reported unless collapse_households is True, then
+    each one is collapsed to its first entry under a household_name.
+    Returns the remaining entries, in order, and the DuplicateGroups found
+    with their indices in entries
+    """
+    deduplicator = Deduplicator()
+    unique = list(deduplicator.iter_unique(entries))
+    rows = deduplicator.kept_rows
+    groups = deduplicator.groups
+    collapsed = set()
+    for group in find_households(unique):
+        groups.append(DuplicateGroup(rows[group.kept], [rows[index] for index in group.duplicates],
+                                     HOUSEHOLD, group.names))
+        if collapse_households:
+            kept = unique[group.kept]
+            for index in group.duplicates:
+                kept.set_recipient_name(household_name(kept.get_recipient_name(),
+                                                       unique[index].get_recipient_name()))
+                _merge_gift(kept, unique[index])
+                collapsed.add(index)
+    count("dedup.households", sum(len(group.duplicates) for group in groups if group.reason == HOUSEHOLD))
+    if collapsed:
+        unique = [entry for index, entry in enumerate(unique) if index not in collapsed]
+    return unique, sorted(groups)
+
+
+def format_duplicate_report(groups, row_offset=0):
+    """Returns one line per DuplicateGroup, rows numbered from row_offset"""
+    lines = []
+    for group in groups:
+        relation = "duplicated by" if group.reason == EXACT else "shares an address and surname with"
+        lines.append("Row {} ({}) {} {}".format(
+            group.kept + row_offset, group.names[0], relation,
+            ", ".join("row {} ({})".format(row + row_offset, name)
+                      for row, name in zip(group.duplicates, group.names[1:]))))
+    return lines
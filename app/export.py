@@ -0,0 +1,178 @@
+"""
+Created by Cameron Rogers
+"""
+import csv
+import json
+import os
+import uuid
+from contextlib import contextmanager
+from itertools import islice
+from pathlib import Path
+
+from graticard_entry import GratiCardEntry
+from graticard_entry_table import GratiCardEntryTable, PARSED_ADDRESS_FIELDS, PARSED_COLUMN_PREFIX
+
+EXPORT_HEADER = ["Name", "Address Line 1", "Address Line 2", "City", "State", "Postal Code", "Gift"]
+DEFAULT_CHUNK_SIZE = 1000
+
+# Temporary files are created with these permissions less the umask, like any file the user writes
+EXPORT_FILE_MODE = 0o666
+
+
+def _create_temp_file(file_path: Path, attempts=100):
+    """
+    Creates a new hidden temporary file next to file_path and returns its
+    descriptor and path. Unlike mkstemp (owner only) the kernel applies the
+    umask to EXPORT_FILE_MODE, without changing the process umask
+    """
+    flags = os.O_WRONLY | os.O_CREAT | os.O_EXCL | getattr(os, 'O_BINARY', 0)
+    directory = file_path.absolute().parent
+    for _ in range(attempts):
+        temp_path = str(directory / ".{}.{}.tmp".format(file_path.name, uuid.uuid4().hex[:8]))
+        try:
+            return os.open(temp_path, flags, EXPORT_FILE_MODE), temp_path
+        except FileExistsError:
+            continue
+    raise FileExistsError("No unused temporary file name next to {}".format(file_path))
+
+
+@contextmanager
+def atomic_write(file_path, newline=None):
+    """
+    Opens a temporary file next to file_path for writing and renames it over
+    file_path once the block completes, so readers never see a partial file.
+    The temporary file is removed if the block raises
+    """
+    file_path = Path(file_path)
+    fd, temp_path = _create_temp_file(file_path)
+    try:
+        with os.fdopen(fd, 'w', newline=newline) as fh:
+            yield fh
+        os.replace(temp_path, str(file_path))
+    except BaseException:
+        os.unlink(temp_path)
+        raise
+
+
+def export_entry(entry):
+    """
+    Returns an entry whose address fields hold the normalized address when
+    the entry has been parsed, otherwise the entry itself
+    """
+    parsed_address = entry.get_parsed_address()
+    if parsed_address is None:
+        return entry
+    normalized = GratiCardEntry()
+    normalized.set_entry_with_address_dict(entry.get_recipient_name(), parsed_address, entry.get_gift())
+    return normalized
+
+
+def entry_to_row(entry):
+    """
+    Flattens an entry to an export row. The normalized address is used when
+    the entry has been parsed, otherwise the raw address fields are used
+    """
+    entry = export_entry(entry)
+    row = [entry.get_recipient_name(),
+           entry.get_address_line_1(),
+           entry.get_address_line_2(),
+           entry.get_city(),
+           entry.get_state(),
+           entry.get_postal_code(),
+           entry.get_gift()]
+    return ["" if value is None else value for value in row]
+
+
+def iter_table_rows(table):
+    """Yields the export rows of a GratiCardEntryTable column by column, like entry_to_row"""
+    raw_columns = [table.column(field) for field in PARSED_ADDRESS_FIELDS]
+    parsed_columns = [table.column(PARSED_COLUMN_PREFIX + field) for field in PARSED_ADDRESS_FIELDS]
+    for name, gift, raw, parsed in zip(table.column("recipient_name"),
+                                       table.column("gift"),
+                                       zip(*raw_columns),
+                                       zip(*parsed_columns)):
+        address = parsed if any(value is not None for value in parsed) else raw
+        row = (name,) + address + (gift,)
+        yield ["" if value is None else value for value in row]
+
+
+def _iter_chunks(items, chunk_size):
+    items = iter(items)
+    while True:
+        chunk = list(islice(items, chunk_size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def write_csv(entries, file_path, chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    Writes the entries to a csv file with a header row, chunk_size rows at a
+    time, and returns the number of entries written. entries may be any
+    iterable, it is never held in memory as a whole
+    """
+    entry_count = 0
+    with atomic_write(file_path, newline='') as csvfile:
+        csvwriter = csv.writer(csvfile)
+        csvwriter.writerow(EXPORT_HEADER)
+        for chunk in _iter_chunks(entries, chunk_size):
+            csvwriter.writerows([entry_to_row(entry) for entry in chunk])
+            entry_count += len(chunk)
+    return entry_count
+
+
+def write_table_csv(table, file_path):
+    """Writes a GratiCardEntryTable to a csv file with a header row and returns the number of rows written"""
+    with atomic_write(file_path, newline='') as csvfile:
+        csvwriter = csv.writer(csvfile)
+        csvwriter.writerow(EXPORT_HEADER)
+        csvwriter.writerows(iter_table_rows(table))
+    return len(table)
+
+
+def write_jsonl(entries, file_path, chunk_size=DEFAULT_CHUNK_SIZE):
+    """Writes one get_entry_json object per line and returns the number of entries written"""
+    entry_count = 0
+    with atomic_write(file_path) as fh:
+        for chunk in _iter_chunks(entries, chunk_size):
+            fh.write("".join(export_entry(entry).get_entry_json() + "\n" for entry in chunk))
+            entry_count += len(chunk)
+    return entry_count
+
+
+def write_columnar(entries, file_path):
+    """
+    Writes a json object holding one array per export column, the layout
+    mail-merge tools read as data sources. entries may be a
+    GratiCardEntryTable, other iterables are first collected into one since
+    a column can only be written once all rows are known
+    """
+    if not isinstance(entries, GratiCardEntryTable):
+        entries = GratiCardEntryTable.from_entries(entries)
+    columns = list(zip(*iter_table_rows(entries))) or [()] * len(EXPORT_HEADER)
+    with atomic_write(file_path) as fh:
+        json.dump({name: list(column) for name, column in zip(EXPORT_HEADER, columns)}, fh)
+    return len(entries)
+
+
+EXPORT_FORMATS = {"csv": write_csv,
+                  "jsonl": write_jsonl,
+                  "columnar": write_columnar}
+
+EXTENSION_FORMATS = {".csv": "csv",
+                     ".jsonl": "jsonl",
+                     ".json": "columnar"}
+
+
+def export_entries(entries, file_path, export_format=None):
+    """
+    Writes the entries in one of EXPORT_FORMATS, chosen from the file
+    extension when export_format is not given. Returns the number of entries
+    written
+    """
+    if export_format is None:
+        export_format = EXTENSION_FORMATS.get(Path(file_path).suffix.lower(), "csv")
+    if export_format not in EXPORT_FORMATS:
+        raise ValueError("Unknown export format '{}'. Available formats are {}".format(
+            export_format, list(EXPORT_FORMATS)))
+    return EXPORT_FORMATS[export_format](entries, file_path)
@@ -0,0 +1,201 @@
+"""
+Created by Cameron Rogers
+"""
+import csv
+import re
+import zipfile
+from itertools import islice
+from xml.etree import ElementTree
+
+CSV_ENCODING = 'latin-1'
+
+DOCX_RULES = [re.compile(r'(.*) -- (.*)'),
+              re.compile(r'(.*) (\$.*)')]
+
+DOCX_DOCUMENT_PART = 'word/document.xml'
+WORD_NAMESPACE = '{http://schemas.openxmlformats.org/wordprocessingml/2006/main}'
+W_BODY = WORD_NAMESPACE + 'body'
+W_P = WORD_NAMESPACE + 'p'
+W_R = WORD_NAMESPACE + 'r'
+W_T = WORD_NAMESPACE + 't'
+W_TAB = WORD_NAMESPACE + 'tab'
+W_PTAB = WORD_NAMESPACE + 'ptab'
+W_BR = WORD_NAMESPACE + 'br'
+W_CR = WORD_NAMESPACE + 'cr'
+W_NO_BREAK_HYPHEN = WORD_NAMESPACE + 'noBreakHyphen'
+W_TYPE = WORD_NAMESPACE + 'type'
+
+CSV_PREVIEW_ROW_LIMIT = 1000
+PROGRESS_INTERVAL = 500
+
+
+def iter_csv_rows(file_path, encoding=CSV_ENCODING, **reader_options):
+    """
+    Yields the rows of a csv file one at a time without reading the whole
+    file. reader_options are passed to csv.reader (delimiter, quotechar...)
+    """
+    with open(file_path, 'r', encoding=encoding, errors='replace', newline='') as fh:
+        for row in csv.reader(fh, **reader_options):
+            yield row
+
+
+def load_csv_rows(file_path):
+    """Reads every row of a csv file into a list of lists"""
+    return list(iter_csv_rows(file_path))
+
+
+def load_csv_preview(file_path, row_limit=CSV_PREVIEW_ROW_LIMIT):
+    """Reads at most row_limit rows from the start of a csv file"""
+    return list(islice(iter_csv_rows(file_path), row_limit))
+
+
+def combine_rules(rules):
+    """
+    Combines rules into a single alternation that tries them in order, so
+    every paragraph is matched once. Returns the combined pattern and the
+    index of the first group of each rule within it
+    """
+    combined = re.compile("|".join("(?:{})".format(rule.pattern) for rule in rules))
+    first_groups = []
+    group = 1
+    for rule in rules:
+        first_groups.append(group)
+        group += rule.groups
+    return combined, first_groups
+
+
+def _run_text(run):
+    """Returns the text of a w:r element the way python-docx's Run.text does"""
+    text = []
+    for child in run:
+        if child.tag == W_T:
+            text.append(child.text or "")
+        elif child.tag in (W_TAB, W_PTAB):
+            text.append("\t")
+        elif child.tag == W_BR:
+            if child.get(W_TYPE, "textWrapping") == "textWrapping":
+                text.append("\n")
+        elif child.tag == W_CR:
+            text.append("\n")
+        elif child.tag == W_NO_BREAK_HYPHEN:
+            text.append("-")
+    return "".join(text)
+
+
+def iter_docx_paragraphs(file_path):
+    """
+    Yields the text of every top level paragraph of a docx file, streaming
+    word/document.xml out of the zip so the document is never held in memory
+    """
+    with zipfile.ZipFile(file_path) as archive:
+        with archive.open(DOCX_DOCUMENT_PART) as fh:
+            depth = 0
+            body = None
+            body_depth = 0
+            for event, elem in ElementTree.iterparse(fh, events=('start', 'end')):
+                if event == 'start':
+                    depth += 1
+                    if elem.tag == W_BODY and body is None:
+                        body = elem
+                        body_depth = depth
+                    continue
+                if body is not None and depth == body_depth + 1:
+                    if elem.tag == W_P:
+                        yield "".join(_run_text(run) for run in elem if run.tag == W_R)
+                    # Drop finished paragraphs and tables so memory stays bounded
+                    body.clear()
+                depth -= 1
+
+
+def iter_docx_rows(file_path, rules=DOCX_RULES):
+    """
+    Yields every non-empty paragraph of a docx file. Paragraphs matching one
+    of the rules are split into [name, gift], others are kept as raw text
+    """
+    combined, first_groups = combine_rules(rules)
+    for temp_data in iter_docx_paragraphs(file_path):
+        if temp_data == "":
+            continue
+        match = combined.match(temp_data)
+        if match is not None:
+            for first_group in first_groups:
+                if match.start(first_group) != -1:
+                    temp_data = [match.group(first_group), match.group(first_group + 1)]
+                    break
+        yield temp_data
+
+
+def load_docx_rows(file_path, rules=DOCX_RULES):
+    """Reads every non-empty paragraph of a docx file, see iter_docx_rows"""
+    return list(iter_docx_rows(file_path, rules))
+
+
+def xlsx_sheet_names(file_path):
+    """Returns the names of the worksheets of an xlsx workbook"""
+    # openpyxl is only needed once a spreadsheet is added
+    from openpyxl import load_workbook
+    workbook = load_workbook(str(file_path), read_only=True)
+    try:
+        return workbook.sheetnames
+    finally:
+        workbook.close()
+
+
+def _cell_text(value):
+    if value is None:
+        return ""
+    if isinstance(value, float) and value.is_integer():
+        # Postal codes and phone numbers are stored as numbers
+        return str(int(value))
+    return str(value)
+
+
+def iter_xlsx_rows(file_path, sheet_name=None):
+    """
+    Yields the rows of a worksheet (the first one by default) as lists of
+    strings, like iter_csv_rows. The workbook is opened read-only so rows are
+    streamed from the file and never held in memory at once. Empty rows are
+    skipped and short rows are padded to the width of the sheet
+    """
+    from openpyxl import load_workbook
+    workbook = load_workbook(str(file_path), read_only=True, data_only=True)
+    try:
+        worksheet = workbook[sheet_name] if sheet_name is not None else workbook.worksheets[0]
+        # The stored dimension can be missing, the first row then sets the width
+        width = worksheet.max_column or 0
+        for values in worksheet.iter_rows(values_only=True):
+            row = [_cell_text(value) for value in values]
+            if not any(row):
+                continue
+            width = max(width, len(row))
+            row.extend([""] * (width - len(row)))
+            yield row
+    finally:
+        workbook.close()
+
+
+def load_xlsx_rows(file_path, sheet_name=None):
+    """Reads every non-empty row of a worksheet, see iter_xlsx_rows"""
+    return list(iter_xlsx_rows(file_path, sheet_name))
+
+
+def collect_rows(rows, progress=None, is_cancelled=None, progress_interval=PROGRESS_INTERVAL):
+    """
+    Reads an iterable of rows into a list. progress is called with the number
+    of rows read every progress_interval rows. LoadCancelled is raised as soon
+    as is_cancelled returns True
+    """
+    data = []
+    for row in rows:
+        if is_cancelled is not None and is_cancelled():
+            raise LoadCancelled()
+        data.append(row)
+        if progress is not None and len(data) % progress_interval == 0:
+            progress(len(data))
+    if progress is not None:
+        progress(len(data))
+    return data
+
+
+class LoadCancelled(Exception):
+    pass
@@ -2,7 +2,29 @@
 Created by Cameron Rogers
 """
 import json
-from scourgify import normalize_address_record
+from operator import itemgetter
+from address_cache import get_default_cache
+
+ENTRY_FIELDS = ("recipient_name",
+                "full_street_address",
+                "city_state_zip",
+                "address_line_1",
+                "address_line_2",
+                "city",
+                "state",
+                "postal_code",
+                "gift")
+
+# Complete sets of address fields in the order parse_address tries them, most
+# specific first. Names are GratiCardEntry attributes without the underscore
+ADDRESS_OPTIONS = (
+    ("address_line_1", "address_line_2", "city", "state", "postal_code"),
+    ("address_line_1", "city", "state", "postal_code"),
+    ("address_line_1", "address_line_2", "city_state_zip"),
+    ("address_line_1", "city_state_zip"),
+    ("full_street_address", "city", "state", "postal_code"),
+    ("full_street_address", "city_state_zip"),
+)
 
 
 class GratiCardEntry:
@@ -10,6 +32,18 @@ class GratiCardEntry:
     Graticard entry that contains all data fields needed for a thank you card
     to be generated.
     """
+    __slots__ = ("_recipient_name",
+                 "_full_street_address",
+                 "_city_state_zip",
+                 "_address_line_1",
+                 "_address_line_2",
+                 "_city",
+                 "_state",
+                 "_postal_code",
+                 "_gift",
+                 "_parsed_address",
+                 "_parsed_address_source")
+
     def __init__(self):
         self._recipient_name = None
         self._full_street_address = None
@@ -21,6 +55,7 @@ class GratiCardEntry:
         self._postal_code = None
         self._gift = None
         self._parsed_address = None
+        self._parsed_address_source = None
 
     def get_recipient_name(self):
         return self._recipient_name
@@ -111,6 +146,31 @@ class GratiCardEntry:
         if gift is not None:
             self.set_gift(gift)
 
+    @classmethod
+    def from_rows(cls, rows, plan: tuple):
+        """
+        Batch constructor yielding one entry per row. plan is a compiled
+        column map, a tuple of (column index, attribute) pairs
+        """
+        attributes = tuple("_" + attribute for _, attribute in plan)
+        if not plan:
+            for _ in rows:
+                yield cls()
+            return
+        getter = itemgetter(*(index for index, _ in plan))
+        if len(plan) == 1:
+            attribute = attributes[0]
+            for row in rows:
+                obj = cls()
+                setattr(obj, attribute, getter(row))
+                yield obj
+            return
+        for row in rows:
+            obj = cls()
+            for attribute, value in zip(attributes, getter(row)):
+                setattr(obj, attribute, value)
+            yield obj
+
     def set_entry_with_address_dict(self,
                                     recipient_name: str,
                                     address_dict: dict,
@@ -134,30 +194,59 @@ class GratiCardEntry:
             "gift": self.get_gift()
         })
 
+    def get_parsed_address_source(self):
+        return self._parsed_address_source
+
+    def set_parsed_address(self, parsed_address: dict, source=None):
+        self._parsed_address = parsed_address
+        self._parsed_address_source = source
+
+    def resolve_address_option(self):
+        """
+        Returns the first complete field set of ADDRESS_OPTIONS and the
+        address string built from it, or (None, None) when the entry has no
+        complete set of address fields
+        """
+        for option_set in ADDRESS_OPTIONS:
+            values = [getattr(self, "_" + field) for field in option_set]
+            if None not in values:
+                return option_set, " ".join(values)
+        return None, None
+
+    def get_parsable_address(self):
+        """
+        Returns the address string that parse_address normalizes, or None when
+        the entry has no complete set of address fields
+        """
+        return self.resolve_address_option()[1]
+
     def parse_address(self):
-        address_options = (
-            (self.get_full_street_address(),
-             self.get_city_state_zip()),
-            (self.get_address_line_1(),
-             self.get_address_line_2(),
-             self.get_city(),
-             self.get_state(),
-             self.get_postal_code()),
-            (self.get_address_line_1(),
-             self.get_city(),
-             self.get_state(),
-             self.get_postal_code()),
-        )
-        for option_set in address_options:
-            if None not in option_set:
-                self._parsed_address = normalize_address_record(
-                    " ".join(option_set)
-                )
+        """Normalizes the most specific complete set of address fields, exactly once"""
+        option_set, parsable_address = self.resolve_address_option()
+        if parsable_address is not None:
+            self.set_parsed_address(get_default_cache().normalize(parsable_address), option_set)
+
+    def to_state(self):
+        """Returns a json serializable list of every field, the parsed address and its source"""
+        source = self._parsed_address_source
+        return [getattr(self, "_" + field) for field in ENTRY_FIELDS] + [
+            self._parsed_address, None if source is None else list(source)]
+
+    @classmethod
+    def from_state(cls, state: list):
+        """Rebuilds an entry from to_state"""
+        entry = cls()
+        for field, value in zip(ENTRY_FIELDS, state):
+            setattr(entry, "_" + field, value)
+        parsed_address, source = state[len(ENTRY_FIELDS):]
+        entry._parsed_address = parsed_address
+        entry._parsed_address_source = None if source is None else tuple(source)
+        return entry
 
     def parse_external_address(self, parsable_complete_address: str):
-        self._parsed_address = normalize_address_record(
+        self.set_parsed_address(get_default_cache().normalize(
             parsable_complete_address
-        )
+        ))
 
     def __str__(self):
         if self.get_address_line_2() is None:
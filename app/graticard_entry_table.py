@@ -0,0 +1,123 @@
+"""
+Created by Cameron Rogers
+"""
+import sys
+from itertools import compress
+
+from graticard_entry import ENTRY_FIELDS, GratiCardEntry
+
+PARSED_ADDRESS_FIELDS = ("address_line_1", "address_line_2", "city", "state", "postal_code")
+PARSED_COLUMN_PREFIX = "parsed_"
+TABLE_COLUMNS = ENTRY_FIELDS + tuple(PARSED_COLUMN_PREFIX + field for field in PARSED_ADDRESS_FIELDS)
+
+
+def _intern(value):
+    if isinstance(value, str):
+        return sys.intern(value)
+    return value
+
+
+class GratiCardEntryTable:
+    """
+    Columnar container for a large number of entries. Every entry field and
+    every normalized address component is kept in its own column list, with
+    strings interned so repeated cities, states, postal codes and gifts are
+    stored once.
+
+    Operations work over whole columns: bulk gift assignment, boolean mask
+    filtering and row export, without building an entry object per row.
+    """
+    def __init__(self):
+        self._columns = {column: [] for column in TABLE_COLUMNS}
+
+    @classmethod
+    def from_entries(cls, entries):
+        table = cls()
+        for entry in entries:
+            table.append(entry)
+        return table
+
+    @classmethod
+    def from_rows(cls, rows, plan: tuple):
+        """Builds a table straight from data rows and a compiled column map"""
+        table = cls()
+        planned = [(index, table._columns[attribute]) for index, attribute in plan]
+        planned_attributes = {attribute for _, attribute in plan}
+        unplanned = [table._columns[column] for column in TABLE_COLUMNS
+                     if column not in planned_attributes]
+        for row in rows:
+            for index, column in planned:
+                column.append(_intern(row[index]))
+            for column in unplanned:
+                column.append(None)
+        return table
+
+    def __len__(self):
+        return len(self._columns[ENTRY_FIELDS[0]])
+
+    def __iter__(self):
+        for index in range(len(self)):
+            yield self.entry(index)
+
+    def column(self, column: str):
+        """Returns the list holding a column. Mutating it mutates the table"""
+        return self._columns[column]
+
+    def append(self, entry: GratiCardEntry):
+        for field in ENTRY_FIELDS:
+            self._columns[field].append(_intern(getattr(entry, "get_" + field)()))
+        parsed_address = entry.get_parsed_address() or {}
+        for field in PARSED_ADDRESS_FIELDS:
+            self._columns[PARSED_COLUMN_PREFIX + field].append(_intern(parsed_address.get(field)))
+
+    def entry(self, index: int):
+        """Builds the GratiCardEntry for one row"""
+        entry = GratiCardEntry()
+        entry.set_entry(**{field: self._columns[field][index] for field in ENTRY_FIELDS})
+        parsed_address = {field: self._columns[PARSED_COLUMN_PREFIX + field][index]
+                          for field in PARSED_ADDRESS_FIELDS}
+        if any(value is not None for value in parsed_address.values()):
+            entry.set_parsed_address(parsed_address)
+        return entry
+
+    def set_parsed_addresses(self, parsed_addresses):
+        """Replaces the normalized address columns from one parsed address dict (or None) per row"""
+        parsed_addresses = list(parsed_addresses)
+        for field in PARSED_ADDRESS_FIELDS:
+            self._columns[PARSED_COLUMN_PREFIX + field] = [
+                None if parsed is None else _intern(parsed.get(field)) for parsed in parsed_addresses]
+
+    def assign_gifts(self, lookup):
+        """
+        Sets the gift column from lookup, a callable returning the gift for a
+        recipient name or None. Each distinct name is looked up once and rows
+        without a match keep their gift. Returns the number of rows assigned
+        """
+        gifts_by_name = {}
+        for name in self._columns["recipient_name"]:
+            if name not in gifts_by_name:
+                gifts_by_name[name] = lookup(name)
+        gifts = self._columns["gift"]
+        assigned = 0
+        for index, name in enumerate(self._columns["recipient_name"]):
+            gift = gifts_by_name[name]
+            if gift is not None:
+                gifts[index] = _intern(gift)
+                assigned += 1
+        return assigned
+
+    def mask(self, column: str, predicate):
+        """Returns a boolean mask of the rows whose column value satisfies predicate"""
+        return [bool(predicate(value)) for value in self._columns[column]]
+
+    def filter(self, mask):
+        """Returns a new table holding the rows where mask is true"""
+        mask = list(mask)
+        table = GratiCardEntryTable()
+        for column, values in self._columns.items():
+            table._columns[column] = list(compress(values, mask))
+        return table
+
+    def iter_rows(self, columns=TABLE_COLUMNS):
+        """Yields one tuple of the requested column values per row"""
+        return zip(*(self._columns[column] for column in columns))
@@ -0,0 +1,178 @@
+"""
+Created by Cameron Rogers
+
+Lightweight timers and counters for the load, parse, normalize and merge
+stages. Stages are instrumented once per call, never per row, so the cost
+is a couple of perf_counter calls per stage.
+
+    with timer("load", "guests.csv"):
+        ...
+
+    @timed("parse")
+    def parse(...):
+        ...
+
+    count("merge.fuzzy", 3)
+"""
+import cProfile
+import functools
+import io
+import json
+import pstats
+import threading
+import time
+from contextlib import contextmanager
+
+
+def _key(name: str, label=None):
+    return name if label is None else "{}[{}]".format(name, label)
+
+
+class Instrumentation:
+    """
+    Collects per-stage durations, counters and value statistics. Optionally
+    captures a cProfile of every timed stage. Safe to use from the loader
+    threads.
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._timers = {}
+        self._counters = {}
+        self._values = {}
+        self._profiler = None
+        self._local = threading.local()
+
+    def reset(self):
+        with self._lock:
+            self._timers.clear()
+            self._counters.clear()
+            self._values.clear()
+
+    @contextmanager
+    def timer(self, name: str, label=None):
+        """Times the block and adds it to the name timer, optionally per label (e.g. a file name)"""
+        # Only the outermost timer of a thread switches the profiler, nested stages are part of it
+        # and only on the main thread, a profiler cannot follow several threads at once
+        profiler = self._profiler
+        if getattr(self._local, "depth", 0) or threading.current_thread() is not threading.main_thread():
+            profiler = None
+        self._local.depth = getattr(self._local, "depth", 0) + 1
+        if profiler is not None:
+            profiler.enable()
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            if profiler is not None:
+                profiler.disable()
+            self._local.depth -= 1
+            self._add_time(_key(name, label), elapsed)
+
+    def timed(self, name: str):
+        """Decorator timing every call of a function under name"""
+        def decorator(function):
+            @functools.wraps(function)
+            def wrapper(*args, **kwargs):
+                with self.timer(name):
+                    return function(*args, **kwargs)
+            return wrapper
+        return decorator
+
+    def count(self, name: str, amount=1, label=None):
+        key = _key(name, label)
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + amount
+
+    def record(self, name: str, value, label=None):
+        """Adds a value (e.g. a match score) to the count / min / max / mean statistics of name"""
+        key = _key(name, label)
+        with self._lock:
+            stats = self._values.get(key)
+            if stats is None:
+                self._values[key] = {"count": 1, "min": value, "max": value, "total": value}
+            else:
+                stats["count"] += 1
+                stats["min"] = min(stats["min"], value)
+                stats["max"] = max(stats["max"], value)
+                stats["total"] += value
+
+    def _add_time(self, key, elapsed):
+        with self._lock:
+            stats = self._timers.get(key)
+            if stats is None:
+                self._timers[key] = {"calls": 1, "seconds": elapsed, "max": elapsed}
+            else:
+                stats["calls"] += 1
+                stats["seconds"] += elapsed
+                stats["max"] = max(stats["max"], elapsed)
+
+    def start_profiling(self):
+        """Captures a cProfile of every timed stage from now on"""
+        if self._profiler is None:
+            self._profiler = cProfile.Profile()
+
+    def stop_profiling(self):
+        """Stops capturing and returns the profiler, or None when profiling was not started"""
+        profiler, self._profiler = self._profiler, None
+        return profiler
+
+    def profile_report(self, limit=30, sort="cumulative"):
+        """Returns the text report of the profile captured so far"""
+        if self._profiler is None:
+            return ""
+        stream = io.StringIO()
+        pstats.Stats(self._profiler, stream=stream).sort_stats(sort).print_stats(limit)
+        return stream.getvalue()
+
+    def dump_profile(self, file_path):
+        """Writes the captured profile in the pstats format (readable with snakeviz, pstats...)"""
+        if self._profiler is not None:
+            self._profiler.dump_stats(str(file_path))
+
+    def snapshot(self):
+        """Returns a json serializable copy of every timer, counter and value statistic"""
+        with self._lock:
+            values = {}
+            for key, stats in self._values.items():
+                values[key] = dict(stats, mean=stats["total"] / stats["count"])
+            return {"timers": {key: dict(stats) for key, stats in self._timers.items()},
+                    "counters": dict(self._counters),
+                    "values": values}
+
+    def dump(self, file_path, extra=None):
+        """Writes the snapshot, plus any extra json serializable sections, to a json file"""
+        report = self.snapshot()
+        report.update(extra or {})
+        with open(file_path, 'w') as fh:
+            json.dump(report, fh, indent=2)
+
+    def summary(self):
+        """One line summary of the timers, for a status bar"""
+        snapshot = self.snapshot()
+        parts = ["{} {:.2f}s".format(key, stats["seconds"]) for key, stats in snapshot["timers"].items()]
+        parts.extend("{} {}".format(key, value) for key, value in snapshot["counters"].items())
+        return " | ".join(parts)
+
+
+_default_instrumentation = Instrumentation()
+
+
+def get_instrumentation():
+    return _default_instrumentation
+
+
+def timer(name: str, label=None):
+    return _default_instrumentation.timer(name, label)
+
+
+def timed(name: str):
+    return _default_instrumentation.timed(name)
+
+
+def count(name: str, amount=1, label=None):
+    _default_instrumentation.count(name, amount, label)
+
+
+def record(name: str, value, label=None):
+    _default_instrumentation.record(name, value, label)
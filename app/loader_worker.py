@@ -0,0 +1,62 @@
+"""
+Created by Cameron Rogers
+"""
+import threading
+
+from PySide2 import QtCore
+
+from file_loaders import LoadCancelled, collect_rows
+from instrumentation import count, timer
+
+
+class LoaderSignals(QtCore.QObject):
+    hashed = QtCore.Signal(str)
+    progress = QtCore.Signal(int)
+    loaded = QtCore.Signal(object)
+    failed = QtCore.Signal(str)
+    cancelled = QtCore.Signal()
+
+
+class FileLoader(QtCore.QRunnable):
+    """
+    Reads the rows of a file on a QThreadPool thread. row_source is called on
+    the worker thread and must return an iterable of rows. The signals are
+    delivered to the receivers on their own (ui) thread. The load is timed
+    under label, usually the file name. When content_key is given it is
+    called on the worker thread first and its result emitted as hashed,
+    before any row.
+    """
+    def __init__(self, row_source, label=None, content_key=None):
+        super().__init__()
+        self.setAutoDelete(False)
+        self.signals = LoaderSignals()
+        self._row_source = row_source
+        self._label = label
+        self._content_key = content_key
+        self._cancel_event = threading.Event()
+
+    def cancel(self):
+        self._cancel_event.set()
+
+    def is_cancelled(self):
+        return self._cancel_event.is_set()
+
+    def run(self):
+        try:
+            if self._content_key is not None:
+                with timer("hash", self._label):
+                    self.signals.hashed.emit(self._content_key())
+            with timer("load", self._label):
+                data = collect_rows(self._row_source(),
+                                    progress=self.signals.progress.emit,
+                                    is_cancelled=self._cancel_event.is_set)
+        except LoadCancelled:
+            self.signals.cancelled.emit()
+        except Exception as err:  # pylint: disable=broad-except
+            self.signals.failed.emit(str(err))
+        else:
+            if self.is_cancelled():
+                self.signals.cancelled.emit()
+            else:
+                count("load.rows", len(data), self._label)
+                self.signals.loaded.emit(data)
@@ -0,0 +1,262 @@
+"""
+Created by Cameron Rogers
+"""
+from address_cache import canonicalize_address
+from graticard_entry_table import PARSED_ADDRESS_FIELDS
+from instrumentation import count, record, timer
+from name_matcher import normalize_name
+from similarity import assign_one_to_one, score_edges
+
+GIFT_SEPARATOR = "; "
+# Fuzzy name matches must score above this WRatio, lower scores are too often different people
+DEFAULT_FUZZY_CUTOFF = 80
+
+
+def merge_entries(csv_entries: list, docx_entries: list):
+    """
+    Assigns the gifts of the matching docx entries to the csv entries with a
+    MergeEngine. Returns the merged csv entries, one per name and address
+    """
+    engine = MergeEngine()
+    engine.add_address_source(csv_entries)
+    engine.add_gift_source(docx_entries)
+    return engine.merge()
+
+
+def merge_table(table, docx_entries):
+    """
+    Bulk assigns gifts over the name column of a GratiCardEntryTable, names
+    are matched like MergeEngine.merge. Returns the number of rows assigned
+    """
+    engine = MergeEngine()
+    engine.add_gift_source(docx_entries)
+    with timer("merge"):
+        gifts_by_name = engine.match_names(set(table.column("recipient_name")))
+        assigned = table.assign_gifts(gifts_by_name.get)
+    return assigned
+
+
+def address_identity(entry):
+    """
+    Returns the normalized address of an entry used to tell entries apart:
+    the normalized address fields when it has been parsed, otherwise its
+    canonicalized raw address. None when the entry has no address
+    """
+    parsed_address = entry.get_parsed_address()
+    if parsed_address is not None:
+        return tuple(parsed_address.get(field) for field in PARSED_ADDRESS_FIELDS)
+    address = entry.get_parsable_address()
+    return None if address is None else canonicalize_address(address)
+
+
+def address_join_key(entry):
+    """
+    Returns the (address line 1, 5 digit postal code) of the normalized
+    address of an entry, the key address joins are made on, or None when the
+    entry has not been parsed or lacks either component
+    """
+    parsed_address = entry.get_parsed_address()
+    if parsed_address is None:
+        return None
+    line_1 = parsed_address.get("address_line_1")
+    postal_code = parsed_address.get("postal_code")
+    if not line_1 or not postal_code:
+        return None
+    return line_1, postal_code[:5]
+
+
+class MergeEngine:
+    """
+    Merges any number of address sources (parsed csv files) with any number
+    of gift sources (parsed docx files) in one pass.
+
+    Address entries are indexed by (normalized name, normalized address), so
+    the same recipient exported in several lists is kept once while
+    recipients sharing a name at different addresses are kept apart. Gifts
+    are indexed by normalized name; a name given gifts in several files gets
+    them all, joined with GIFT_SEPARATOR.
+
+    Gifts are matched to address entries in three passes:
+
+    1. gift entries carrying a normalized address (csv or xlsx gift
+       exports) join the address entries with the same address_join_key.
+       Several guests at one address are told apart by name similarity
+    2. the remaining address entries take the gifts of their exact
+       normalized name, unless pass 1 claimed it
+    3. the rest are matched fuzzily against the gift names no entry claimed
+       in 1 and 2, scoring above fuzzy_cutoff. All the names are scored at
+       once by a similarity backend (see similarity.score_edges) and the
+       matches are the one-to-one assignment with the highest total score,
+       so two guests never share a gift. A gift name that several
+       differently named guests match best and equally well is left
+       unassigned
+
+        engine = MergeEngine()
+        engine.add_address_source(csv_entries, "guests.csv")
+        engine.add_gift_source(docx_entries, "gifts.docx")
+        merged_entries = engine.merge()
+    """
+    def __init__(self, fuzzy_cutoff=DEFAULT_FUZZY_CUTOFF, backend=None, workers=1):
+        self.fuzzy_cutoff = fuzzy_cutoff
+        self.backend = backend
+        self.workers = workers
+        self._addresses = {}
+        self._keys_by_join_key = {}
+        self._gifts = {}
+        self._gift_names_by_join_key = {}
+        self.duplicate_addresses = 0
+        self.ambiguous_gift_names = set()
+        self.matched_gift_names = set()
+        self.sources = []
+
+    def add_address_source(self, entries, label=None):
+        """Adds the entries of an address list. Returns the number of entries that were not duplicates"""
+        added = 0
+        entry_count = 0
+        for entry in entries:
+            entry_count += 1
+            key = (normalize_name(entry.get_recipient_name() or ""), address_identity(entry))
+            if key in self._addresses:
+                self.duplicate_addresses += 1
+                continue
+            self._addresses[key] = entry
+            join_key = address_join_key(entry)
+            if join_key is not None:
+                self._keys_by_join_key.setdefault(join_key, []).append(key)
+            added += 1
+        self.sources.append({"label": label, "kind": "address", "entries": entry_count, "added": added})
+        return added
+
+    def add_gift_source(self, entries, label=None):
+        """Adds the entries of a gift list. Returns the number of gifts added"""
+        added = 0
+        entry_count = 0
+        for entry in entries:
+            entry_count += 1
+            gift = entry.get_gift()
+            name = normalize_name(entry.get_recipient_name() or "")
+            if not gift or not name:
+                continue
+            join_key = address_join_key(entry)
+            if join_key is not None:
+                names = self._gift_names_by_join_key.setdefault(join_key, [])
+                if name not in names:
+                    names.append(name)
+            gifts = self._gifts.setdefault(name, [])
+            # The same gift listed in overlapping exports is only given once
+            if gift not in gifts:
+                gifts.append(gift)
+                added += 1
+        self.sources.append({"label": label, "kind": "gift", "entries": entry_count, "added": added})
+        return added
+
+    def merge(self):
+        """
+        Assigns the combined gifts of the matching names to every address
+        entry and returns the address entries, in the order they were added
+        """
+        with timer("merge"):
+            gifts_by_key = self._assign(list(self._addresses))
+            for key, entry in self._addresses.items():
+                if key in gifts_by_key:
+                    entry.set_gift(gifts_by_key[key])
+        count("merge.duplicate_addresses", self.duplicate_addresses)
+        return list(self._addresses.values())
+
+    def match_names(self, names):
+        """
+        Matches recipient names to the gifts added like merge does for
+        address entries. Returns the combined gifts of each matched name
+        """
+        keys = {name: (normalize_name(name or ""),) for name in names}
+        gifts_by_key = self._assign(list(set(keys.values())))
+        return {name: gifts_by_key[key] for name, key in keys.items() if key in gifts_by_key}
+
+    def _assign(self, keys):
+        """Runs the passes over keys, (normalized name, ...) tuples. Returns the gifts of each key matched"""
+        assignments = {}
+        address_matches = self._match_addresses(keys, assignments)
+        exact_matches = self._match_exact_names(keys, assignments)
+        fuzzy_scores = self._match_fuzzy_names(keys, assignments)
+        gifts_by_key = {}
+        for key, gift_names in assignments.items():
+            self.matched_gift_names.update(gift_names)
+            gifts = []
+            for gift_name in gift_names:
+                gifts.extend(gift for gift in self._gifts[gift_name] if gift not in gifts)
+            gifts_by_key[key] = GIFT_SEPARATOR.join(gifts)
+        count("merge.address_matches", address_matches)
+        count("merge.exact_matches", exact_matches)
+        count("merge.fuzzy_matches", len(assignments) - address_matches - exact_matches)
+        count("merge.unmatched", len(keys) - len(assignments))
+        count("merge.ambiguous", len(self.ambiguous_gift_names))
+        for score in fuzzy_scores:
+            record("merge.fuzzy_score", score)
+        return gifts_by_key
+
+    def _match_addresses(self, keys, assignments):
+        """Pass 1, returns the number of keys assigned"""
+        from fuzzywuzzy import fuzz
+        wanted = set(keys)
+        for join_key, gift_names in self._gift_names_by_join_key.items():
+            join_keys = [key for key in self._keys_by_join_key.get(join_key, ()) if key in wanted]
+            if not join_keys:
+                continue
+            if len(join_keys) == 1:
+                assignments.setdefault(join_keys[0], []).extend(gift_names)
+                continue
+            # Several guests at the address, each gift goes to the most similar name
+            for gift_name in gift_names:
+                best_key = max(join_keys, key=lambda key, gift_name=gift_name: fuzz.WRatio(
+                    gift_name, key[0], full_process=False))
+                assignments.setdefault(best_key, []).append(gift_name)
+        return len(assignments)
+
+    def _match_exact_names(self, keys, assignments):
+        """Pass 2, returns the number of keys assigned"""
+        claimed = {gift_name for gift_names in assignments.values() for gift_name in gift_names}
+        matches = 0
+        for key in keys:
+            name = key[0]
+            if key not in assignments and name in self._gifts and name not in claimed:
+                assignments[key] = [name]
+                matches += 1
+        return matches
+
+    def _match_fuzzy_names(self, keys, assignments):
+        """Pass 3, returns the scores of the fuzzy matches made"""
+        claimed = {gift_name for gift_names in assignments.values() for gift_name in gift_names}
+        gift_names = [name for name in self._gifts if name not in claimed]
+        unassigned = {}
+        for key in keys:
+            if key not in assignments and key[0]:
+                unassigned.setdefault(key[0], []).append(key)
+        guest_names = list(unassigned)
+
+        edges = score_edges(guest_names, gift_names, self.fuzzy_cutoff, self.workers, self.backend)
+        edges = self._drop_ambiguous(edges, gift_names)
+        scores = []
+        for row, (column, score) in assign_one_to_one(edges).items():
+            for key in unassigned[guest_names[row]]:
+                assignments[key] = [gift_names[column]]
+                scores.append(score)
+        return scores
+
+    def _drop_ambiguous(self, edges, gift_names):
+        """Removes the gift names that several guests match best with the same score"""
+        row_best = {}
+        column_best = {}
+        for row, column, score in edges:
+            row_best[row] = max(row_best.get(row, score), score)
+            column_best[column] = max(column_best.get(column, score), score)
+        contenders = {}
+        for row, column, score in edges:
+            if score == column_best[column] == row_best[row]:
+                contenders[column] = contenders.get(column, 0) + 1
+        ambiguous = {column for column, contender_count in contenders.items() if contender_count > 1}
+        self.ambiguous_gift_names.update(gift_names[column] for column in ambiguous)
+        return [edge for edge in edges if edge[1] not in ambiguous]
+
+    def unmatched_gift_names(self):
+        """Returns the normalized names holding gifts that no address entry was matched to by merge"""
+        return [name for name in self._gifts if name not in self.matched_gift_names]
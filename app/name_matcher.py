@@ -0,0 +1,158 @@
+"""
+Created by Cameron Rogers
+"""
+from collections import Counter, defaultdict
+
+DEFAULT_SCORE_CUTOFF = 20
+# fuzzywuzzy rounds each ratio, then the WRatio, to an integer, which can add up to 1 to a score bound
+ROUNDING_SLACK = 1
+
+
+def normalize_name(name: str):
+    """
+    Normalizes a name the same way fuzzywuzzy's extractOne does before scoring
+    so that scores from the matcher are identical to process.extractOne
+    """
+    # fuzzywuzzy is imported on first use to keep it out of the application startup
+    from fuzzywuzzy import utils
+    return utils.full_process(utils.full_process(name), force_ascii=True)
+
+
+def name_profile(normalized_name: str):
+    """Returns the (length, token set length, token set) of a normalized name, see wratio_bound"""
+    tokens = frozenset(normalized_name.split())
+    return len(normalized_name), sum(map(len, tokens)) + len(tokens) - 1, tokens
+
+
+def char_elements(normalized_name: str):
+    """Returns the (character, occurrence) pairs of a name, two names have one in common per shared character"""
+    return [(char, occurrence) for char, char_count in Counter(normalized_name).items()
+            for occurrence in range(1, char_count + 1)]
+
+
+def _partial_bound(shared: int, shorter: int):
+    return min(1.0, 2.0 * shared / (shorter + shared))
+
+
+def wratio_bound(query_profile, choice_profile, shared: int):
+    """
+    Returns an upper bound of fuzz.WRatio between two normalized names from
+    their name_profile and the number of characters they share.
+
+    Every ratio WRatio takes compares strings made of the characters of the
+    names, so at most shared characters match: a ratio of strings of lengths
+    a and b is at most 2 * shared / (a + b), and a partial ratio of a string
+    of length s at most 2 * shared / (s + shared). Only the token set ratios
+    depend on the tokens in common. The bound does not include rounding,
+    see ROUNDING_SLACK
+    """
+    length, set_length, tokens = query_profile
+    choice_length, choice_set_length, choice_tokens = choice_profile
+    base = 2.0 * shared / (length + choice_length)
+    shorter = min(length, choice_length)
+    longer = max(length, choice_length)
+    common = tokens & choice_tokens
+    if longer / shorter < 1.5:
+        # token_set_ratio compares the common tokens to each token set, and the token sets
+        common_length = sum(map(len, common)) + len(common) - 1 if common else 0
+        token_set = max(2.0 * common_length / (common_length + set_length),
+                        2.0 * common_length / (common_length + choice_set_length),
+                        min(1.0, 2.0 * shared / (set_length + choice_set_length)))
+        return 100 * max(base, 0.95 * token_set)
+    partial_scale = 0.6 if longer / shorter > 8 else 0.9
+    # The common tokens start both token sets, partial_token_set_ratio is then 100
+    token_set = 1.0 if common else _partial_bound(shared, min(set_length, choice_set_length))
+    return 100 * max(base, partial_scale * _partial_bound(shared, shorter), partial_scale * 0.95 * token_set)
+
+
+class NameMatcher:
+    """
+    Fuzzy name matcher returning the same matches as process.extractOne
+    without scoring every choice.
+
+    A query is first looked up by its normalized name key. Otherwise an
+    inverted index of characters counts the characters the query shares
+    with each choice, which bounds the WRatio score they can reach (see
+    wratio_bound). Choices are scored with the WRatio scorer extractOne
+    uses, highest bound first, until no remaining choice can reach the best
+    score, so the best match and its confidence are always extractOne's.
+    """
+    def __init__(self, choices=(), score_cutoff=DEFAULT_SCORE_CUTOFF):
+        self.score_cutoff = score_cutoff
+        self._choices = []
+        self._normalized = []
+        self._profiles = []
+        self._exact = {}
+        self._index = defaultdict(list)
+        for choice in choices:
+            self.add(choice)
+
+    def __len__(self):
+        return len(self._choices)
+
+    def add(self, choice: str):
+        choice_id = len(self._choices)
+        normalized = normalize_name(choice)
+        self._choices.append(choice)
+        self._normalized.append(normalized)
+        self._profiles.append(name_profile(normalized))
+        self._exact.setdefault(normalized, choice_id)
+        for element in char_elements(normalized):
+            self._index[element].append(choice_id)
+
+    def candidates(self, normalized_query: str, min_score=0):
+        """
+        Returns the (score bound, choice id) of the choices that can score at
+        least min_score against the query, highest bound first
+        """
+        shared = Counter()
+        for element in char_elements(normalized_query):
+            shared.update(self._index.get(element, ()))
+        query_profile = name_profile(normalized_query)
+        ranked = []
+        for choice_id, shared_count in shared.items():
+            bound = wratio_bound(query_profile, self._profiles[choice_id], shared_count) + ROUNDING_SLACK
+            if bound >= min_score:
+                ranked.append((-bound, choice_id))
+        ranked.sort()
+        return [(-negative_bound, choice_id) for negative_bound, choice_id in ranked]
+
+    def extract_one(self, query: str):
+        """
+        Returns the best (choice, confidence) for the query or None when no
+        choice scores above the cutoff. Like extractOne, the first choice
+        added wins a tie
+        """
+        from fuzzywuzzy import fuzz
+        if not self._choices:
+            return None
+        normalized_query = normalize_name(query)
+        if not normalized_query:
+            return None
+        if normalized_query in self._exact:
+            return self._choices[self._exact[normalized_query]], 100
+
+        best_id = None
+        best_score = self.score_cutoff
+        for bound, choice_id in self.candidates(normalized_query, self.score_cutoff):
+            if bound < best_score:
+                break
+            score = fuzz.WRatio(normalized_query, self._normalized[choice_id], full_process=False)
+            if score > best_score or (score == best_score and best_id is not None and choice_id < best_id):
+                best_id, best_score = choice_id, score
+        if best_id is None:
+            return None
+        return self._choices[best_id], best_score
+
+    def extract(self, query: str):
+        """Returns every (choice id, confidence) scoring above the cutoff, in choice order"""
+        from fuzzywuzzy import fuzz
+        normalized_query = normalize_name(query)
+        if not normalized_query:
+            return []
+        scored = []
+        for _, choice_id in self.candidates(normalized_query, self.score_cutoff):
+            score = fuzz.WRatio(normalized_query, self._normalized[choice_id], full_process=False)
+            if score > self.score_cutoff:
+                scored.append((choice_id, score))
+        return sorted(scored)
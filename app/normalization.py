@@ -0,0 +1,140 @@
+"""
+Created by Cameron Rogers
+"""
+import os
+from collections import OrderedDict, namedtuple
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+
+from address_cache import canonicalize_address, get_default_cache
+from instrumentation import count, timed
+
+DEFAULT_CHUNK_SIZE = 64
+
+NormalizationFailure = namedtuple('NormalizationFailure', ['index', 'entry', 'error'])
+
+
+def normalize_addresses(addresses: list):
+    """
+    Normalizes a list of address strings. Returns one (parsed_address, error)
+    pair per address so a bad address never aborts the rest of the list
+    """
+    # Imported here so scourgify is only loaded once addresses are parsed
+    from scourgify import normalize_address_record
+    results = []
+    for address in addresses:
+        if address is None:
+            results.append((None, None))
+            continue
+        try:
+            results.append((normalize_address_record(address), None))
+        except Exception as err:  # pylint: disable=broad-except
+            results.append((None, str(err)))
+    return results
+
+
+class AddressNormalizationPool:
+    """
+    Normalizes the addresses of many entries across a pool of worker
+    processes. Entries are sent to the workers in chunks and the results are
+    applied back to the entries in their original order.
+
+    Use as a context manager so the worker processes are shut down:
+
+        with AddressNormalizationPool() as pool:
+            failures = pool.normalize(entries)
+    """
+    def __init__(self, processes=None, chunk_size=DEFAULT_CHUNK_SIZE, cache=None):
+        self.processes = processes or os.cpu_count() or 1
+        self.cache = cache if cache is not None else get_default_cache()
+        self.chunk_size = chunk_size
+        self._executor = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        if self._executor is not None:
+            self._executor.shutdown()
+            self._executor = None
+
+    @timed("normalize")
+    def normalize(self, entries: list, progress=None, start_index=0):
+        """
+        Sets the parsed address of every entry and returns a list of
+        NormalizationFailure for the entries whose address could not be parsed.
+        Addresses found in the cache are applied directly and each distinct
+        missing address is sent to the workers once. progress is called with
+        (addresses done, addresses to normalize) after each chunk
+        """
+        pending = OrderedDict()
+        cache_hits = 0
+        for index, entry in enumerate(entries):
+            option_set, address = entry.resolve_address_option()
+            if address is None:
+                continue
+            parsed_address = self.cache.lookup(address)
+            if parsed_address is not None:
+                cache_hits += 1
+                entry.set_parsed_address(parsed_address, option_set)
+            else:
+                pending.setdefault(canonicalize_address(address), (address, []))[1].append(
+                    (index, option_set))
+
+        pending = list(pending.values())
+        addresses = [address for address, _ in pending]
+        chunks = [addresses[i:i + self.chunk_size]
+                  for i in range(0, len(addresses), self.chunk_size)]
+        if self.processes == 1 or len(chunks) <= 1:
+            results = map(normalize_addresses, chunks)
+        else:
+            if self._executor is None:
+                self._executor = ProcessPoolExecutor(max_workers=self.processes)
+            results = self._executor.map(normalize_addresses, chunks)
+
+        failures = []
+        pending_done = 0
+        for chunk_results in results:
+            normalized = []
+            for parsed_address, error in chunk_results:
+                address, indices = pending[pending_done]
+                for index, option_set in indices:
+                    if error is not None:
+                        failures.append(NormalizationFailure(start_index + index, entries[index], error))
+                    else:
+                        entries[index].set_parsed_address(parsed_address, option_set)
+                if error is None:
+                    normalized.append((address, parsed_address))
+                pending_done += 1
+            self.cache.store_many(normalized)
+            if progress is not None:
+                progress(pending_done, len(pending))
+        # One store transaction per parse rather than per chunk
+        self.cache.flush()
+        failures.sort(key=lambda failure: failure.index)
+        count("normalize.entries", len(entries))
+        count("normalize.cache_hits", cache_hits)
+        count("normalize.scourgify_calls", len(pending))
+        count("normalize.failures", len(failures))
+        return failures
+
+    def imap(self, entries, failures=None):
+        """
+        Lazily normalizes an iterable of entries, a batch of chunks at a time,
+        and yields them in order. Failures are appended to the failures list
+        """
+        entries = iter(entries)
+        batch_size = self.chunk_size * self.processes * 2
+        index = 0
+        while True:
+            batch = list(islice(entries, batch_size))
+            if not batch:
+                return
+            batch_failures = self.normalize(batch, start_index=index)
+            if failures is not None:
+                failures.extend(batch_failures)
+            index += len(batch)
+            yield from batch
@@ -0,0 +1,220 @@
+"""
+Created by Cameron Rogers
+
+Loader for very large csv files. The file is memory-mapped, split into
+chunks at record boundaries (never inside a quoted field, even one holding
+newlines) and the chunks are parsed in worker processes. Rows, or entries
+parsed in the workers, come back in file order.
+
+    for row in iter_large_csv_rows("export.csv"):
+        ...
+"""
+import codecs
+import csv
+import io
+import mmap
+import os
+from collections import deque, namedtuple
+from concurrent.futures import ProcessPoolExecutor
+
+from file_loaders import CSV_ENCODING
+
+SNIFF_SAMPLE_SIZE = 64 * 1024
+DEFAULT_CHUNK_SIZE = 16 * 1024 * 1024
+# Smaller files are read sequentially, starting the workers costs more than it saves
+PARALLEL_MIN_SIZE = 8 * 1024 * 1024
+SNIFF_DELIMITERS = ',;\t|'
+ESCAPECHAR = '\\'
+# Encodings in which a quote or newline byte is always that character
+BYTE_SAFE_ENCODINGS = {'utf-8', 'utf-8-sig', 'latin-1', 'iso8859-1', 'cp1252', 'ascii'}
+
+CsvFormat = namedtuple('CsvFormat', ['encoding', 'delimiter', 'quotechar', 'doublequote', 'escapechar',
+                                     'skipinitialspace'])
+DEFAULT_CSV_FORMAT = CsvFormat(CSV_ENCODING, ',', '"', True, None, False)
+
+
+def reader_options(csv_format):
+    """Returns the csv.reader keyword arguments of a CsvFormat"""
+    return {"delimiter": csv_format.delimiter,
+            "quotechar": csv_format.quotechar,
+            "doublequote": csv_format.doublequote,
+            "escapechar": csv_format.escapechar,
+            "skipinitialspace": csv_format.skipinitialspace}
+
+
+def sniff_encoding(sample: bytes):
+    """Returns utf-8-sig for a utf-8 byte order mark, utf-8 when the sample decodes as utf-8, else CSV_ENCODING"""
+    if sample.startswith(codecs.BOM_UTF8):
+        return 'utf-8-sig'
+    try:
+        # The sample may end in the middle of a multi-byte character
+        codecs.getincrementaldecoder('utf-8')().decode(sample, final=False)
+    except UnicodeDecodeError:
+        return CSV_ENCODING
+    return 'utf-8'
+
+
+def sniff_csv(file_path, sample_size=SNIFF_SAMPLE_SIZE):
+    """Guesses the encoding and dialect of a csv file from its first sample_size bytes"""
+    with open(file_path, 'rb') as fh:
+        sample = fh.read(sample_size)
+    encoding = sniff_encoding(sample)
+    text = codecs.getincrementaldecoder(encoding)(errors='replace').decode(sample)
+    # Only complete lines are sniffed
+    if len(sample) == sample_size and '\n' in text:
+        text = text[:text.rindex('\n') + 1]
+    try:
+        dialect = csv.Sniffer().sniff(text, delimiters=SNIFF_DELIMITERS)
+    except csv.Error:
+        return DEFAULT_CSV_FORMAT._replace(encoding=encoding)
+    quotechar = dialect.quotechar or '"'
+    # The sniffer only reports doubled quotes when the sample holds some and
+    # never detects an escape character, so quotes are doubled unless the
+    # sample escapes one
+    escapechar = ESCAPECHAR if ESCAPECHAR + quotechar in text else None
+    return CsvFormat(encoding, dialect.delimiter, quotechar, escapechar is None, escapechar,
+                     dialect.skipinitialspace)
+
+
+def _opens_field(buffer, position: int, first: int, delimiter: bytes, skipinitialspace: bool):
+    """Whether the quote at position starts a field, elsewhere the csv module reads it as a plain character"""
+    if skipinitialspace:
+        while position > first and buffer[position - 1:position] == b' ':
+            position -= 1
+    return position == first or buffer[position - 1:position] in (delimiter, b'\n', b'\r')
+
+
+def _skip_quoted(buffer, position: int, size: int, quote: bytes):
+    """Returns the offset after the closing quote of a field opened just before position"""
+    while True:
+        closing = buffer.find(quote, position)
+        if closing == -1:
+            return size
+        if buffer[closing + 1:closing + 2] != quote:
+            return closing + 1
+        position = closing + 2
+
+
+def _skip_to(buffer, position: int, end: int, size: int, first: int, quote: bytes, delimiter: bytes,
+             skipinitialspace: bool):
+    """
+    Reads from position, which is outside quotes, up to end. Returns end, or
+    the offset after the quoted field end falls in
+    """
+    while True:
+        opening = buffer.find(quote, position, end)
+        if opening == -1:
+            return end
+        if _opens_field(buffer, opening, first, delimiter, skipinitialspace):
+            position = _skip_quoted(buffer, opening + 1, size, quote)
+            if position >= end:
+                return position
+        else:
+            position = opening + 1
+
+
+def find_chunk_boundaries(buffer, size: int, chunk_size=DEFAULT_CHUNK_SIZE, quotechar='"', delimiter=',',
+                          skipinitialspace=False):
+    """
+    Returns the byte offsets splitting a csv buffer into chunks of about
+    chunk_size bytes. Each offset follows a newline outside quotes. Like the
+    csv module, a quote only opens a field at its start, so a stray quote in
+    an unquoted field does not throw the quote state off
+    """
+    quote = quotechar.encode('ascii')
+    delimiter = delimiter.encode('ascii')
+    first = len(codecs.BOM_UTF8) if buffer[:len(codecs.BOM_UTF8)] == codecs.BOM_UTF8 else 0
+    boundaries = [0]
+    position = 0
+    while position + chunk_size < size:
+        position = _skip_to(buffer, position, position + chunk_size, size, first, quote, delimiter,
+                            skipinitialspace)
+        while position < size:
+            newline = buffer.find(b'\n', position)
+            if newline == -1:
+                return boundaries + [size]
+            end = _skip_to(buffer, position, newline + 1, size, first, quote, delimiter, skipinitialspace)
+            position = end
+            if end == newline + 1:
+                break
+        if position >= size:
+            break
+        boundaries.append(position)
+    return boundaries + [size]
+
+
+def _parse_chunk(file_path, start, end, csv_format, column_map=None, skip_rows=0):
+    """Reads the rows of one chunk, or the entries parsed from them when a column map is given"""
+    with open(file_path, 'rb') as fh, mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ) as buffer:
+        encoding = 'utf-8' if csv_format.encoding == 'utf-8-sig' and start > 0 else csv_format.encoding
+        text = buffer[start:end].decode(encoding, errors='replace')
+    rows = list(csv.reader(io.StringIO(text, newline=''), **reader_options(csv_format)))[skip_rows:]
+    if column_map is None:
+        return rows
+    from parser import parse_data_to_graticard_entry
+    return parse_data_to_graticard_entry(rows, column_map)
+
+
+def _can_split(csv_format):
+    return (csv_format.encoding in BYTE_SAFE_ENCODINGS and csv_format.doublequote
+            and csv_format.escapechar is None)
+
+
+def _iter_chunk_results(file_path, csv_format, processes, chunk_size, min_size, column_map, skip_rows):
+    size = os.path.getsize(file_path)
+    if size == 0:
+        return
+    if size < min_size or not _can_split(csv_format):
+        yield _parse_chunk(file_path, 0, size, csv_format, column_map, skip_rows)
+        return
+    with open(file_path, 'rb') as fh, mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ) as buffer:
+        boundaries = find_chunk_boundaries(buffer, size, chunk_size, csv_format.quotechar, csv_format.delimiter,
+                                           csv_format.skipinitialspace)
+    chunks = list(zip(boundaries, boundaries[1:]))
+    processes = processes or os.cpu_count() or 1
+    if processes == 1 or len(chunks) == 1:
+        for index, (start, end) in enumerate(chunks):
+            yield _parse_chunk(file_path, start, end, csv_format, column_map, skip_rows if index == 0 else 0)
+        return
+    with ProcessPoolExecutor(max_workers=processes) as executor:
+        # A couple of chunks per worker are in flight, results are held until their turn
+        pending = deque()
+        for index, (start, end) in enumerate(chunks):
+            pending.append(executor.submit(_parse_chunk, file_path, start, end, csv_format, column_map,
+                                           skip_rows if index == 0 else 0))
+            if len(pending) >= 2 * processes:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+
+def iter_large_csv_rows(file_path, csv_format=None, processes=None, chunk_size=DEFAULT_CHUNK_SIZE,
+                        min_size=PARALLEL_MIN_SIZE):
+    """
+    Yields the rows of a csv file in order, parsing chunks of it in parallel
+    worker processes. The format is sniffed when not given. Files smaller
+    than min_size, and files whose format cannot be split safely, are read
+    in a single chunk
+    """
+    file_path = str(file_path)
+    if csv_format is None:
+        csv_format = sniff_csv(file_path)
+    for rows in _iter_chunk_results(file_path, csv_format, processes, chunk_size, min_size, None, 0):
+        yield from rows
+
+
+def parse_large_csv(file_path, column_map: list, skip_rows=0, csv_format=None, processes=None,
+                    chunk_size=DEFAULT_CHUNK_SIZE, min_size=PARALLEL_MIN_SIZE):
+    """
+    Parses a csv file to GratiCardEntry objects in the worker processes, like
+    parse_data_to_graticard_entry over iter_large_csv_rows but without
+    sending the rows back. skip_rows leading rows (e.g. headers) are ignored
+    """
+    file_path = str(file_path)
+    if csv_format is None:
+        csv_format = sniff_csv(file_path)
+    entries = []
+    for chunk_entries in _iter_chunk_results(file_path, csv_format, processes, chunk_size, min_size,
+                                             column_map, skip_rows):
+        entries.extend(chunk_entries)
+    return entries
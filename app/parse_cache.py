@@ -0,0 +1,91 @@
+"""
+Created by Cameron Rogers
+"""
+from dedup import dedup_entries
+from graticard_entry import ADDRESS_OPTIONS, GratiCardEntry
+from instrumentation import count
+from normalization import AddressNormalizationPool, NormalizationFailure
+from parser import compile_column_map, validate_column_map
+
+ADDRESS_ATTRIBUTES = tuple(sorted({field for option_set in ADDRESS_OPTIONS for field in option_set}))
+
+
+def address_key(entry: GratiCardEntry):
+    """Returns the values of every address field of an entry, the only input of its normalization"""
+    return tuple(getattr(entry, "_" + field) for field in ADDRESS_ATTRIBUTES)
+
+
+class ParseCache:
+    """
+    Remembers the normalization outcome of every row a handler has parsed,
+    keyed on the address fields the column map extracts from the row.
+
+    Re-parsing after rows are removed, or after a column role changes,
+    rebuilds the (cheap) entries but only normalizes the rows whose address
+    fields actually changed. Unparseable addresses are remembered too, so
+    they are reported again without another scourgify call.
+    """
+    def __init__(self):
+        self.hits = 0
+        self.misses = 0
+        self._results = {}
+
+    def __len__(self):
+        return len(self._results)
+
+    def clear(self):
+        self._results.clear()
+
+    def parse(self, rows, column_map: list, failures=None, progress=None, processes=None, duplicates=None):
+        """
+        Parses rows to entries like pipeline.parse_rows, reusing cached
+        normalization results. When a duplicates list is given, duplicate
+        entries are collapsed before normalization (see dedup.dedup_entries)
+        and their DuplicateGroups appended to it
+        """
+        validate_column_map(column_map)
+        entries = list(GratiCardEntry.from_rows(rows, compile_column_map(column_map)))
+        if duplicates is not None:
+            entries, groups = dedup_entries(entries)
+            duplicates.extend(groups)
+        row_failures = []
+        pending = {}
+        hits, misses = self.hits, self.misses
+        for index, entry in enumerate(entries):
+            key = address_key(entry)
+            if key not in self._results:
+                if key in pending:
+                    self.hits += 1
+                else:
+                    self.misses += 1
+                pending.setdefault(key, []).append(index)
+                continue
+            self.hits += 1
+            self._apply(index, entry, self._results[key], row_failures)
+
+        if pending:
+            pending_entries = [entries[indices[0]] for indices in pending.values()]
+            with AddressNormalizationPool(processes) as pool:
+                errors = {failure.index: failure.error
+                          for failure in pool.normalize(pending_entries, progress)}
+            for pending_index, (key, indices) in enumerate(pending.items()):
+                entry = pending_entries[pending_index]
+                self._results[key] = (entry.get_parsed_address(),
+                                      entry.get_parsed_address_source(),
+                                      errors.get(pending_index))
+                for index in indices:
+                    self._apply(index, entries[index], self._results[key], row_failures)
+
+        if failures is not None:
+            failures.extend(sorted(row_failures, key=lambda failure: failure.index))
+        count("parse_cache.hits", self.hits - hits)
+        count("parse_cache.misses", self.misses - misses)
+        return entries
+
+    @staticmethod
+    def _apply(index, entry, result, row_failures):
+        parsed_address, source, error = result
+        if error is not None:
+            row_failures.append(NormalizationFailure(index, entry, error))
+        elif parsed_address is not None:
+            entry.set_parsed_address(parsed_address, source)
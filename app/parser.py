@@ -1,10 +1,16 @@
 """
 Created by Cameron Rogers
 """
+from collections import namedtuple
+
 from graticard_entry import GratiCardEntry
+from instrumentation import timed
 
 BLANK_FIELD = ""
 
+# A row that could not be read into an entry, index is its position in the rows given
+RowError = namedtuple('RowError', ['index', 'row', 'error'])
+
 AVAILABLE_FIELDS = {"Name": "recipient_name",
                     "Street Address": "full_street_address",
                     "City State Postal Code": "city_state_zip",
@@ -33,17 +39,51 @@ ALL_ADDRESS_SETS = (ADDRESS_SET_1,
                     ADDRESS_SET_6)
 
 
-def parse_data_to_graticard_entry(data: list, column_map: list):
-    print('parsing')
-    fields_contained = [field for field in AVAILABLE_FIELDS if field in column_map]
-    entries = []
-    for entry in data:
-        extract = {AVAILABLE_FIELDS[option]: entry[column_map.index(option)] for option in fields_contained}
-        obj = GratiCardEntry()
-        obj.set_entry(**extract)
-        entries.append(obj)
-    print('parsed')
-    return entries
+def compile_column_map(column_map: list):
+    """
+    Compiles a column map once into a tuple of (column index, attribute)
+    pairs. The first column given for a field is the one that is read
+    """
+    plan = []
+    for field, attribute in AVAILABLE_FIELDS.items():
+        if field in column_map:
+            plan.append((column_map.index(field), attribute))
+    return tuple(plan)
+
+
+def format_row(row):
+    """Returns the text of a row read from a file, for messages"""
+    return row if isinstance(row, str) else " | ".join(row)
+
+
+def _iter_readable_rows(rows, plan: tuple, errors: list):
+    """Yields the rows holding every mapped column, the others are appended to errors as RowErrors"""
+    width = max(index for index, _ in plan) + 1 if plan else 0
+    for index, row in enumerate(rows):
+        if isinstance(row, str):
+            # e.g. a docx paragraph that matched no rule
+            errors.append(RowError(index, row, "Not split into columns"))
+        elif len(row) < width:
+            errors.append(RowError(index, row, "Expected {} columns, found {}".format(width, len(row))))
+        else:
+            yield row
+
+
+def iter_graticard_entries(rows, column_map: list, errors=None):
+    """
+    Yields one GratiCardEntry per row, reading the rows lazily. When an
+    errors list is given, rows that cannot be read are skipped and reported
+    in it instead of raising
+    """
+    plan = compile_column_map(column_map)
+    if errors is not None:
+        rows = _iter_readable_rows(rows, plan, errors)
+    return GratiCardEntry.from_rows(rows, plan)
+
+
+@timed("parse_entries")
+def parse_data_to_graticard_entry(data: list, column_map: list, errors=None):
+    return list(iter_graticard_entries(data, column_map, errors))
         
 
 def validate_column_map(column_map: list):
@@ -53,9 +93,8 @@ def validate_column_map(column_map: list):
     Notes:
         Column maps must have a "Name" element
     """
-    # reduce column map by removing blanks
-    for i in range(column_map.count(BLANK_FIELD)):
-        column_map.remove(BLANK_FIELD)
+    # reduce column map by removing blanks, leaving the caller's map intact
+    column_map = [field for field in column_map if field != BLANK_FIELD]
     
     # Check for unknown field
     for field in column_map:
@@ -0,0 +1,107 @@
+"""
+Created by Cameron Rogers
+"""
+from itertools import islice
+from pathlib import Path
+
+from column_inference import DEFAULT_SAMPLE_ROWS, infer_column_map
+from dedup import dedup_entries
+from export import export_entries
+from file_loaders import iter_csv_rows, load_docx_rows
+from instrumentation import timer
+from merge import MergeEngine
+from normalization import AddressNormalizationPool
+from parallel_csv import iter_large_csv_rows, reader_options, sniff_csv
+from parser import iter_graticard_entries, parse_data_to_graticard_entry, validate_column_map
+
+DEFAULT_DOCX_COLUMN_MAP = ["Name", "Gift"]
+
+
+def iter_parsed_entries(rows, column_map: list, failures=None, processes=None, deduplicator=None):
+    """
+    Validates the column map, then lazily parses each row to an entry and
+    normalizes its address on a process pool. Entries whose address cannot be
+    normalized are yielded unnormalized and reported in the failures list.
+    A dedup.Deduplicator drops duplicate entries before they are normalized
+    """
+    validate_column_map(column_map)
+    entries = iter_graticard_entries(rows, column_map)
+    if deduplicator is not None:
+        entries = deduplicator.iter_unique(entries)
+    with AddressNormalizationPool(processes) as pool:
+        yield from pool.imap(entries, failures)
+
+
+def parse_rows(rows, column_map: list, failures=None, progress=None, processes=None, duplicates=None,
+               errors=None):
+    """
+    Validates the column map, parses the rows to entries and normalizes their
+    addresses on a process pool. progress is called with (done, total) as
+    addresses are normalized. When a duplicates list is given, duplicate
+    entries are collapsed before normalization and their DuplicateGroups
+    appended to it. When an errors list is given, rows that cannot be read
+    are skipped and their parser.RowErrors appended to it
+    """
+    validate_column_map(column_map)
+    entries = parse_data_to_graticard_entry(rows, column_map, errors)
+    if duplicates is not None:
+        entries, groups = dedup_entries(entries)
+        duplicates.extend(groups)
+    with AddressNormalizationPool(processes) as pool:
+        batch_failures = pool.normalize(entries, progress)
+    if failures is not None:
+        failures.extend(batch_failures)
+    return entries
+
+
+def infer_csv_column_map(csv_path, sample_size=DEFAULT_SAMPLE_ROWS):
+    """Returns the ColumnGuess (see column_inference) of the first sample_size rows of a csv file"""
+    csv_format = sniff_csv(csv_path)
+    rows = iter_csv_rows(csv_path, csv_format.encoding, **reader_options(csv_format))
+    return infer_column_map(islice(rows, sample_size), sample_size)
+
+
+def _iter_with_gifts(entries, gifts_by_name: dict):
+    """Yields the entries, setting the gifts of the names matched"""
+    for entry in entries:
+        gift = gifts_by_name.get(entry.get_recipient_name())
+        if gift is not None:
+            entry.set_gift(gift)
+        yield entry
+
+
+def run_merge(csv_path, docx_path, csv_column_map: list, docx_column_map: list,
+              output_path, csv_skip_rows=0, failures=None, export_format=None, deduplicator=None,
+              processes=None, docx_errors=None):
+    """
+    Runs the full csv + docx merge without any ui and writes the result to
+    output_path in export_format (see export.export_entries). The csv file is
+    streamed twice so memory does not grow with its size: the first pass only
+    keeps its distinct recipient names, which a MergeEngine matches to the
+    gifts like in the ui so two guests never share a gift, and the second
+    streams the rows through parse and normalize, sets the matched gifts and
+    writes them. Large csv files are read by worker processes (see
+    parallel_csv). A dedup.Deduplicator drops the duplicate csv entries before
+    they are normalized. Returns the number of entries written. processes
+    bounds the worker processes the csv is read and normalized with. Docx
+    paragraphs matching no rule, or missing a mapped column, are skipped and
+    their parser.RowErrors appended to docx_errors
+    """
+    with timer("load", Path(docx_path).name):
+        docx_rows = load_docx_rows(docx_path)
+    docx_entries = parse_rows(docx_rows, docx_column_map, processes=processes,
+                              errors=[] if docx_errors is None else docx_errors)
+    validate_column_map(csv_column_map)
+    csv_name = Path(csv_path).name
+    engine = MergeEngine()
+    engine.add_gift_source(docx_entries, Path(docx_path).name)
+    with timer("scan_names", csv_name):
+        csv_rows = islice(iter_large_csv_rows(csv_path, processes=processes), csv_skip_rows, None)
+        names = {entry.get_recipient_name() for entry in iter_graticard_entries(csv_rows, csv_column_map)}
+    with timer("merge"):
+        gifts_by_name = engine.match_names(names)
+    csv_rows = islice(iter_large_csv_rows(csv_path, processes=processes), csv_skip_rows, None)
+    csv_entries = iter_parsed_entries(csv_rows, csv_column_map, failures, processes, deduplicator)
+    # The second pass is streamed, its load, normalize and export are timed together
+    with timer("merge_stream", csv_name):
+        return export_entries(_iter_with_gifts(csv_entries, gifts_by_name), output_path, export_format)
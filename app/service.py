@@ -0,0 +1,403 @@
+"""
+Created by Cameron Rogers
+
+Local service mode: an HTTP server on localhost that accepts merge jobs
+and runs them on a bounded pool of worker processes, so several customers
+can be processed at once without the ui. Workers share normalized
+addresses through the persistent address cache.
+
+    python service.py --port 8765 --workers 4
+
+    POST /jobs                 {"csv": "/path/guests.csv", "docx": "/path/gifts.docx",
+                                "column_maps": {"csv": [...], "docx": [...]},
+                                "skip_csv_rows": 1, "format": "csv", "dedup": true}
+    GET  /jobs                 status of every job
+    GET  /jobs/<id>            status of a job
+    GET  /jobs/<id>/result     the merged file once the job is done
+    DELETE /jobs/<id>          cancels a job that has not started
+
+Only "csv" and "docx" are required, the csv column map is inferred when
+column_maps is omitted (see column_inference). Paths are read by the
+server, which is why it only listens on the loopback interface. Web pages
+can reach that interface too, so every request must carry the token the
+service prints when it starts in an X-Service-Token header, name the
+service's own host and port in its Host header (no DNS rebinding), and
+jobs must be posted as application/json.
+"""
+import argparse
+import hmac
+import json
+import os
+import secrets
+import shutil
+import sys
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import CancelledError, ProcessPoolExecutor
+from http import HTTPStatus
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+from address_cache import AddressCache, default_data_dir, default_store_path, set_default_cache
+from dedup import Deduplicator, format_duplicate_report
+from export import EXPORT_FORMATS
+from parser import InvalidColumnMapError, format_row, validate_column_map
+from pipeline import DEFAULT_DOCX_COLUMN_MAP, infer_csv_column_map, run_merge
+
+HOST = "127.0.0.1"
+HOST_NAMES = (HOST, "localhost")
+TOKEN_HEADER = "X-Service-Token"
+JSON_CONTENT_TYPE = "application/json"
+DEFAULT_PORT = 8765
+DEFAULT_WORKERS = os.cpu_count() or 1
+# Jobs waiting for a worker, further submissions are refused until some finish
+DEFAULT_MAX_PENDING = 100
+# Finished jobs kept for polling, the oldest are forgotten first
+MAX_FINISHED_JOBS = 1000
+OUTPUT_DIR_NAME = "jobs"
+FORMAT_EXTENSIONS = {"csv": ".csv", "jsonl": ".jsonl", "columnar": ".json"}
+FORMAT_CONTENT_TYPES = {"csv": "text/csv", "jsonl": "application/x-ndjson", "columnar": "application/json"}
+
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+CANCELLED = "cancelled"
+
+
+class InvalidJobError(Exception):
+    pass
+
+
+class QueueFullError(Exception):
+    pass
+
+
+def _init_worker(address_store_path):
+    """Each worker process keeps its own cache in memory, backed by the shared store when there is one"""
+    set_default_cache(AddressCache(store_path=address_store_path))
+
+
+def run_job(request: dict, output_path: str):
+    """
+    Runs one merge job in a worker process and returns its summary. The job
+    already has the whole process, csv reading and normalization stay in it
+    """
+    csv_path, docx_path = request["csv"], request["docx"]
+    column_maps = request.get("column_maps") or {}
+    skip_rows = request.get("skip_csv_rows")
+    csv_column_map = column_maps.get("csv")
+    summary = {}
+    if csv_column_map is None:
+        guess = infer_csv_column_map(csv_path)
+        csv_column_map = guess.column_map
+        summary["confidences"] = guess.confidences
+        if skip_rows is None:
+            skip_rows = guess.header_rows
+    skip_rows = skip_rows or 0
+    failures = []
+    docx_errors = []
+    deduplicator = Deduplicator() if request.get("dedup") else None
+    entry_count = run_merge(csv_path, docx_path, csv_column_map,
+                            column_maps.get("docx", DEFAULT_DOCX_COLUMN_MAP), output_path,
+                            csv_skip_rows=skip_rows, failures=failures,
+                            export_format=request.get("format", "csv"), deduplicator=deduplicator,
+                            processes=1, docx_errors=docx_errors)
+    rows = None if deduplicator is None else deduplicator.kept_rows
+    summary.update({
+        "entries": entry_count,
+        "column_map": csv_column_map,
+        "failures": ["Row {} ({}): {}".format(
+            (failure.index if rows is None else rows[failure.index]) + skip_rows,
+            failure.entry.get_recipient_name(), failure.error) for failure in failures],
+        "skipped_docx_paragraphs": ["Paragraph {} ({}): {}".format(
+            error.index + 1, format_row(error.row), error.error) for error in docx_errors],
+        "duplicates": [] if deduplicator is None else format_duplicate_report(deduplicator.groups, skip_rows)})
+    return summary
+
+
+def validate_job_request(request):
+    """Raises an InvalidJobError unless request describes a job that can be run"""
+    if not isinstance(request, dict):
+        raise InvalidJobError("A job must be a json object")
+    for key in ("csv", "docx"):
+        if not isinstance(request.get(key), str):
+            raise InvalidJobError("'{}' must be the path of the {} file".format(key, key))
+        if not os.path.isfile(request[key]):
+            raise InvalidJobError("No such file: {}".format(request[key]))
+    if request.get("format", "csv") not in EXPORT_FORMATS:
+        raise InvalidJobError("Unknown format '{}'. Available formats are {}".format(
+            request["format"], list(EXPORT_FORMATS)))
+    skip_rows = request.get("skip_csv_rows")
+    if skip_rows is not None and (not isinstance(skip_rows, int) or skip_rows < 0):
+        raise InvalidJobError("'skip_csv_rows' must be a positive integer")
+    column_maps = request.get("column_maps") or {}
+    if not isinstance(column_maps, dict):
+        raise InvalidJobError("'column_maps' must be an object holding the 'csv' and 'docx' column maps")
+    for column_map in column_maps.values():
+        if not isinstance(column_map, list):
+            raise InvalidJobError("Column maps must be lists of field names")
+        try:
+            validate_column_map(column_map)
+        except InvalidColumnMapError as err:
+            raise InvalidJobError("Invalid column map: {}".format(err))
+
+
+class Job:
+    def __init__(self, job_id, request, output_path, future):
+        self.id = job_id
+        self.request = request
+        self.output_path = output_path
+        self.future = future
+        self.submitted = time.time()
+        self.finished = None
+
+    def get_status(self):
+        if self.future.cancelled():
+            return CANCELLED
+        if self.future.done():
+            return FAILED if self.future.exception() is not None else DONE
+        return RUNNING if self.future.running() else QUEUED
+
+    def to_json(self):
+        status = self.get_status()
+        job = {"id": self.id, "status": status, "request": self.request, "submitted": self.submitted,
+               "finished": self.finished}
+        if status == DONE:
+            job.update(self.future.result())
+        elif status == FAILED:
+            job["error"] = str(self.future.exception())
+        return job
+
+
+class JobQueue:
+    """
+    Runs merge jobs on at most workers processes. At most max_pending jobs
+    wait for a worker, submit raises QueueFullError beyond that
+    """
+    def __init__(self, output_dir, workers=DEFAULT_WORKERS, max_pending=DEFAULT_MAX_PENDING,
+                 address_store_path=None):
+        self.output_dir = Path(output_dir)
+        self.output_dir.mkdir(parents=True, exist_ok=True)
+        self.workers = workers
+        self.max_pending = max_pending
+        self._executor = ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                             initargs=(None if address_store_path is None
+                                                       else str(address_store_path),))
+        self._jobs = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self, wait=True):
+        self._executor.shutdown(wait=wait, cancel_futures=True)
+
+    def submit(self, request: dict):
+        """Validates and queues a job request, returns its Job"""
+        validate_job_request(request)
+        with self._lock:
+            unfinished = sum(1 for job in self._jobs.values() if not job.future.done())
+            if unfinished >= self.workers + self.max_pending:
+                raise QueueFullError("{} jobs are already queued".format(unfinished))
+            job_id = uuid.uuid4().hex
+            output_path = self.output_dir / (job_id + FORMAT_EXTENSIONS[request.get("format", "csv")])
+            future = self._executor.submit(run_job, request, str(output_path))
+            job = self._jobs[job_id] = Job(job_id, request, output_path, future)
+            self._forget_finished()
+        future.add_done_callback(lambda _: setattr(job, "finished", time.time()))
+        return job
+
+    def get(self, job_id):
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def jobs(self):
+        with self._lock:
+            return list(self._jobs.values())
+
+    def cancel(self, job_id):
+        """Cancels a job that has not started, returns whether it was cancelled"""
+        job = self.get(job_id)
+        return job is not None and job.future.cancel()
+
+    def wait(self, job_id, timeout=None):
+        """Blocks until a job is finished and returns it"""
+        job = self.get(job_id)
+        try:
+            job.future.exception(timeout)
+        except CancelledError:
+            pass
+        return job
+
+    def _forget_finished(self):
+        finished = [job_id for job_id, job in self._jobs.items() if job.future.done()]
+        for job_id in finished[:max(0, len(finished) - MAX_FINISHED_JOBS)]:
+            job = self._jobs.pop(job_id)
+            if job.output_path.exists():
+                job.output_path.unlink()
+
+
+class ServiceRequestHandler(BaseHTTPRequestHandler):
+    server_version = "GratiCardService/1.0"
+
+    def do_GET(self):  # pylint: disable=invalid-name
+        if not self._is_authorized():
+            return
+        parts = self.path.strip('/').split('/')
+        if parts == ["jobs"]:
+            self._send_json([job.to_json() for job in self.server.job_queue.jobs()])
+            return
+        job = self._get_job(parts)
+        if job is None:
+            return
+        if len(parts) == 2:
+            self._send_json(job.to_json())
+        elif job.get_status() != DONE:
+            self._send_error(HTTPStatus.CONFLICT, "Job {} is {}".format(job.id, job.get_status()))
+        else:
+            self.send_response(HTTPStatus.OK)
+            self.send_header("Content-Type", FORMAT_CONTENT_TYPES[job.request.get("format", "csv")])
+            self.send_header("Content-Length", str(job.output_path.stat().st_size))
+            self.end_headers()
+            with open(job.output_path, 'rb') as fh:
+                shutil.copyfileobj(fh, self.wfile)
+
+    def do_POST(self):  # pylint: disable=invalid-name
+        if not self._is_authorized():
+            return
+        if self.path.strip('/') != "jobs":
+            self._send_error(HTTPStatus.NOT_FOUND, "Unknown path {}".format(self.path))
+            return
+        # Forms and simple cross-site requests cannot send json
+        content_type = self.headers.get("Content-Type", "").split(';')[0].strip().lower()
+        if content_type != JSON_CONTENT_TYPE:
+            self._send_error(HTTPStatus.UNSUPPORTED_MEDIA_TYPE,
+                             "Jobs must be posted as {}".format(JSON_CONTENT_TYPE))
+            return
+        try:
+            request = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b'null')
+            job = self.server.job_queue.submit(request)
+        except (ValueError, InvalidJobError) as err:
+            self._send_error(HTTPStatus.BAD_REQUEST, str(err))
+            return
+        except QueueFullError as err:
+            self._send_error(HTTPStatus.SERVICE_UNAVAILABLE, str(err))
+            return
+        self._send_json(job.to_json(), HTTPStatus.ACCEPTED)
+
+    def do_DELETE(self):  # pylint: disable=invalid-name
+        if not self._is_authorized():
+            return
+        parts = self.path.strip('/').split('/')
+        job = self._get_job(parts)
+        if job is None:
+            return
+        if len(parts) != 2:
+            self.send_response(HTTPStatus.METHOD_NOT_ALLOWED)
+            self.send_header("Allow", "GET")
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        if not self.server.job_queue.cancel(job.id):
+            self._send_error(HTTPStatus.CONFLICT, "Job {} is {}".format(job.id, job.get_status()))
+            return
+        self._send_json(job.to_json())
+
+    def _is_authorized(self):
+        """Checks the Host and token headers, sends an error and returns False when they are wrong"""
+        port = self.server.server_address[1]
+        if self.headers.get("Host", "").lower() not in ["{}:{}".format(name, port) for name in HOST_NAMES]:
+            self._send_error(HTTPStatus.FORBIDDEN, "Unknown host {}".format(self.headers.get("Host")))
+            return False
+        if not hmac.compare_digest(self.headers.get(TOKEN_HEADER, ""), self.server.token):
+            self._send_error(HTTPStatus.UNAUTHORIZED, "Missing or wrong {} header".format(TOKEN_HEADER))
+            return False
+        return True
+
+    def _get_job(self, parts):
+        """Returns the job of a /jobs/<id>[/result] path, or sends a 404 and returns None"""
+        job = None
+        if len(parts) in (2, 3) and parts[0] == "jobs" and parts[2:] in ([], ["result"]):
+            job = self.server.job_queue.get(parts[1])
+        if job is None:
+            self._send_error(HTTPStatus.NOT_FOUND, "Unknown path {}".format(self.path))
+        return job
+
+    def _send_json(self, body, status=HTTPStatus.OK):
+        data = json.dumps(body).encode('utf-8')
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _send_error(self, status, message):
+        self._send_json({"error": message}, status)
+
+    def log_message(self, format, *args):  # pylint: disable=redefined-builtin
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+
+class MergeService(ThreadingHTTPServer):
+    """
+    HTTP front end of a JobQueue, listening on the loopback interface only.
+    Requests must carry token, a new random one unless given
+    """
+    daemon_threads = True
+
+    def __init__(self, job_queue, port=DEFAULT_PORT, verbose=False, token=None):
+        super().__init__((HOST, port), ServiceRequestHandler)
+        self.job_queue = job_queue
+        self.verbose = verbose
+        self.token = token or secrets.token_urlsafe()
+
+    @property
+    def url(self):
+        return "http://{}:{}".format(*self.server_address[:2])
+
+
+def main(argv=None):
+    arg_parser = argparse.ArgumentParser(description="Serve merge jobs on localhost")
+    arg_parser.add_argument('--port', type=int, default=DEFAULT_PORT)
+    arg_parser.add_argument('--workers', type=int, default=DEFAULT_WORKERS,
+                            help="jobs run at once, one process each (default: {})".format(DEFAULT_WORKERS))
+    arg_parser.add_argument('--max-pending', type=int, default=DEFAULT_MAX_PENDING,
+                            help="jobs that may wait for a worker before submissions are refused")
+    arg_parser.add_argument('--output-dir', default=str(default_data_dir() / OUTPUT_DIR_NAME),
+                            help="directory the merged files are written to")
+    arg_parser.add_argument('--address-cache', default=str(default_store_path()),
+                            help="sqlite file the workers share normalized addresses through")
+    arg_parser.add_argument('--no-address-cache', action='store_true',
+                            help="only cache normalized addresses in the memory of each worker")
+    arg_parser.add_argument('--token-file', default=None,
+                            help="file to write the token of this run to, readable by the owner only")
+    arg_parser.add_argument('--verbose', action='store_true', help="log every request")
+    args = arg_parser.parse_args(argv)
+
+    address_store_path = None if args.no_address_cache else args.address_cache
+    with JobQueue(args.output_dir, args.workers, args.max_pending, address_store_path) as job_queue:
+        service = MergeService(job_queue, args.port, args.verbose)
+        print("Serving merge jobs on {} with {} worker(s)".format(service.url, args.workers), file=sys.stderr)
+        print("{}: {}".format(TOKEN_HEADER, service.token), file=sys.stderr)
+        if args.token_file:
+            fd = os.open(args.token_file, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+            with os.fdopen(fd, 'w') as fh:
+                fh.write(service.token)
+        try:
+            service.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            service.server_close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,135 @@
+"""
+Created by Cameron Rogers
+"""
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+import zlib
+from collections import namedtuple
+from pathlib import Path
+
+from address_cache import default_data_dir
+from graticard_entry import GratiCardEntry
+
+DEFAULT_MAX_FILE_STATES = 200
+STATE_STORE_FILE_NAME = 'file_states.sqlite3'
+SESSION_FILE_EXTENSION = 'gcsession'
+
+# Work done on one input file. entries is the list of parsed GratiCardEntry
+FileState = namedtuple('FileState', ['path', 'content_hash', 'status', 'column_map', 'removed_row_ids',
+                                     'entries'])
+
+
+def default_state_store_path():
+    """Returns the path of the store remembering the state of every parsed file"""
+    return default_data_dir() / STATE_STORE_FILE_NAME
+
+
+def file_content_hash(file_path, block_size=1 << 20):
+    """Returns the sha256 hex digest of a file's content"""
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as fh:
+        for block in iter(lambda: fh.read(block_size), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _pack_entries(entries):
+    return zlib.compress(json.dumps([entry.to_state() for entry in entries],
+                                    separators=(',', ':')).encode('utf-8'))
+
+
+def _unpack_entries(blob):
+    return [GratiCardEntry.from_state(state) for state in json.loads(zlib.decompress(blob).decode('utf-8'))]
+
+
+class SessionStore:
+    """
+    SQLite store of FileStates keyed on the content hash of the file, so the
+    parsed entries, column map and removed rows of a file are found again
+    whatever its path is, and never for a file whose content changed. Entries
+    are stored as a compressed json blob per file.
+
+    The same store also holds the ordered list of files of a session, see
+    save_session / load_session. At most max_file_states states are kept,
+    least recently saved first out.
+    """
+    def __init__(self, store_path, max_file_states=DEFAULT_MAX_FILE_STATES):
+        self.max_file_states = max_file_states
+        self._lock = threading.Lock()
+        Path(store_path).parent.mkdir(parents=True, exist_ok=True)
+        self._connection = sqlite3.connect(str(store_path), check_same_thread=False)
+        self._connection.executescript(
+            "CREATE TABLE IF NOT EXISTS file_states ("
+            " content_hash TEXT PRIMARY KEY, path TEXT, status TEXT, column_map TEXT,"
+            " removed_row_ids TEXT, entries BLOB, saved_at REAL);"
+            "CREATE TABLE IF NOT EXISTS session_files ("
+            " position INTEGER PRIMARY KEY, path TEXT NOT NULL, content_hash TEXT NOT NULL);")
+        self._connection.commit()
+
+    def close(self):
+        if self._connection is not None:
+            self._connection.close()
+            self._connection = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def save_file_state(self, state: FileState):
+        with self._lock:
+            self._save(state)
+            self._evict()
+            self._connection.commit()
+
+    def load_file_state(self, content_hash: str):
+        """Returns the FileState saved for a content hash or None"""
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT path, status, column_map, removed_row_ids, entries FROM file_states"
+                " WHERE content_hash = ?", (content_hash,)).fetchone()
+        if row is None:
+            return None
+        file_path, status, column_map, removed_row_ids, entries = row
+        return FileState(file_path, content_hash, status,
+                         None if column_map is None else json.loads(column_map),
+                         json.loads(removed_row_ids),
+                         [] if entries is None else _unpack_entries(entries))
+
+    def save_session(self, states: list):
+        """Replaces the session with the given FileStates, in order"""
+        with self._lock:
+            self._connection.execute("DELETE FROM session_files")
+            for position, state in enumerate(states):
+                self._save(state)
+                self._connection.execute(
+                    "INSERT INTO session_files (position, path, content_hash) VALUES (?, ?, ?)",
+                    (position, state.path, state.content_hash))
+            self._connection.commit()
+
+    def load_session(self):
+        """Returns the (path, content hash) of every file of the session, in order"""
+        with self._lock:
+            return self._connection.execute(
+                "SELECT path, content_hash FROM session_files ORDER BY position").fetchall()
+
+    def _save(self, state):
+        self._connection.execute(
+            "INSERT OR REPLACE INTO file_states"
+            " (content_hash, path, status, column_map, removed_row_ids, entries, saved_at)"
+            " VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (state.content_hash, state.path, state.status,
+             None if state.column_map is None else json.dumps(state.column_map),
+             json.dumps(sorted(state.removed_row_ids)),
+             _pack_entries(state.entries), time.time()))
+
+    def _evict(self):
+        self._connection.execute(
+            "DELETE FROM file_states WHERE content_hash NOT IN"
+            " (SELECT content_hash FROM file_states ORDER BY saved_at DESC LIMIT ?)"
+            " AND content_hash NOT IN (SELECT content_hash FROM session_files)",
+            (self.max_file_states,))
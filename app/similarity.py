@@ -0,0 +1,252 @@
+"""
+Created by Cameron Rogers
+
+Batch name similarity and one-to-one assignment for the fuzzy merge pass.
+
+Scoring backends turn a list of query names and a list of choice names
+into the (query index, choice index, score) edges scoring above a cutoff:
+
+- "rapidfuzz" scores the whole query x choice matrix at once with
+  rapidfuzz.process.cdist into a NumPy array, across all cores. Used when
+  rapidfuzz and numpy are installed
+- "python" scores with fuzzywuzzy the choices each query can score above
+  the cutoff with, see NameMatcher, optionally on a process pool
+
+assign_one_to_one then picks the set of edges with the highest total score
+in which every query and every choice is used at most once.
+"""
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+from name_matcher import NameMatcher, normalize_name
+
+DEFAULT_SCORE_CUTOFF = 80
+# Queries scored per task when the python backend runs on a process pool
+PYTHON_CHUNK_SIZE = 256
+# Queries per rapidfuzz score matrix, bounds its memory to MATRIX_CHUNK_SIZE x choices floats
+MATRIX_CHUNK_SIZE = 1024
+# Choices a query competes for in the assignment, its best scoring ones
+MAX_EDGES_PER_QUERY = 5
+# Largest component solved with the pure-python hungarian, larger ones are assigned greedily
+HUNGARIAN_MAX_SIZE = 150
+
+_worker_matcher = None
+
+
+def _init_worker(choices, score_cutoff):
+    global _worker_matcher  # pylint: disable=global-statement
+    _worker_matcher = NameMatcher(choices, score_cutoff=score_cutoff)
+
+
+def _score_chunk(start, queries):
+    return [(start + row, column, score)
+            for row, query in enumerate(queries)
+            for column, score in _worker_matcher.extract(query)]
+
+
+def python_score_edges(queries: list, choices: list, score_cutoff=DEFAULT_SCORE_CUTOFF, workers=1):
+    """Scores with fuzzywuzzy over the NameMatcher candidates of each query"""
+    workers = workers or os.cpu_count() or 1
+    chunks = [(start, queries[start:start + PYTHON_CHUNK_SIZE])
+              for start in range(0, len(queries), PYTHON_CHUNK_SIZE)]
+    if workers == 1 or len(chunks) <= 1:
+        _init_worker(choices, score_cutoff)
+        results = [_score_chunk(start, chunk) for start, chunk in chunks]
+    else:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                 initargs=(choices, score_cutoff)) as executor:
+            results = list(executor.map(_score_chunk, *zip(*chunks)))
+    return [edge for chunk_edges in results for edge in chunk_edges]
+
+
+def rapidfuzz_score_edges(queries: list, choices: list, score_cutoff=DEFAULT_SCORE_CUTOFF, workers=1):
+    """Scores the full matrix with rapidfuzz's WRatio, workers=None uses every core"""
+    import numpy
+    from rapidfuzz import fuzz, process
+    if not queries or not choices:
+        return []
+    queries = [normalize_name(query) for query in queries]
+    choices = [normalize_name(choice) for choice in choices]
+    edges = []
+    for start in range(0, len(queries), MATRIX_CHUNK_SIZE):
+        matrix = process.cdist(queries[start:start + MATRIX_CHUNK_SIZE], choices,
+                               scorer=fuzz.WRatio, processor=None, score_cutoff=score_cutoff,
+                               dtype=numpy.float32, workers=-1 if workers is None else workers)
+        rows, columns = numpy.nonzero(matrix > score_cutoff)
+        edges.extend((start + int(row), int(column), float(matrix[row, column]))
+                     for row, column in zip(rows, columns))
+    return edges
+
+
+SIMILARITY_BACKENDS = {"python": python_score_edges,
+                       "rapidfuzz": rapidfuzz_score_edges}
+
+
+def default_backend():
+    """Returns "rapidfuzz" when rapidfuzz and numpy can be imported, otherwise "python" """
+    try:
+        import numpy  # noqa: F401 pylint: disable=unused-import,import-outside-toplevel
+        import rapidfuzz  # noqa: F401 pylint: disable=unused-import,import-outside-toplevel
+    except ImportError:
+        return "python"
+    return "rapidfuzz"
+
+
+def score_edges(queries: list, choices: list, score_cutoff=DEFAULT_SCORE_CUTOFF, workers=1, backend=None):
+    """
+    Returns the (query index, choice index, score) of every pair of names
+    scoring above score_cutoff with the given backend (default_backend() when
+    None). workers=None uses every core
+    """
+    backend = backend or default_backend()
+    if backend not in SIMILARITY_BACKENDS:
+        raise ValueError("Unknown similarity backend '{}'. Available backends are {}".format(
+            backend, list(SIMILARITY_BACKENDS)))
+    return SIMILARITY_BACKENDS[backend](queries, choices, score_cutoff, workers)
+
+
+def hungarian(scores: list):
+    """
+    Solves the assignment problem on a rectangular matrix (list of rows) of
+    scores, maximizing the total. Returns the assigned column of each row,
+    or None for rows left out when there are more rows than columns
+    """
+    if not scores or not scores[0]:
+        return [None] * len(scores)
+    if len(scores) > len(scores[0]):
+        transposed = hungarian([list(column) for column in zip(*scores)])
+        assigned = [None] * len(scores)
+        for column, row in enumerate(transposed):
+            if row is not None:
+                assigned[row] = column
+        return assigned
+
+    # Kuhn-Munkres with potentials on costs (highest score = lowest cost), rows <= columns
+    row_count, column_count = len(scores), len(scores[0])
+    highest = max(max(row) for row in scores)
+    infinity = float('inf')
+    row_potential = [0.0] * (row_count + 1)
+    column_potential = [0.0] * (column_count + 1)
+    column_row = [0] * (column_count + 1)
+    way = [0] * (column_count + 1)
+    for row in range(1, row_count + 1):
+        column_row[0] = row
+        column = 0
+        min_slack = [infinity] * (column_count + 1)
+        used = [False] * (column_count + 1)
+        while True:
+            used[column] = True
+            current_row = column_row[column]
+            delta = infinity
+            next_column = 0
+            for candidate in range(1, column_count + 1):
+                if used[candidate]:
+                    continue
+                slack = (highest - scores[current_row - 1][candidate - 1]
+                         - row_potential[current_row] - column_potential[candidate])
+                if slack < min_slack[candidate]:
+                    min_slack[candidate] = slack
+                    way[candidate] = column
+                if min_slack[candidate] < delta:
+                    delta = min_slack[candidate]
+                    next_column = candidate
+            for candidate in range(column_count + 1):
+                if used[candidate]:
+                    row_potential[column_row[candidate]] += delta
+                    column_potential[candidate] -= delta
+                else:
+                    min_slack[candidate] -= delta
+            column = next_column
+            if column_row[column] == 0:
+                break
+        while column:
+            previous_column = way[column]
+            column_row[column] = column_row[previous_column]
+            column = previous_column
+
+    assigned = [None] * row_count
+    for column in range(1, column_count + 1):
+        if column_row[column]:
+            assigned[column_row[column] - 1] = column - 1
+    return assigned
+
+
+def greedy(scores: list):
+    """Assigns the highest remaining score first. Fast but not always optimal"""
+    cells = sorted(((score, row, column) for row, scores_row in enumerate(scores)
+                    for column, score in enumerate(scores_row) if score > 0), reverse=True)
+    assigned = [None] * len(scores)
+    used_columns = set()
+    for _, row, column in cells:
+        if assigned[row] is None and column not in used_columns:
+            assigned[row] = column
+            used_columns.add(column)
+    return assigned
+
+
+def _solve(scores: list):
+    """Returns the assigned column of each row, with scipy's solver when it is installed"""
+    try:
+        import numpy
+        from scipy.optimize import linear_sum_assignment
+    except ImportError:
+        if max(len(scores), len(scores[0])) > HUNGARIAN_MAX_SIZE:
+            return greedy(scores)
+        return hungarian(scores)
+    rows, columns = linear_sum_assignment(numpy.array(scores), maximize=True)
+    assigned = [None] * len(scores)
+    for row, column in zip(rows, columns):
+        assigned[row] = int(column)
+    return assigned
+
+
+def assign_one_to_one(edges, max_edges_per_query=MAX_EDGES_PER_QUERY):
+    """
+    Returns {query index: (choice index, score)} for the set of edges with
+    the highest total score that uses every query and every choice at most
+    once. Only the max_edges_per_query best edges of each query are kept and
+    the edges are split into connected components, so the assignment
+    problems stay as small as the groups of similar names. Without scipy,
+    components larger than HUNGARIAN_MAX_SIZE are assigned greedily
+    """
+    by_query = {}
+    for edge in edges:
+        by_query.setdefault(edge[0], []).append(edge)
+    edges = []
+    for query_edges in by_query.values():
+        query_edges.sort(key=lambda edge: -edge[2])
+        edges.extend(query_edges[:max_edges_per_query])
+
+    parent = {}
+
+    def find(node):
+        while parent.setdefault(node, node) != node:
+            parent[node] = parent[parent[node]]
+            node = parent[node]
+        return node
+
+    for row, column, _ in edges:
+        parent[find(('row', row))] = find(('column', column))
+
+    components = {}
+    for edge in edges:
+        components.setdefault(find(('row', edge[0])), []).append(edge)
+
+    assignment = {}
+    for component in components.values():
+        if len(component) == 1:
+            row, column, score = component[0]
+            assignment[row] = (column, score)
+            continue
+        rows = sorted({row for row, _, _ in component})
+        columns = sorted({column for _, column, _ in component})
+        row_index = {row: index for index, row in enumerate(rows)}
+        column_index = {column: index for index, column in enumerate(columns)}
+        scores = [[0] * len(columns) for _ in rows]
+        for row, column, score in component:
+            scores[row_index[row]][column_index[column]] = score
+        for index, assigned in enumerate(_solve(scores)):
+            # Pairs without an edge only pad the matrix
+            if assigned is not None and scores[index][assigned] > 0:
+                assignment[rows[index]] = (columns[assigned], scores[index][assigned])
+    return assignment
@@ -0,0 +1,131 @@
+"""
+Created by Cameron Rogers
+
+Generates synthetic guest lists (csv) and gift lists (docx) for benchmarks
+and tests. Gift list names can carry controlled typos so the fuzzy merge
+path is exercised.
+"""
+import csv
+import random
+import zipfile
+from xml.sax.saxutils import escape
+
+FIRST_NAMES = ["Alan", "Diane", "Jesse", "Judd", "Bonnie", "Bob", "Jeanne", "Mary", "Kate", "Luis",
+               "Chris", "Karla", "Brett", "Jamie", "Adam", "Emily", "Gloria", "Ron", "Devon", "Marissa",
+               "Peggy", "Luke", "Rod", "Becki", "Rachel", "Bill", "Cynthia", "Justin", "Amy", "Nora"]
+LAST_NAMES = ["Sindelar", "Davis", "Dahlheim", "Taylor", "Vosler", "Hoops", "Hedquist", "Madsen",
+              "Martin", "Shimabukuro", "Kluthe", "Naeger", "Johnson", "Garcia", "Nguyen", "Smith",
+              "Olsen", "Kowalski", "Brandt", "Reyes"]
+STREETS = ["Mulberry", "Hudspith", "Shirley", "Legge Lake", "Arctic", "Collins", "Buckingham",
+           "Maunaloa", "Main", "Oak", "Maple", "Cedar", "Pine", "Elm", "Walnut", "Chestnut"]
+STREET_SUFFIXES = ["St", "Ave", "Dr", "Rd", "Ln", "Blvd", "Ct"]
+CITIES = [("North Bend", "NE", "68649"), ("Valley", "NE", "68064"), ("Omaha", "NE", "68106"),
+          ("Lincoln", "NE", "68521"), ("Fremont", "NE", "68025"), ("Topeka", "KS", "66604"),
+          ("Honolulu", "HI", "96816"), ("Ames", "IA", "50010"), ("Denver", "CO", "80202")]
+GIFTS = ["Queen sheet set", "Wall decor", "King mattress pad", "Chess/Checker set", "Cutting board",
+         "Popcorn popper", "Amazon gift card", "$100", "$50", "Mixing bowls", "K-cup drawer"]
+
+GUEST_HEADER = ["Name", "Address", "City", "State", "Zip"]
+GUEST_COLUMN_MAP = ["Name", "Address Line 1", "City", "State", "Postal Code"]
+GIFT_COLUMN_MAP = ["Name", "Gift"]
+
+_CONTENT_TYPES = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+    '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+    '<Default Extension="xml" ContentType="application/xml"/>'
+    '<Override PartName="/word/document.xml" ContentType="application/'
+    'vnd.openxmlformats-officedocument.wordprocessingml.document.main+xml"/>'
+    '</Types>')
+_RELATIONSHIPS = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+    '<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/'
+    'relationships/officeDocument" Target="word/document.xml"/>'
+    '</Relationships>')
+_DOCUMENT_START = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<w:document xmlns:w="http://schemas.openxmlformats.org/wordprocessingml/2006/main"><w:body>')
+_DOCUMENT_END = '</w:body></w:document>'
+
+
+def add_typo(name: str, rng: random.Random):
+    """Returns the name with one letter substituted, dropped or swapped with its neighbour"""
+    positions = [i for i, char in enumerate(name) if char.isalpha()]
+    if len(positions) < 2:
+        return name
+    position = rng.choice(positions[:-1])
+    kind = rng.randrange(3)
+    if kind == 0:
+        return name[:position] + rng.choice("abcdefghijklmnopqrstuvwxyz") + name[position + 1:]
+    if kind == 1:
+        return name[:position] + name[position + 1:]
+    return name[:position] + name[position + 1] + name[position] + name[position + 2:]
+
+
+def generate_guests(count: int, seed=0):
+    """Returns count guest rows laid out as GUEST_HEADER"""
+    rng = random.Random(seed)
+    guests = []
+    for i in range(count):
+        last_name = rng.choice(LAST_NAMES)
+        if rng.random() < 0.4:
+            name = "{} and {} {}".format(rng.choice(FIRST_NAMES), rng.choice(FIRST_NAMES), last_name)
+        else:
+            name = "{} {}".format(rng.choice(FIRST_NAMES), last_name)
+        # Keep names unique so every guest has exactly one gift
+        name = "{} {}".format(name, _suffix(i))
+        street = "{} {} {}.".format(rng.randrange(1, 9999), rng.choice(STREETS), rng.choice(STREET_SUFFIXES))
+        city, state, postal_code = rng.choice(CITIES)
+        guests.append([name, street, city, state, postal_code])
+    return guests
+
+
+def _suffix(number: int):
+    letters = ""
+    number += 1
+    while number:
+        number, remainder = divmod(number - 1, 26)
+        letters = chr(ord('A') + remainder) + letters
+    return letters
+
+
+def generate_gifts(guests: list, typo_rate=0.1, seed=0):
+    """Returns one (name, gift) pair per guest, with typo_rate of the names misspelt"""
+    rng = random.Random(seed)
+    gifts = []
+    for guest in guests:
+        name = guest[0]
+        if rng.random() < typo_rate:
+            name = add_typo(name, rng)
+        gifts.append((name, rng.choice(GIFTS)))
+    return gifts
+
+
+def write_guest_csv(file_path, guests: list):
+    with open(file_path, 'w', newline='', encoding='latin-1') as fh:
+        csvwriter = csv.writer(fh)
+        csvwriter.writerow(GUEST_HEADER)
+        csvwriter.writerows(guests)
+
+
+def write_gift_docx(file_path, gifts: list):
+    """Writes a minimal docx with one 'name -- gift' paragraph per gift"""
+    with zipfile.ZipFile(file_path, 'w', zipfile.ZIP_DEFLATED) as archive:
+        archive.writestr('[Content_Types].xml', _CONTENT_TYPES)
+        archive.writestr('_rels/.rels', _RELATIONSHIPS)
+        paragraphs = ''.join(
+            '<w:p><w:r><w:t xml:space="preserve">{}</w:t></w:r></w:p>'.format(
+                escape("{} -- {}".format(name, gift)))
+            for name, gift in gifts)
+        archive.writestr('word/document.xml', _DOCUMENT_START + paragraphs + _DOCUMENT_END)
+
+
+def write_dataset(directory, count: int, typo_rate=0.1, seed=0):
+    """Writes a guest csv and a gift docx of count guests into directory and returns their paths"""
+    guests = generate_guests(count, seed)
+    csv_path = directory / "guests_{}.csv".format(count)
+    docx_path = directory / "gifts_{}.docx".format(count)
+    write_guest_csv(csv_path, guests)
+    write_gift_docx(docx_path, generate_gifts(guests, typo_rate, seed))
+    return csv_path, docx_path
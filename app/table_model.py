@@ -0,0 +1,51 @@
+"""
+Created by Cameron Rogers
+"""
+from PySide2 import QtCore
+
+
+class RowTableModel(QtCore.QAbstractTableModel):
+    """
+    Read-only table model over a list of data rows. The view only asks for
+    the cells it draws, so no per-cell items are created.
+
+    Row 0 is left empty to hold the column role combo boxes, data row i is
+    shown as table row i+1. The model shares the rows list it is given, so
+    removing rows here removes them from the handler's data as well.
+    """
+    HEADER_ROW_COUNT = 1
+
+    def __init__(self, rows: list, column_count: int, parent=None):
+        super().__init__(parent)
+        self._rows = rows
+        self._column_count = column_count
+
+    def rowCount(self, parent=QtCore.QModelIndex()):
+        if parent.isValid():
+            return 0
+        return len(self._rows) + self.HEADER_ROW_COUNT
+
+    def columnCount(self, parent=QtCore.QModelIndex()):
+        if parent.isValid():
+            return 0
+        return self._column_count
+
+    def data(self, index, role=QtCore.Qt.DisplayRole):
+        if role != QtCore.Qt.DisplayRole or not index.isValid():
+            return None
+        if index.row() < self.HEADER_ROW_COUNT:
+            return None
+        row = self._rows[index.row() - self.HEADER_ROW_COUNT]
+        if index.column() < len(row):
+            return row[index.column()]
+        return None
+
+    def removeRows(self, row, count, parent=QtCore.QModelIndex()):
+        """Removes count data rows starting at table row, which must be below the combo box row"""
+        if row < self.HEADER_ROW_COUNT or count <= 0 or row + count > self.rowCount():
+            return False
+        self.beginRemoveRows(parent, row, row + count - 1)
+        first = row - self.HEADER_ROW_COUNT
+        del self._rows[first:first + count]
+        self.endRemoveRows()
+        return True
@@ -0,0 +1,72 @@
+"""
+Created by Cameron Rogers
+"""
+import pytest
+import address_cache
+from address_cache import AddressCache, canonicalize_address
+
+ADDRESS = "123 Abc st., new york, ny 12345"
+
+
+def test_canonicalize_address():
+    assert canonicalize_address(ADDRESS) == "123 ABC ST NEW YORK NY 12345"
+
+
+def test_normalize_hits_and_misses():
+    cache = AddressCache()
+    parsed = cache.normalize(ADDRESS)
+    assert cache.normalize("123 ABC ST NEW YORK NY 12345") is parsed
+    assert cache.stats() == {"hits": 1, "misses": 1, "size": 1}
+
+
+def test_unparseable_address_not_cached():
+    cache = AddressCache()
+    for _ in range(2):
+        with pytest.raises(Exception):
+            cache.normalize("not an address")
+    assert len(cache) == 0
+
+
+def test_lru_eviction():
+    cache = AddressCache(max_size=2)
+    cache.store_many([("a", {"n": 1}), ("b", {"n": 2})])
+    cache.lookup("a")
+    cache.store("c", {"n": 3})
+    assert cache.lookup("b") is None
+    assert cache.lookup("a") == {"n": 1}
+
+
+def test_persistent_store(tmp_path):
+    store_path = tmp_path / "cache" / "address_cache.sqlite3"
+    cache = AddressCache(store_path=store_path, max_store_size=2)
+    parsed = cache.normalize(ADDRESS)
+    cache.store_many([("b", {"n": 2}), ("c", {"n": 3})])
+    cache.close()
+
+    reopened = AddressCache(store_path=store_path)
+    assert reopened.lookup("c") == {"n": 3}
+    assert reopened.lookup(ADDRESS) is None
+    assert reopened.stats()["hits"] == 1
+    reopened.store(ADDRESS, parsed)
+    assert reopened.lookup(ADDRESS) == parsed
+    reopened.flush()
+    assert AddressCache(store_path=store_path).lookup(ADDRESS) == parsed
+
+
+def test_store_writes_in_batches(tmp_path, monkeypatch):
+    monkeypatch.setattr(address_cache, "STORE_BATCH_SIZE", 3)
+    store_path = tmp_path / "address_cache.sqlite3"
+    cache = AddressCache(max_size=1, store_path=store_path, max_store_size=3)
+    cache.store_many([("a", {"n": 1}), ("b", {"n": 2})])
+    # Unwritten addresses are still found after leaving the memory cache
+    assert cache.lookup("a") == {"n": 1}
+    assert AddressCache(store_path=store_path).lookup("a") is None
+    for key in "cd":
+        cache.store(key, {"n": key})
+    assert AddressCache(store_path=store_path).lookup("c") == {"n": "c"}
+    assert AddressCache(store_path=store_path).lookup("d") is None
+    cache.close()
+    reopened = AddressCache(store_path=store_path)
+    assert reopened.lookup("d") == {"n": "d"}
+    # Only the 3 newest addresses are kept
+    assert reopened.lookup("a") is None
@@ -0,0 +1,72 @@
+"""
+Created by Cameron Rogers
+"""
+import pytest
+from column_inference import content_scores, header_field, infer_column_map, is_header_row
+from file_loaders import load_csv_rows
+from parser import InvalidColumnMapError
+from synthetic_data import GUEST_COLUMN_MAP, GUEST_HEADER, generate_guests
+
+DATA_PATH = "../bin/Desirae_Sindelar_list.csv"
+
+
+def test_header_field():
+    assert header_field("Zip Code") == "Postal Code"
+    assert header_field(" City/State/Zip ") == "City State Postal Code"
+    assert header_field("Real Greeting Name") is None
+
+
+def test_is_header_row():
+    assert is_header_row(GUEST_HEADER)
+    assert not is_header_row(generate_guests(1)[0])
+    assert not is_header_row(["", ""])
+
+
+def test_content_scores():
+    scores = content_scores(["68649", "68064-1234", "", "66604"])
+    assert scores["Postal Code"] == pytest.approx(0.75)
+    assert content_scores(["NE", "Nebraska", "KS"])["State"] == 1
+    assert content_scores(["$100", "Wall decor"])["Gift"] == 0.5
+    assert content_scores(["", ""])["Name"] == 0
+
+
+def test_infer_with_header():
+    guess = infer_column_map([GUEST_HEADER] + generate_guests(100))
+    assert guess.column_map == GUEST_COLUMN_MAP
+    assert guess.header_rows == 1
+    assert min(guess.confidences) > 0.9
+
+
+def test_infer_without_header():
+    guess = infer_column_map(generate_guests(100))
+    assert guess.column_map == GUEST_COLUMN_MAP
+    assert guess.header_rows == 0
+
+
+def test_infer_ignores_disagreeing_headers():
+    # Stale headers, the values decide
+    rows = [GUEST_HEADER] + [[postal_code, name, street, city, state]
+                             for name, street, city, state, postal_code in generate_guests(50)]
+    guess = infer_column_map(rows)
+    assert guess.column_map == ["Postal Code", "Name", "Address Line 1", "City", "State"]
+    assert guess.header_rows == 1
+
+
+def test_infer_sample_file():
+    guess = infer_column_map(load_csv_rows(DATA_PATH))
+    assert guess.header_rows == 1
+    assert guess.column_map[0] == "Name"
+    assert guess.column_map[2] == "Address Line 1"
+    assert guess.column_map[3] == "City State Postal Code"
+    assert guess.column_map[-1] == "Gift"
+    assert set(guess.column_map[4:-1]) == {""}
+
+
+def test_infer_names_and_gifts():
+    guess = infer_column_map([["Jesse Sindelar", "$50"], ["Judd & Bonnie Davis", "$100"]])
+    assert guess.column_map == ["Name", "Gift"]
+
+
+def test_infer_without_names():
+    with pytest.raises(InvalidColumnMapError):
+        infer_column_map([["68649", "NE"], ["68064", "NE"]])
@@ -0,0 +1,106 @@
+"""
+Created by Cameron Rogers
+"""
+from dedup import (EXACT, HOUSEHOLD, Deduplicator, DuplicateGroup, address_key, dedup_entries, find_households,
+                   format_duplicate_report, household_name, name_key)
+from graticard_entry import GratiCardEntry
+from parse_cache import ParseCache
+from pipeline import parse_rows
+
+GUEST_COLUMN_MAP = ["Name", "Address Line 1", "City", "State", "Postal Code", "Gift"]
+
+
+def _entry(name, address_line_1=None, gift=None, postal_code="68649"):
+    entry = GratiCardEntry()
+    if address_line_1 is None:
+        entry.set_entry(recipient_name=name, gift=gift)
+    else:
+        entry.set_entry(recipient_name=name, address_line_1=address_line_1, city="North Bend", state="NE",
+                        postal_code=postal_code, gift=gift)
+    return entry
+
+
+def test_name_key():
+    assert name_key("Judd and Bonnie Davis") == name_key("bonnie & judd DAVIS")
+    assert name_key("The Davis Family") == ("davis",)
+    assert name_key(None) == ()
+
+
+def test_address_key():
+    assert address_key(_entry("A", "830 Mulberry Street")) == address_key(_entry("B", "830 mulberry st."))
+    assert address_key(_entry("A", "830 Mulberry St", postal_code="68649-1234")) == \
+        address_key(_entry("B", "830 Mulberry St"))
+    assert address_key(_entry("A")) is None
+
+
+def test_household_name():
+    assert household_name("Judd Davis", "Bonnie Davis") == "Judd and Bonnie Davis"
+    assert household_name("Judd Davis", "Judd and Bonnie Davis") == "Judd and Bonnie Davis"
+    assert household_name("Judd and Bonnie Davis", "Bonnie Davis") == "Judd and Bonnie Davis"
+    assert household_name("Jesse", "Kate Smith") == "Jesse and Kate Smith"
+
+
+def test_deduplicator_streams():
+    entries = [_entry("Jesse Sindelar", "201 Hudspith St.", gift="Wall decor"),
+               _entry("Alan Sindelar", "830 Mulberry St."),
+               _entry("Sindelar, Jesse", "201 Hudspith Street", gift="$50")]
+    deduplicator = Deduplicator()
+    unique = list(deduplicator.iter_unique(entries))
+    assert unique == entries[:2]
+    assert unique[0].get_gift() == "Wall decor; $50"
+    assert deduplicator.kept_rows == [0, 1]
+    assert deduplicator.groups == [(0, [2], EXACT, ["Jesse Sindelar", "Sindelar, Jesse"])]
+
+
+def test_same_name_at_other_address_is_kept():
+    entries = [_entry("Jesse Sindelar", "201 Hudspith St."), _entry("Jesse Sindelar", "4551 Shirley St.")]
+    unique, groups = dedup_entries(entries)
+    assert len(unique) == 2
+    assert groups == []
+
+
+def test_find_households():
+    entries = [_entry("Judd Davis", "4551 Shirley St."),
+               _entry("Jesse Sindelar", "201 Hudspith St."),
+               _entry("Bonnie Davis", "4551 Shirley Street"),
+               _entry("Kate Taylor", "4551 Shirley St."),
+               _entry("Ron Davis")]
+    groups = find_households(entries)
+    assert groups == [(0, [2], HOUSEHOLD, ["Judd Davis", "Bonnie Davis"])]
+
+
+def test_dedup_entries_households():
+    entries = [_entry("Judd Davis", "4551 Shirley St."),
+               _entry("Judd Davis", "4551 Shirley St."),
+               _entry("Bonnie Davis", "4551 Shirley St.", gift="$100")]
+    unique, groups = dedup_entries(entries)
+    assert len(unique) == 2
+    assert [(group.kept, group.duplicates, group.reason) for group in groups] == [(0, [1], EXACT),
+                                                                                  (0, [2], HOUSEHOLD)]
+    unique, _ = dedup_entries(entries, collapse_households=True)
+    assert len(unique) == 1
+    assert unique[0].get_recipient_name() == "Judd and Bonnie Davis"
+    assert unique[0].get_gift() == "$100"
+
+
+def test_format_duplicate_report():
+    groups = [DuplicateGroup(0, [1, 3], EXACT, ["Judd Davis", "Judd Davis", "Davis, Judd"])]
+    assert format_duplicate_report(groups, row_offset=1) == [
+        "Row 1 (Judd Davis) duplicated by row 2 (Judd Davis), row 4 (Davis, Judd)"]
+
+
+def test_parse_rows_duplicates():
+    rows = [["Jesse Sindelar", "201 Hudspith St.", "Valley", "NE", "68064", ""],
+            ["Jesse Sindelar", "201 Hudspith St.", "Valley", "NE", "68064", ""],
+            ["Alan Sindelar", "830 Mulberry St.", "North Bend", "NE", "68649", ""]]
+    duplicates = []
+    entries = parse_rows(rows, GUEST_COLUMN_MAP, duplicates=duplicates, processes=1)
+    assert len(entries) == 2
+    assert duplicates[0].duplicates == [1]
+    assert entries[0].get_parsed_address() is not None
+
+    duplicates = []
+    cache = ParseCache()
+    assert len(cache.parse(rows, GUEST_COLUMN_MAP, duplicates=duplicates, processes=1)) == 2
+    assert len(duplicates) == 1
+    assert cache.misses == 2
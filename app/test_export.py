@@ -0,0 +1,80 @@
+"""
+Created by Cameron Rogers
+"""
+import csv
+import json
+import os
+import pytest
+from export import (atomic_write, export_entries, write_columnar, write_csv, write_jsonl,
+                    EXPORT_HEADER)
+from graticard_entry import GratiCardEntry
+from graticard_entry_table import GratiCardEntryTable
+
+
+def _entries():
+    parsed = GratiCardEntry()
+    parsed.set_entry(recipient_name="Jane Doe", address_line_1="4551 Shirley St.", gift="Mixer")
+    parsed.set_parsed_address({"address_line_1": "4551 SHIRLEY ST", "address_line_2": None,
+                               "city": "OMAHA", "state": "NE", "postal_code": "68106"})
+    raw = GratiCardEntry()
+    raw.set_entry(recipient_name="John Doe", city="Ames")
+    return [parsed, raw]
+
+
+def test_write_csv_in_chunks(tmp_path):
+    output_path = tmp_path / "out.csv"
+    assert write_csv(iter(_entries() * 3), output_path, chunk_size=4) == 6
+    with open(output_path, newline='') as fh:
+        rows = list(csv.reader(fh))
+    assert rows[0] == EXPORT_HEADER
+    assert rows[1] == ["Jane Doe", "4551 SHIRLEY ST", "", "OMAHA", "NE", "68106", "Mixer"]
+    assert rows[6] == ["John Doe", "", "", "Ames", "", "", ""]
+    assert os.listdir(tmp_path) == ["out.csv"]
+
+
+def test_write_jsonl(tmp_path):
+    output_path = tmp_path / "out.jsonl"
+    assert export_entries(_entries(), output_path) == 2
+    lines = [json.loads(line) for line in output_path.read_text().splitlines()]
+    assert lines[0]["city"] == "OMAHA" and lines[0]["gift"] == "Mixer"
+    assert lines[1]["recipient_name"] == "John Doe" and lines[1]["postal_code"] is None
+
+
+def test_write_columnar(tmp_path):
+    output_path = tmp_path / "out.json"
+    assert export_entries(_entries(), output_path) == 2
+    columns = json.loads(output_path.read_text())
+    assert list(columns) == EXPORT_HEADER
+    assert columns["City"] == ["OMAHA", "Ames"]
+    assert write_columnar(GratiCardEntryTable(), output_path) == 0
+    assert json.loads(output_path.read_text())["Name"] == []
+
+
+def test_atomic_write_keeps_previous_file_on_error(tmp_path):
+    output_path = tmp_path / "out.csv"
+    output_path.write_text("previous")
+    with pytest.raises(RuntimeError):
+        with atomic_write(output_path) as fh:
+            fh.write("partial")
+            raise RuntimeError()
+    assert output_path.read_text() == "previous"
+    assert os.listdir(tmp_path) == ["out.csv"]
+
+
+@pytest.mark.skipif(os.name != 'posix', reason="posix permissions")
+def test_atomic_write_applies_umask(tmp_path):
+    previous = os.umask(0o027)
+    try:
+        with atomic_write(tmp_path / "out.csv") as fh:
+            fh.write("rows")
+        assert os.umask(0o027) == 0o027
+    finally:
+        os.umask(previous)
+    assert (tmp_path / "out.csv").stat().st_mode & 0o777 == 0o640
+
+
+def test_unknown_format(tmp_path):
+    with pytest.raises(ValueError):
+        export_entries(_entries(), tmp_path / "out.csv", export_format="xml")
+    with pytest.raises(OSError):
+        write_jsonl(_entries(), tmp_path / "missing" / "out.jsonl")
@@ -0,0 +1,103 @@
+"""
+Created by Cameron Rogers
+"""
+import csv
+import re
+import docx
+import pytest
+from file_loaders import (collect_rows, combine_rules, iter_csv_rows, iter_docx_paragraphs,
+                          load_csv_preview, load_csv_rows, load_docx_rows, load_xlsx_rows,
+                          xlsx_sheet_names, DOCX_RULES, LoadCancelled)
+
+
+def _write_csv(tmp_path, row_count):
+    csv_path = tmp_path / "guests.csv"
+    with open(csv_path, 'w', newline='', encoding='latin-1') as fh:
+        csv.writer(fh).writerows([["Guest {}".format(i), "Line\nbreak"] for i in range(row_count)])
+    return csv_path
+
+
+def test_iter_csv_rows(tmp_path):
+    csv_path = _write_csv(tmp_path, 5)
+    rows = iter_csv_rows(csv_path)
+    assert next(rows) == ["Guest 0", "Line\nbreak"]
+    assert len(list(rows)) == 4
+    assert load_csv_rows(csv_path)[-1][0] == "Guest 4"
+
+
+def test_load_csv_preview(tmp_path):
+    csv_path = _write_csv(tmp_path, 50)
+    assert len(load_csv_preview(csv_path, row_limit=10)) == 10
+    assert len(load_csv_preview(csv_path)) == 50
+
+
+def test_collect_rows_progress():
+    progress = []
+    assert len(collect_rows(iter(range(7)), progress=progress.append, progress_interval=3)) == 7
+    assert progress == [3, 6, 7]
+
+
+def test_collect_rows_cancelled():
+    calls = []
+    def is_cancelled():
+        calls.append(None)
+        return len(calls) > 2
+    with pytest.raises(LoadCancelled):
+        collect_rows(iter(range(7)), is_cancelled=is_cancelled)
+
+
+def test_combine_rules():
+    combined, first_groups = combine_rules(DOCX_RULES + [re.compile(r'(\w+): (\w+)')])
+    assert first_groups == [1, 3, 5]
+    match = combined.match("Jane $5 -- Mixer")
+    assert match.group(1, 2) == ("Jane $5", "Mixer")
+    assert combined.match("Jane Doe $50").group(3, 4) == ("Jane Doe", "$50")
+    assert combined.match("Jane: Mixer").group(5, 6) == ("Jane", "Mixer")
+
+
+def test_docx_paragraphs_match_python_docx(tmp_path):
+    docx_path = tmp_path / "gifts.docx"
+    document = docx.Document()
+    document.add_paragraph("Jesse Sindelar -- Wall decor")
+    document.add_paragraph("")
+    paragraph = document.add_paragraph("Judd & Bonnie Davis ")
+    paragraph.add_run("$100\tcheck").add_break()
+    document.add_table(rows=1, cols=1).cell(0, 0).text = "Table cell -- skipped"
+    document.add_paragraph("A thank you note")
+    document.save(str(docx_path))
+
+    expected = ["".join(run.text for run in paragraph.runs)
+                for paragraph in docx.Document(str(docx_path)).paragraphs]
+    assert list(iter_docx_paragraphs(docx_path)) == expected
+    assert load_docx_rows(docx_path) == [["Jesse Sindelar", "Wall decor"],
+                                         ["Judd & Bonnie Davis", "$100\tcheck"],
+                                         "A thank you note"]
+
+
+def _write_xlsx(tmp_path):
+    openpyxl = pytest.importorskip("openpyxl")
+    xlsx_path = tmp_path / "guests.xlsx"
+    workbook = openpyxl.Workbook()
+    guests = workbook.active
+    guests.title = "Guests"
+    guests.append(["Name", "Address", "Zip"])
+    guests.append(["Jesse Sindelar", "201 Hudspith St.", 68106])
+    guests.append([None, None, None])
+    guests.append(["Judd Davis", None, 68106.0])
+    guests.append(["Alan Madsen"])
+    workbook.create_sheet("Gifts").append(["Jesse Sindelar", "Wall decor"])
+    workbook.save(str(xlsx_path))
+    return xlsx_path
+
+
+def test_xlsx_sheet_names(tmp_path):
+    assert xlsx_sheet_names(_write_xlsx(tmp_path)) == ["Guests", "Gifts"]
+
+
+def test_load_xlsx_rows(tmp_path):
+    xlsx_path = _write_xlsx(tmp_path)
+    assert load_xlsx_rows(xlsx_path) == [["Name", "Address", "Zip"],
+                                         ["Jesse Sindelar", "201 Hudspith St.", "68106"],
+                                         ["Judd Davis", "", "68106"],
+                                         ["Alan Madsen", "", ""]]
+    assert load_xlsx_rows(xlsx_path, "Gifts") == [["Jesse Sindelar", "Wall decor"]]
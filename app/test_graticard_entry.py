@@ -2,10 +2,10 @@
 Created by Cameron Rogers
 """
 import csv
+from pathlib import Path
 import json
 import pytest
 from graticard_entry import GratiCardEntry
-from process_files import CsvDocumentParser
 
 
 def test_graticard_entry():
@@ -44,6 +44,26 @@ def test_graticard_entry_parse_off_nominal_1():
     print(entry.get_parsed_address())
 
 
+def test_graticard_entry_parse_most_specific_option():
+    entry = test_graticard_entry()
+    entry.set_full_street_address('999 Other Ave')
+    entry.set_city_state_zip('Omaha NE 68106')
+    entry.parse_address()
+    assert entry.get_parsed_address_source() == ("address_line_1", "address_line_2", "city",
+                                                 "state", "postal_code")
+    assert entry.get_parsed_address()['address_line_2'] == 'STE 101'
+
+
+def test_graticard_entry_parse_city_state_zip_option():
+    entry = GratiCardEntry()
+    entry.set_entry(recipient_name='John Doe',
+                    address_line_1='4551 Shirley St.',
+                    city_state_zip='Omaha NE 68106')
+    entry.parse_address()
+    assert entry.get_parsed_address_source() == ("address_line_1", "city_state_zip")
+    assert entry.get_parsed_address()['city'] == 'OMAHA'
+
+
 def test_graticard_entry_parse_external():
     entry = GratiCardEntry()
     entry.parse_external_address('123 Abc st new york ny 12345')
@@ -51,7 +71,7 @@ def test_graticard_entry_parse_external():
 
 
 def test_deserie():
-    with open("data/Desirae_Sindelar_list.csv", 'r', encoding='latin-1') as fh:
+    with open(Path(__file__).parent.parent / "bin" / "Desirae_Sindelar_list.csv", 'r', encoding='latin-1') as fh:
         data = [row for row in csv.reader(fh)]
     all_items = []
     for item in data:
@@ -64,3 +84,14 @@ def test_deserie():
                         gift=item[10])
         all_items.append(entry)
     print(all_items[12])
+
+
+def test_state_round_trip():
+    entry = GratiCardEntry()
+    entry.set_entry(recipient_name="Jesse Sindelar", address_line_1="201 Hudspith St.", gift="$50")
+    entry.set_parsed_address({"address_line_1": "201 HUDSPITH ST"}, ("address_line_1",))
+    state = json.loads(json.dumps(entry.to_state()))
+    restored = GratiCardEntry.from_state(state)
+    assert restored.get_entry_json() == entry.get_entry_json()
+    assert restored.get_parsed_address() == entry.get_parsed_address()
+    assert restored.get_parsed_address_source() == ("address_line_1",)
@@ -0,0 +1,50 @@
+"""
+Created by Cameron Rogers
+"""
+from export import entry_to_row, iter_table_rows
+from graticard_entry import GratiCardEntry
+from graticard_entry_table import GratiCardEntryTable
+from merge import merge_table
+from parser import compile_column_map, parse_data_to_graticard_entry
+
+DATA = [["Jane Doe", "4551 Shirley St.", "Omaha", "NE", "68106", ""],
+        ["John Doe", "4551 Shirley St.", "Omaha", "NE", "68106", ""],
+        ["Bob Dahlheim", "190 Legge Lake Dr.", "North Bend", "NE", "68649", "Sheets"]]
+COLUMN_MAP = ["Name", "Address Line 1", "City", "State", "Postal Code", "Gift"]
+
+
+def test_from_rows_matches_entries():
+    table = GratiCardEntryTable.from_rows(DATA, compile_column_map(COLUMN_MAP))
+    entries = parse_data_to_graticard_entry(DATA, COLUMN_MAP)
+    assert len(table) == 3
+    assert [entry.get_entry_json() for entry in table] == [entry.get_entry_json() for entry in entries]
+    assert table.column("city")[0] is table.column("city")[1]
+
+
+def test_from_entries_keeps_parsed_address():
+    entry = GratiCardEntry()
+    entry.set_entry(recipient_name="Jane Doe", address_line_1="4551 Shirley St.")
+    entry.set_parsed_address({"address_line_1": "4551 SHIRLEY ST", "address_line_2": None,
+                              "city": "OMAHA", "state": "NE", "postal_code": "68106"})
+    table = GratiCardEntryTable.from_entries([entry, GratiCardEntry()])
+    assert table.entry(0).get_parsed_address()["city"] == "OMAHA"
+    assert table.entry(1).get_parsed_address() is None
+    assert list(iter_table_rows(table)) == [entry_to_row(entry), entry_to_row(GratiCardEntry())]
+
+
+def test_assign_gifts_and_filter():
+    table = GratiCardEntryTable.from_rows(DATA, compile_column_map(COLUMN_MAP))
+    assert table.assign_gifts({"Jane Doe": "Mixer"}.get) == 1
+    assert table.column("gift") == ["Mixer", "", "Sheets"]
+    with_gifts = table.filter(table.mask("gift", bool))
+    assert with_gifts.column("recipient_name") == ["Jane Doe", "Bob Dahlheim"]
+    assert len(table) == 3
+
+
+def test_merge_table():
+    docx_entries = parse_data_to_graticard_entry([["John Doe", "Bowls"], ["Bob Dahlheim", "Sheets"]],
+                                                 ["Name", "Gift"])
+    table = GratiCardEntryTable.from_rows(DATA, compile_column_map(COLUMN_MAP))
+    # Jane Doe does not share John Doe's gift
+    assert merge_table(table, docx_entries) == 2
+    assert table.column("gift") == ["", "Bowls", "Sheets"]
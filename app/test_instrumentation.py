@@ -0,0 +1,68 @@
+"""
+Created by Cameron Rogers
+"""
+import json
+from instrumentation import Instrumentation
+
+
+def test_timer_and_timed():
+    instrumentation = Instrumentation()
+    with instrumentation.timer("load", "guests.csv"):
+        pass
+
+    @instrumentation.timed("parse")
+    def parse(value):
+        return value * 2
+    assert parse(2) == 4
+    assert parse(3) == 6
+    timers = instrumentation.snapshot()["timers"]
+    assert timers["load[guests.csv]"]["calls"] == 1
+    assert timers["parse"]["calls"] == 2
+    assert timers["parse"]["seconds"] >= timers["parse"]["max"] >= 0
+
+
+def test_timer_records_on_error():
+    instrumentation = Instrumentation()
+    try:
+        with instrumentation.timer("merge"):
+            raise ValueError
+    except ValueError:
+        pass
+    assert instrumentation.snapshot()["timers"]["merge"]["calls"] == 1
+
+
+def test_counters_and_values():
+    instrumentation = Instrumentation()
+    instrumentation.count("merge.unmatched")
+    instrumentation.count("merge.unmatched", 2)
+    for score in (80, 90, 100):
+        instrumentation.record("merge.fuzzy_score", score)
+    snapshot = instrumentation.snapshot()
+    assert snapshot["counters"] == {"merge.unmatched": 3}
+    assert snapshot["values"]["merge.fuzzy_score"] == {"count": 3, "min": 80, "max": 100,
+                                                       "total": 270, "mean": 90}
+    assert "merge.unmatched 3" in instrumentation.summary()
+    instrumentation.reset()
+    assert instrumentation.snapshot() == {"timers": {}, "counters": {}, "values": {}}
+
+
+def test_profiling(tmp_path):
+    instrumentation = Instrumentation()
+    instrumentation.start_profiling()
+    with instrumentation.timer("outer"):
+        with instrumentation.timer("inner"):
+            sorted(range(1000))
+    assert "sorted" in instrumentation.profile_report()
+    instrumentation.dump_profile(tmp_path / "run.prof")
+    assert (tmp_path / "run.prof").exists()
+    assert instrumentation.stop_profiling() is not None
+    assert instrumentation.profile_report() == ""
+
+
+def test_dump(tmp_path):
+    instrumentation = Instrumentation()
+    instrumentation.count("load.rows", 10)
+    instrumentation.dump(tmp_path / "report.json", {"files": ["guests.csv"]})
+    report = json.loads((tmp_path / "report.json").read_text())
+    assert report["counters"] == {"load.rows": 10}
+    assert report["files"] == ["guests.csv"]
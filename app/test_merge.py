@@ -0,0 +1,102 @@
+"""
+Created by Cameron Rogers
+"""
+from graticard_entry import GratiCardEntry
+from merge import GIFT_SEPARATOR, MergeEngine, address_identity, address_join_key
+
+
+def _entry(name, address=None, gift=None):
+    entry = GratiCardEntry()
+    entry.set_entry(recipient_name=name, full_street_address=address,
+                    city_state_zip=None if address is None else "Omaha NE 68106", gift=gift)
+    return entry
+
+
+def test_address_identity():
+    assert address_identity(_entry("Jesse Sindelar")) is None
+    assert (address_identity(_entry("Jesse Sindelar", "201 Hudspith St."))
+            == address_identity(_entry("Jesse Sindelar", "201 hudspith st")))
+    parsed = _entry("Jesse Sindelar", "201 Hudspith St.")
+    parsed.set_parsed_address({"address_line_1": "201 HUDSPITH ST", "address_line_2": None,
+                               "city": "OMAHA", "state": "NE", "postal_code": "68106"})
+    assert address_identity(parsed) == ("201 HUDSPITH ST", None, "OMAHA", "NE", "68106")
+
+
+def test_merge_many_sources():
+    engine = MergeEngine()
+    engine.add_address_source([_entry("Jesse Sindelar", "201 Hudspith St."),
+                               _entry("Judd and Bonnie Davis", "4551 Shirley St.")], "a.csv")
+    # Same recipient in a second export is kept once, a namesake at another address is kept
+    assert engine.add_address_source([_entry("jesse sindelar", "201 Hudspith St"),
+                                      _entry("Jesse Sindelar", "12 Arctic Ave."),
+                                      _entry("Alan Madsen", "5 Main St.")], "b.csv") == 2
+    engine.add_gift_source([_entry("Jesse Sindelar", gift="Wall decor"),
+                            _entry("Judd & Bonnie Davis", gift="$100")], "a.docx")
+    engine.add_gift_source([_entry("Jesse Sindelar", gift="Cutting board"),
+                            _entry("Jesse Sindelar", gift="Wall decor"),
+                            _entry("Peggy Vosler", gift="Mixing bowls")], "b.docx")
+    merged = engine.merge()
+    assert engine.duplicate_addresses == 1
+    assert [(entry.get_recipient_name(), entry.get_gift()) for entry in merged] == [
+        ("Jesse Sindelar", "Wall decor" + GIFT_SEPARATOR + "Cutting board"),
+        ("Judd and Bonnie Davis", "$100"),
+        ("Jesse Sindelar", "Wall decor" + GIFT_SEPARATOR + "Cutting board"),
+        ("Alan Madsen", None)]
+    assert engine.unmatched_gift_names() == ["peggy vosler"]
+    assert [source["label"] for source in engine.sources] == ["a.csv", "b.csv", "a.docx", "b.docx"]
+
+
+def test_merge_without_gifts():
+    engine = MergeEngine()
+    engine.add_address_source([_entry("Jesse Sindelar", "201 Hudspith St.")])
+    assert engine.merge()[0].get_gift() is None
+
+
+def test_merge_keeps_claimed_names_out_of_fuzzy_matching():
+    engine = MergeEngine()
+    engine.add_address_source([_entry("Don Davis", "1 Main St."), _entry("Ron Davis", "2 Main St.")])
+    engine.add_gift_source([_entry("Don Davis", gift="$100")])
+    assert [entry.get_gift() for entry in engine.merge()] == ["$100", None]
+
+
+def test_merge_leaves_ambiguous_fuzzy_matches():
+    engine = MergeEngine()
+    engine.add_address_source([_entry("Don Davis", "1 Main St."), _entry("Ron Davis", "2 Main St.")])
+    engine.add_gift_source([_entry("Jon Davis", gift="$100")])
+    assert [entry.get_gift() for entry in engine.merge()] == [None, None]
+    assert engine.ambiguous_gift_names == {"jon davis"}
+
+
+def test_merge_assigns_gifts_one_to_one():
+    engine = MergeEngine(backend="python")
+    engine.add_address_source([_entry("Jonn Davis", "1 Main St."), _entry("Jon Davi", "2 Main St.")])
+    engine.add_gift_source([_entry("Jon Davis", gift="$100")])
+    assert [entry.get_gift() for entry in engine.merge()] == ["$100", None]
+
+
+def _parsed(name, line_1, postal_code="68106", gift=None):
+    entry = _entry(name, line_1, gift)
+    entry.set_parsed_address({"address_line_1": line_1.upper(), "address_line_2": None,
+                              "city": "OMAHA", "state": "NE", "postal_code": postal_code})
+    return entry
+
+
+def test_address_join_key():
+    assert address_join_key(_entry("Jesse Sindelar", "201 Hudspith St.")) is None
+    assert address_join_key(_parsed("Jesse Sindelar", "201 Hudspith St", "68106-1234")) == (
+        "201 HUDSPITH ST", "68106")
+
+
+def test_merge_joins_on_address():
+    engine = MergeEngine()
+    engine.add_address_source([_parsed("Jesse Sindelar", "201 Hudspith St"),
+                               _parsed("Jesse Sindelar", "12 Arctic Ave"),
+                               _parsed("Judd Davis", "4551 Shirley St"),
+                               _parsed("Bonnie Davis", "4551 Shirley St")], "guests.csv")
+    # A csv gift export: names too different to match fuzzily are joined on the address,
+    # namesakes are told apart by it
+    engine.add_gift_source([_parsed("The Sindelars", "12 Arctic Ave", gift="Wall decor"),
+                            _parsed("Bonny Davis", "4551 Shirley St", gift="$50"),
+                            _parsed("Judd Davis", "4551 Shirley St", gift="$100")], "gifts.csv")
+    assert [entry.get_gift() for entry in engine.merge()] == [None, "Wall decor", "$100", "$50"]
+    assert engine.unmatched_gift_names() == []
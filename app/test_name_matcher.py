@@ -0,0 +1,77 @@
+"""
+Created by Cameron Rogers
+"""
+import random
+import pytest
+from fuzzywuzzy import process
+from name_matcher import NameMatcher, normalize_name
+
+DOCX_NAMES = ["Alan and Diane Sindelar",
+              "Jesse Sindelar",
+              "Judd and Bonnie Davis",
+              "Bob and Jeanne Dahlheim",
+              "Uncle Bob & Aunt Jeanne",
+              "The Johnson Family",
+              "Mary-Kate O'Neil"]
+
+
+def _extract_one(query, choices):
+    matched, confidence = process.extractOne(query, choices)
+    if confidence > 20:
+        return matched, confidence
+    return None
+
+
+def test_normalize_name():
+    assert normalize_name("  Mary-Kate O'Neil ") == "mary kate o neil"
+
+
+def test_exact_match():
+    matcher = NameMatcher(DOCX_NAMES)
+    assert matcher.extract_one("jesse SINDELAR") == ("Jesse Sindelar", 100)
+
+
+def test_no_choices():
+    assert NameMatcher().extract_one("Jesse Sindelar") is None
+
+
+def test_empty_query():
+    assert NameMatcher(DOCX_NAMES).extract_one("--") is None
+
+
+@pytest.mark.parametrize('query', ["Jesse Sindelr",
+                                   "Diane and Alan Sindelar",
+                                   "Bonnie Davis",
+                                   "Jeanne Dahlheim",
+                                   "Johnsons",
+                                   "Mary Kate ONeil",
+                                   "Zzyzx"])
+def test_matches_extract_one(query):
+    assert NameMatcher(DOCX_NAMES).extract_one(query) == _extract_one(query, DOCX_NAMES)
+
+
+def test_best_match_sharing_fewer_grams():
+    # Over 50 names share more of the query than its best match does
+    first = ["Alan", "Diane", "Jesse", "Judd", "Bonnie", "Bob", "Jeanne", "Mary", "Sara", "Ruth", "Al"]
+    choices = ["{} and {} Anderson".format(a, b) for a in first for b in first] + ["Ruth Anderson"]
+    assert NameMatcher(choices).extract_one("RnthxAnderson") == ("Ruth Anderson", 85)
+    assert _extract_one("RnthxAnderson", choices) == ("Ruth Anderson", 85)
+
+
+def test_matches_extract_one_with_typos():
+    rng = random.Random(4)
+    first = ["Alan", "Diane", "Jesse", "Judd", "Bonnie", "Bob", "Jeanne", "Mary", "Sara", "Ruth", "Al"]
+    last = ["Sindelar", "Davis", "Dahlheim", "Johnson", "Neil", "Garcia", "Anderson", "Li"]
+    choices = [rng.choice(["{0} {2}", "{0} and {1} {2}", "The {2} Family", "{2}"]).format(
+        rng.choice(first), rng.choice(first), rng.choice(last)) for _ in range(150)]
+    choices += ["{} and {} Anderson".format(a, b) for a in first for b in first] + ["Ruth Anderson"]
+    matcher = NameMatcher(choices)
+    queries = ["RnthxAnderson"]
+    for _ in range(40):
+        name = list(rng.choice(choices))
+        for _ in range(rng.randrange(1, 4)):
+            position = rng.randrange(len(name))
+            name[position:position + rng.randrange(2)] = rng.choice("abcdefghijklmnopqrstuvwxyz ")
+        queries.append("".join(name))
+    for query in queries:
+        assert matcher.extract_one(query) == _extract_one(query, choices)
@@ -0,0 +1,52 @@
+"""
+Created by Cameron Rogers
+"""
+from address_cache import AddressCache
+from graticard_entry import GratiCardEntry
+from normalization import AddressNormalizationPool, normalize_addresses
+
+ADDRESSES = [("123 Abc St", "New York", "NY", "12345"),
+             ("PO BOX 183 PRAGUE, NEBRASKA 68050", "", "NE", "68050"),
+             ("4551 Shirley St.", "Omaha", "NE", "68106"),
+             ("830 Mulberry St.", "North Bend", "NE", "68649")]
+
+
+def _entries():
+    entries = []
+    for line_1, city, state, postal_code in ADDRESSES:
+        entry = GratiCardEntry()
+        entry.set_entry(recipient_name=line_1, address_line_1=line_1, city=city,
+                        state=state, postal_code=postal_code)
+        entries.append(entry)
+    entries.append(GratiCardEntry())
+    return entries
+
+
+def test_normalize_addresses_reports_failures():
+    results = normalize_addresses(["123 Abc st new york ny 12345", "not an address", None])
+    assert results[0][0]['postal_code'] == '12345'
+    assert results[1][0] is None and "UNPARSEABLE" in results[1][1]
+    assert results[2] == (None, None)
+
+
+def test_pool_normalize_in_order():
+    entries = _entries()
+    progress = []
+    with AddressNormalizationPool(processes=2, chunk_size=1, cache=AddressCache()) as pool:
+        failures = pool.normalize(entries, progress=lambda done, total: progress.append(done))
+    assert [failure.index for failure in failures] == [1]
+    assert failures[0].entry is entries[1]
+    assert [entry.get_parsed_address() and entry.get_parsed_address()['postal_code']
+            for entry in entries] == ['12345', None, '68106', '68649', None]
+    assert progress == [1, 2, 3, 4]
+
+
+def test_pool_imap():
+    failures = []
+    cache = AddressCache()
+    with AddressNormalizationPool(processes=1, chunk_size=2, cache=cache) as pool:
+        entries = list(pool.imap(iter(_entries() * 3), failures))
+    assert len(entries) == 15
+    assert [failure.index for failure in failures] == [1, 6, 11]
+    assert entries[12].get_parsed_address()['city'] == 'OMAHA'
+    assert cache.stats() == {'hits': 6, 'misses': 6, 'size': 3}
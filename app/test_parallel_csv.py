@@ -0,0 +1,125 @@
+"""
+Created by Cameron Rogers
+"""
+import csv
+import io
+import mmap
+from parallel_csv import (CsvFormat, find_chunk_boundaries, iter_large_csv_rows, parse_large_csv, sniff_csv,
+                          sniff_encoding)
+from parser import parse_data_to_graticard_entry
+
+ROWS = [["Name", "Address", "Notes"]] + [
+    ["Guest {}".format(i), "{} Main St.".format(i), 'Said "thanks"\nover two lines' if i % 3 == 0 else "-"]
+    for i in range(200)]
+
+
+def _write_csv(tmp_path, rows=ROWS, encoding='utf-8', delimiter=','):
+    csv_path = tmp_path / "guests.csv"
+    with open(csv_path, 'w', newline='', encoding=encoding) as fh:
+        csv.writer(fh, delimiter=delimiter).writerows(rows)
+    return csv_path
+
+
+def test_sniff_encoding():
+    assert sniff_encoding(b'\xef\xbb\xbfName,Gift\r\n') == 'utf-8-sig'
+    assert sniff_encoding('Zoë,Bowls'.encode('utf-8')) == 'utf-8'
+    # A multi-byte character cut at the end of the sample is still utf-8
+    assert sniff_encoding('Zoë'.encode('utf-8')[:-1]) == 'utf-8'
+    assert sniff_encoding('Zoë,Bowls'.encode('latin-1')) == 'latin-1'
+
+
+def test_sniff_csv_dialect(tmp_path):
+    csv_path = _write_csv(tmp_path, delimiter=';', encoding='latin-1',
+                          rows=[["Name", "Gift"], ["Zoë Smith", "Bowls"], ["Al Davis", "$50"]])
+    csv_format = sniff_csv(csv_path)
+    assert csv_format.encoding == 'latin-1'
+    assert csv_format.delimiter == ';'
+    assert list(iter_large_csv_rows(csv_path))[1] == ["Zoë Smith", "Bowls"]
+
+
+def test_chunk_boundaries_skip_quoted_newlines(tmp_path):
+    csv_path = _write_csv(tmp_path)
+    with open(csv_path, 'rb') as fh, mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ) as buffer:
+        size = len(buffer)
+        boundaries = find_chunk_boundaries(buffer, size, chunk_size=100)
+        data = buffer[:]
+    assert boundaries[0] == 0 and boundaries[-1] == size
+    assert len(boundaries) > 10
+    for boundary in boundaries[1:-1]:
+        assert data[boundary - 1:boundary] == b'\n'
+        assert data[:boundary].count(b'"') % 2 == 0
+
+
+def test_iter_large_csv_rows_matches_csv_reader(tmp_path):
+    csv_path = _write_csv(tmp_path)
+    for processes in (1, 2):
+        rows = list(iter_large_csv_rows(csv_path, processes=processes, chunk_size=256, min_size=0))
+        assert rows == ROWS
+
+
+def test_iter_large_csv_rows_small_file(tmp_path):
+    csv_path = _write_csv(tmp_path, encoding='utf-8-sig')
+    assert sniff_csv(csv_path).encoding == 'utf-8-sig'
+    assert list(iter_large_csv_rows(csv_path)) == ROWS
+    # The byte order mark is only stripped from the first chunk
+    assert list(iter_large_csv_rows(csv_path, chunk_size=256, min_size=0)) == ROWS
+
+
+def test_escaped_quotes_read_in_one_chunk(tmp_path):
+    csv_path = tmp_path / "escaped.csv"
+    csv_path.write_text('Name,Notes\nAl,"a \\" quote"\nBo,plain\n')
+    csv_format = CsvFormat('utf-8', ',', '"', False, '\\', False)
+    rows = list(iter_large_csv_rows(csv_path, csv_format, chunk_size=8, min_size=0))
+    assert rows == [["Name", "Notes"], ["Al", 'a " quote'], ["Bo", "plain"]]
+
+
+def test_sniffed_format_keeps_doubled_quotes(tmp_path):
+    # The sample holds no doubled quote, the row escaping one comes later
+    rows = [["Guest {}".format(i), "{}, Main St.".format(i), "-"] for i in range(3000)] + \
+        [["Bob \"Bobby\" Smith", "1 Main St.", "-"]]
+    csv_path = _write_csv(tmp_path, rows=rows)
+    csv_format = sniff_csv(csv_path, sample_size=1024)
+    assert csv_format.doublequote and csv_format.escapechar is None
+    for processes in (1, 2):
+        assert list(iter_large_csv_rows(csv_path, csv_format, processes=processes, chunk_size=4096,
+                                        min_size=0)) == rows
+
+
+def test_sniff_escaped_quotes(tmp_path):
+    csv_path = tmp_path / "escaped.csv"
+    csv_path.write_text('Name,Notes\nAl,"a \\" quote"\nBo,plain\n')
+    csv_format = sniff_csv(csv_path)
+    assert csv_format.escapechar == '\\' and not csv_format.doublequote
+    assert list(iter_large_csv_rows(csv_path))[1] == ["Al", 'a " quote']
+
+
+def test_empty_file(tmp_path):
+    csv_path = tmp_path / "empty.csv"
+    csv_path.write_bytes(b'')
+    assert list(iter_large_csv_rows(csv_path, min_size=0)) == []
+
+
+def test_parse_large_csv(tmp_path):
+    csv_path = _write_csv(tmp_path)
+    column_map = ["Name", "Address Line 1", ""]
+    entries = parse_large_csv(csv_path, column_map, skip_rows=1, processes=2, chunk_size=256, min_size=0)
+    expected = parse_data_to_graticard_entry(ROWS[1:], column_map)
+    assert [entry.get_entry_json() for entry in entries] == [entry.get_entry_json() for entry in expected]
+
+
+def test_stray_quote_in_unquoted_field(tmp_path):
+    # The quote in 5" opens no field, the quoted newlines after it must not be split
+    csv_path = tmp_path / "stray.csv"
+    text = 'Name,Notes\nBob 5" tall,x\n' + ''.join(
+        'Al,"multi\nline note"\n' if i % 500 == 0 else 'Guest {},-\n'.format(i) for i in range(4000))
+    csv_path.write_text(text)
+    expected = list(csv.reader(io.StringIO(text, newline='')))
+    assert expected[1] == ["Bob 5\" tall", "x"] and ["Al", "multi\nline note"] in expected
+    for processes in (1, 2):
+        assert list(iter_large_csv_rows(csv_path, processes=processes, chunk_size=4096, min_size=0)) == expected
+    # Quotes open fields after the delimiter's spaces too
+    text = 'Name, Notes\nBo 2" wide, "a\nb"\n' * 400
+    csv_path.write_text(text)
+    csv_format = CsvFormat('utf-8', ',', '"', True, None, True)
+    expected = list(csv.reader(io.StringIO(text, newline=''), skipinitialspace=True))
+    assert list(iter_large_csv_rows(csv_path, csv_format, processes=1, chunk_size=512, min_size=0)) == expected
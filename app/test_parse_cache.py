@@ -0,0 +1,59 @@
+"""
+Created by Cameron Rogers
+"""
+import pytest
+from address_cache import AddressCache, get_default_cache, set_default_cache
+from parse_cache import ParseCache
+from parser import InvalidColumnMapError
+
+ROWS = [["Jane Doe", "4551 Shirley St.", "Omaha", "NE", "68106"],
+        ["John Doe", "4551 Shirley St.", "Omaha", "NE", "68106"],
+        ["Bob Dahlheim", "PO BOX 183 PRAGUE, NEBRASKA 68050", "", "NE", "68050"],
+        ["Ann Lee", "190 Legge Lake Dr.", "North Bend", "NE", "68649"]]
+COLUMN_MAP = ["Name", "Address Line 1", "City", "State", "Postal Code"]
+
+
+@pytest.fixture(autouse=True)
+def fresh_address_cache():
+    previous = get_default_cache()
+    set_default_cache(AddressCache())
+    yield
+    set_default_cache(previous)
+
+
+def test_parse_reuses_results():
+    parse_cache = ParseCache()
+    failures = []
+    entries = parse_cache.parse(ROWS, COLUMN_MAP, failures=failures, processes=1)
+    assert [failure.index for failure in failures] == [2]
+    assert entries[0].get_parsed_address()["city"] == "OMAHA"
+    assert (parse_cache.hits, parse_cache.misses) == (1, 3)
+
+    failures = []
+    entries = parse_cache.parse(ROWS[1:], COLUMN_MAP, failures=failures, processes=1)
+    assert [failure.index for failure in failures] == [1]
+    assert entries[0].get_parsed_address()["city"] == "OMAHA"
+    assert entries[0].get_gift() is None
+    assert (parse_cache.hits, parse_cache.misses) == (4, 3)
+    assert get_default_cache().stats()["misses"] == 3
+
+
+def test_column_role_change_only_recomputes_affected_rows():
+    rows = [row + ["Mixer"] for row in ROWS]
+    parse_cache = ParseCache()
+    parse_cache.parse(rows, COLUMN_MAP + [""], processes=1)
+    assert parse_cache.misses == 3
+
+    entries = parse_cache.parse(rows, COLUMN_MAP + ["Gift"], processes=1)
+    assert parse_cache.misses == 3
+    assert entries[0].get_gift() == "Mixer"
+    assert entries[0].get_parsed_address()["postal_code"] == "68106"
+
+    parse_cache.parse(rows, ["Name", "Address Line 1", "City State Postal Code", "", "", ""],
+                      processes=1)
+    assert parse_cache.misses == 6
+
+
+def test_invalid_column_map():
+    with pytest.raises(InvalidColumnMapError):
+        ParseCache().parse(ROWS, ["Address Line 1"])
@@ -3,10 +3,11 @@ Created by Cameron Rogers
 """
 import pytest
 import csv
-from parser import (parse_data_to_graticard_entry, validate_column_map,
-                    InvalidColumnMapError, ALL_ADDRESS_SETS)
+from pathlib import Path
+from parser import (parse_data_to_graticard_entry, validate_column_map, compile_column_map,
+                    InvalidColumnMapError, RowError, ALL_ADDRESS_SETS)
 
-TEST_FILE = "/Users/rogecame/test_ui/Desirae_Sindelar_list.csv"
+TEST_FILE = Path(__file__).parent.parent / "bin" / "Desirae_Sindelar_list.csv"
 
 
 def test_valid_column_map_name():
@@ -32,3 +33,29 @@ def test_parse_data_to_graticard_entry():
     column_map[0] = "Name"
     entries = parse_data_to_graticard_entry(data, column_map)
     print(len(entries))
+
+
+def test_compile_column_map():
+    column_map = ["", "Gift", "Name", "City", "Name"]
+    assert compile_column_map(column_map) == ((2, "recipient_name"), (3, "city"), (1, "gift"))
+
+
+@pytest.mark.parametrize('column_map', [["", "Name"], ["City", "Name", "", "Gift"], []])
+def test_parse_data_with_compiled_column_map(column_map):
+    data = [["Somewhere", "Jane Doe", "x", "Mixer"], ["Elsewhere", "John Doe", "y", "Bowls"]]
+    entries = parse_data_to_graticard_entry(data, column_map)
+    assert len(entries) == 2
+    if "Name" in column_map:
+        assert [entry.get_recipient_name() for entry in entries] == ["Jane Doe", "John Doe"]
+    if "Gift" in column_map:
+        assert entries[1].get_gift() == "Bowls"
+        assert entries[1].get_city() == "Elsewhere"
+
+
+def test_parse_data_reports_unreadable_rows():
+    data = [["Jane Doe", "Mixer"], "131", ["A"], ["John Doe", "Bowls"]]
+    errors = []
+    entries = parse_data_to_graticard_entry(data, ["Name", "Gift"], errors)
+    assert [entry.get_recipient_name() for entry in entries] == ["Jane Doe", "John Doe"]
+    assert errors == [RowError(1, "131", "Not split into columns"),
+                      RowError(2, ["A"], "Expected 2 columns, found 1")]
@@ -0,0 +1,110 @@
+"""
+Created by Cameron Rogers
+"""
+import csv
+import json
+import docx
+from cli import main
+from pipeline import run_merge
+
+
+def _write_inputs(tmp_path):
+    csv_path = tmp_path / "guests.csv"
+    with open(csv_path, 'w', newline='') as fh:
+        csv.writer(fh).writerows([["Name", "Address"],
+                                  ["Jesse Sindelar", "201 Hudspith St."],
+                                  ["Judd and Bonnie Davis", "4551 Shirley St."]])
+    docx_path = tmp_path / "gifts.docx"
+    document = docx.Document()
+    document.add_paragraph("Jesse Sindelar -- Wall decor")
+    document.add_paragraph("Judd & Bonnie Davis $100")
+    document.save(str(docx_path))
+    return csv_path, docx_path
+
+
+def test_run_merge(tmp_path):
+    csv_path, docx_path = _write_inputs(tmp_path)
+    output_path = tmp_path / "out.csv"
+    assert run_merge(csv_path, docx_path, ["Name"], ["Name", "Gift"], output_path,
+                     csv_skip_rows=1) == 2
+    with open(output_path, 'r', newline='') as fh:
+        rows = list(csv.reader(fh))
+    assert rows[0][0] == "Name"
+    assert rows[1] == ["Jesse Sindelar", "", "", "", "", "", "Wall decor"]
+    assert rows[2][-1] == "$100"
+
+
+def test_run_merge_leaves_other_names_unmatched(tmp_path):
+    csv_path, docx_path = _write_inputs(tmp_path)
+    with open(csv_path, 'a', newline='') as fh:
+        csv.writer(fh).writerows([["Alan Madsen", "5 Main St."], ["Jesse Sindelar", "201 Hudspith St."]])
+    output_path = tmp_path / "out.csv"
+    # Repeated rows are all written without dedup
+    assert run_merge(csv_path, docx_path, ["Name"], ["Name", "Gift"], output_path, csv_skip_rows=1) == 4
+    with open(output_path, 'r', newline='') as fh:
+        gifts = [row[-1] for row in list(csv.reader(fh))[1:]]
+    assert gifts == ["Wall decor", "$100", "", "Wall decor"]
+
+
+def test_cli_skips_unsplit_paragraphs(tmp_path, capsys):
+    csv_path, docx_path = _write_inputs(tmp_path)
+    document = docx.Document(str(docx_path))
+    document.add_paragraph("A")
+    document.add_paragraph("131")
+    document.save(str(docx_path))
+    column_map_path = tmp_path / "map.json"
+    column_map_path.write_text(json.dumps({"csv": ["Name"]}))
+    assert main([str(csv_path), str(docx_path), str(column_map_path), str(tmp_path / "out.csv"),
+                 '--skip-csv-rows', '1', '--no-address-cache']) == 0
+    err = capsys.readouterr().err
+    assert "Skipped docx paragraph 3 (A): Not split into columns" in err
+    assert "Skipped docx paragraph 4 (131)" in err
+
+
+def test_cli_invalid_column_map(tmp_path):
+    csv_path, docx_path = _write_inputs(tmp_path)
+    column_map_path = tmp_path / "map.json"
+    column_map_path.write_text(json.dumps({"csv": ["Address Line 1"]}))
+    assert main([str(csv_path), str(docx_path), str(column_map_path),
+                 str(tmp_path / "out.csv"), '--no-address-cache']) == 1
+
+
+def test_cli_metrics_and_profile(tmp_path):
+    csv_path, docx_path = _write_inputs(tmp_path)
+    column_map_path = tmp_path / "map.json"
+    column_map_path.write_text(json.dumps({"csv": ["Name"]}))
+    metrics_path = tmp_path / "metrics.json"
+    profile_path = tmp_path / "run.prof"
+    assert main([str(csv_path), str(docx_path), str(column_map_path), str(tmp_path / "out.csv"),
+                 '--skip-csv-rows', '1', '--no-address-cache',
+                 '--metrics', str(metrics_path), '--profile', str(profile_path)]) == 0
+    metrics = json.loads(metrics_path.read_text())
+    assert metrics["rows"] == 2
+    assert "merge_stream[guests.csv]" in metrics["timers"]
+    assert metrics["counters"]["merge.exact_matches"] >= 1
+    assert profile_path.exists()
+
+
+def test_cli_inferred_column_map(tmp_path, capsys):
+    csv_path, docx_path = _write_inputs(tmp_path)
+    output_path = tmp_path / "out.csv"
+    assert main([str(csv_path), str(docx_path), str(output_path), '--no-address-cache']) == 0
+    assert "Inferred csv column map: Name" in capsys.readouterr().err
+    with open(output_path, 'r', newline='') as fh:
+        rows = list(csv.reader(fh))
+    # The header row is skipped
+    assert len(rows) == 3
+    assert rows[1][0] == "Jesse Sindelar"
+
+
+def test_cli_dedup(tmp_path, capsys):
+    csv_path, docx_path = _write_inputs(tmp_path)
+    with open(csv_path, 'a', newline='') as fh:
+        csv.writer(fh).writerow(["Jesse  Sindelar", "201 Hudspith Street"])
+    column_map_path = tmp_path / "map.json"
+    column_map_path.write_text(json.dumps({"csv": ["Name"]}))
+    assert main([str(csv_path), str(docx_path), str(column_map_path), str(tmp_path / "out.csv"),
+                 '--skip-csv-rows', '1', '--no-address-cache', '--dedup']) == 0
+    captured = capsys.readouterr()
+    assert "Wrote 2 entries" in captured.out
+    assert "Row 1 (Jesse Sindelar) duplicated by row 3" in captured.err
@@ -0,0 +1,141 @@
+"""
+Created by Cameron Rogers
+"""
+import csv
+import json
+import threading
+import time
+import urllib.error
+import urllib.request
+import docx
+import pytest
+from service import DONE, FAILED, TOKEN_HEADER, InvalidJobError, JobQueue, MergeService, QueueFullError
+
+
+def _write_inputs(tmp_path):
+    csv_path = tmp_path / "guests.csv"
+    with open(csv_path, 'w', newline='') as fh:
+        csv.writer(fh).writerows([["Name", "Address"],
+                                  ["Jesse Sindelar", "201 Hudspith St."],
+                                  ["Judd and Bonnie Davis", "4551 Shirley St."],
+                                  ["Jesse Sindelar", "201 Hudspith Street"]])
+    docx_path = tmp_path / "gifts.docx"
+    document = docx.Document()
+    document.add_paragraph("Jesse Sindelar -- Wall decor")
+    document.add_paragraph("Judd & Bonnie Davis $100")
+    document.save(str(docx_path))
+    return {"csv": str(csv_path), "docx": str(docx_path)}
+
+
+@pytest.fixture
+def job_queue(tmp_path):
+    with JobQueue(tmp_path / "jobs", workers=2) as queue:
+        yield queue
+
+
+def test_job_queue(tmp_path, job_queue):
+    request = dict(_write_inputs(tmp_path), column_maps={"csv": ["Name"]}, skip_csv_rows=1, dedup=True)
+    jobs = [job_queue.submit(request) for _ in range(3)]
+    for job in jobs:
+        assert job_queue.wait(job.id, timeout=60).get_status() == DONE
+    result = jobs[0].to_json()
+    assert result["entries"] == 2
+    assert result["duplicates"] == ["Row 1 (Jesse Sindelar) duplicated by row 3 (Jesse Sindelar)"]
+    with open(jobs[0].output_path, 'r', newline='') as fh:
+        rows = list(csv.reader(fh))
+    assert rows[1][0] == "Jesse Sindelar" and rows[1][-1] == "Wall decor"
+    assert len(job_queue.jobs()) == 3
+
+
+def test_job_queue_inferred_column_map(tmp_path, job_queue):
+    job = job_queue.wait(job_queue.submit(_write_inputs(tmp_path)).id, timeout=60)
+    result = job.to_json()
+    assert result["status"] == DONE
+    assert result["column_map"][0] == "Name"
+    # The header row is skipped, without dedup every guest row is written
+    assert result["entries"] == 3
+
+
+def test_job_failure(tmp_path, job_queue):
+    request = _write_inputs(tmp_path)
+    request["docx"] = request["csv"]
+    job = job_queue.wait(job_queue.submit(request).id, timeout=60)
+    assert job.get_status() == FAILED
+    assert job.to_json()["error"]
+
+
+def test_invalid_jobs(tmp_path, job_queue):
+    request = _write_inputs(tmp_path)
+    with pytest.raises(InvalidJobError):
+        job_queue.submit(dict(request, csv=str(tmp_path / "missing.csv")))
+    with pytest.raises(InvalidJobError):
+        job_queue.submit(dict(request, column_maps={"csv": ["Address Line 1"]}))
+    with pytest.raises(InvalidJobError):
+        job_queue.submit(dict(request, format="xml"))
+    with pytest.raises(InvalidJobError):
+        job_queue.submit([request])
+
+
+def test_queue_full(tmp_path):
+    request = dict(_write_inputs(tmp_path), column_maps={"csv": ["Name"]})
+    with JobQueue(tmp_path / "jobs", workers=1, max_pending=0) as queue:
+        queue.submit(request)
+        with pytest.raises(QueueFullError):
+            queue.submit(request)
+
+
+def _call(url, method="GET", body=None, headers=None):
+    data = None if body is None else json.dumps(body).encode('utf-8')
+    request = urllib.request.Request(url, data=data, method=method, headers=headers or {})
+    try:
+        with urllib.request.urlopen(request, timeout=30) as response:
+            return response.status, response.read()
+    except urllib.error.HTTPError as err:
+        return err.code, err.read()
+
+
+@pytest.fixture
+def service(job_queue):
+    service = MergeService(job_queue, port=0)
+    thread = threading.Thread(target=service.serve_forever, daemon=True)
+    thread.start()
+    try:
+        yield service
+    finally:
+        service.shutdown()
+        service.server_close()
+
+
+def test_service(tmp_path, service):
+    headers = {TOKEN_HEADER: service.token, "Content-Type": "application/json"}
+    request = dict(_write_inputs(tmp_path), column_maps={"csv": ["Name"]}, skip_csv_rows=1, format="jsonl")
+    status, body = _call(service.url + "/jobs", "POST", request, headers)
+    assert status == 202
+    job_id = json.loads(body)["id"]
+
+    deadline = time.time() + 60
+    while json.loads(_call(service.url + "/jobs/" + job_id, headers=headers)[1])["status"] != DONE:
+        assert time.time() < deadline
+        time.sleep(0.05)
+    status, body = _call(service.url + "/jobs/" + job_id + "/result", headers=headers)
+    assert status == 200
+    assert json.loads(body.splitlines()[0])["gift"] == "Wall decor"
+    assert [job["id"] for job in json.loads(_call(service.url + "/jobs", headers=headers)[1])] == [job_id]
+
+    assert _call(service.url + "/jobs/unknown", headers=headers)[0] == 404
+    assert _call(service.url + "/jobs", "POST", {"csv": "missing.csv"}, headers)[0] == 400
+    assert _call(service.url + "/jobs/" + job_id, "DELETE", headers=headers)[0] == 409
+    assert _call(service.url + "/jobs/" + job_id + "/result", "DELETE", headers=headers)[0] == 405
+
+
+def test_service_rejects_cross_site_requests(tmp_path, service):
+    request = dict(_write_inputs(tmp_path), column_maps={"csv": ["Name"]})
+    headers = {TOKEN_HEADER: service.token, "Content-Type": "application/json"}
+    assert _call(service.url + "/jobs")[0] == 401
+    assert _call(service.url + "/jobs", headers={TOKEN_HEADER: "guess"})[0] == 401
+    # A rebound DNS name reaches the loopback interface with a foreign Host
+    assert _call(service.url + "/jobs", headers=dict(headers, Host="attacker.example"))[0] == 403
+    text_headers = dict(headers, **{"Content-Type": "text/plain"})
+    assert _call(service.url + "/jobs", "POST", request, text_headers)[0] == 415
+    assert _call(service.url + "/jobs", headers=headers)[0] == 200
+    assert service.job_queue.jobs() == []
@@ -0,0 +1,67 @@
+"""
+Created by Cameron Rogers
+"""
+from graticard_entry import GratiCardEntry
+from session_store import FileState, SessionStore, file_content_hash
+
+PARSED_ADDRESS = {"address_line_1": "201 HUDSPITH ST", "address_line_2": None,
+                  "city": "OMAHA", "state": "NE", "postal_code": "68106"}
+
+
+def _entries():
+    entry = GratiCardEntry()
+    entry.set_entry(recipient_name="Jesse Sindelar", full_street_address="201 Hudspith St.",
+                    city_state_zip="Omaha NE 68106", gift="Wall decor")
+    entry.set_parsed_address(PARSED_ADDRESS, ("full_street_address", "city_state_zip"))
+    return [entry, GratiCardEntry()]
+
+
+def _state(content_hash="abc", status="Complete", file_path="/tmp/guests.csv"):
+    return FileState(file_path, content_hash, status, ["Name", "Street Address", "City State Postal Code"],
+                     [3, 1], _entries())
+
+
+def test_file_content_hash(tmp_path):
+    first = tmp_path / "a.csv"
+    first.write_text("Name\nJesse Sindelar\n")
+    second = tmp_path / "b.csv"
+    second.write_text("Name\nJesse Sindelar\n")
+    assert file_content_hash(first) == file_content_hash(second)
+    second.write_text("Name\nJudd Davis\n")
+    assert file_content_hash(first) != file_content_hash(second)
+
+
+def test_save_and_load_file_state(tmp_path):
+    with SessionStore(tmp_path / "states.sqlite3") as store:
+        assert store.load_file_state("abc") is None
+        store.save_file_state(_state())
+    with SessionStore(tmp_path / "states.sqlite3") as store:
+        state = store.load_file_state("abc")
+    assert state.status == "Complete"
+    assert state.column_map == ["Name", "Street Address", "City State Postal Code"]
+    assert state.removed_row_ids == [1, 3]
+    entry = state.entries[0]
+    assert entry.get_recipient_name() == "Jesse Sindelar"
+    assert entry.get_gift() == "Wall decor"
+    assert entry.get_parsed_address() == PARSED_ADDRESS
+    assert entry.get_parsed_address_source() == ("full_street_address", "city_state_zip")
+    assert state.entries[1].get_recipient_name() is None
+
+
+def test_session(tmp_path):
+    with SessionStore(tmp_path / "session.gcsession") as store:
+        store.save_session([_state("abc", file_path="/tmp/guests.csv"),
+                            _state("def", "Pending", "/tmp/gifts.docx")])
+        store.save_session([_state("def", "Pending", "/tmp/gifts.docx")])
+        assert store.load_session() == [("/tmp/gifts.docx", "def")]
+        assert store.load_file_state("def").status == "Pending"
+
+
+def test_eviction_keeps_session_files(tmp_path):
+    with SessionStore(tmp_path / "states.sqlite3", max_file_states=1) as store:
+        store.save_session([_state("abc")])
+        store.save_file_state(_state("def"))
+        store.save_file_state(_state("ghi"))
+        assert store.load_file_state("abc") is not None
+        assert store.load_file_state("def") is None
+        assert store.load_file_state("ghi") is not None
@@ -0,0 +1,80 @@
+"""
+Created by Cameron Rogers
+"""
+import itertools
+import random
+import pytest
+from similarity import (assign_one_to_one, default_backend, greedy, hungarian, python_score_edges,
+                        score_edges)
+
+GUESTS = ["Jonn Davis", "Jon Davi", "Bonny Davis", "Alan Madsen"]
+GIFTS = ["Jon Davis", "Bonnie Davis", "Bonny Davies"]
+
+
+def _best_total(scores):
+    rows, columns = len(scores), len(scores[0])
+    if rows <= columns:
+        return max(sum(scores[row][column] for row, column in enumerate(permutation))
+                   for permutation in itertools.permutations(range(columns), rows))
+    return max(sum(scores[row][column] for column, row in enumerate(permutation))
+               for permutation in itertools.permutations(range(rows), columns))
+
+
+def test_hungarian_is_optimal():
+    rng = random.Random(0)
+    for _ in range(200):
+        scores = [[rng.randint(0, 100) for _ in range(rng.randint(1, 5))]]
+        scores += [[rng.randint(0, 100) for _ in scores[0]] for _ in range(rng.randint(0, 4))]
+        assigned = hungarian(scores)
+        used = [column for column in assigned if column is not None]
+        assert len(used) == len(set(used)) == min(len(scores), len(scores[0]))
+        total = sum(scores[row][column] for row, column in enumerate(assigned) if column is not None)
+        assert total == _best_total(scores)
+
+
+def test_hungarian_beats_greedy():
+    # Greedy would give column 0 to row 0 and leave row 1 with 10
+    assert hungarian([[95, 90], [94, 10]]) == [1, 0]
+
+
+def test_python_score_edges():
+    edges = python_score_edges(GUESTS, GIFTS, score_cutoff=80)
+    assert (0, 0, 95) in edges
+    assert (1, 0, 94) in edges
+    assert not [edge for edge in edges if edge[0] == 3]
+    assert all(score > 80 for _, _, score in edges)
+
+
+def test_python_score_edges_workers():
+    guests = GUESTS * 200
+    assert sorted(python_score_edges(guests, GIFTS, workers=2)) == sorted(python_score_edges(guests, GIFTS))
+
+
+def test_score_edges_unknown_backend():
+    with pytest.raises(ValueError):
+        score_edges(GUESTS, GIFTS, backend="unknown")
+
+
+def test_rapidfuzz_score_edges():
+    pytest.importorskip("numpy")
+    pytest.importorskip("rapidfuzz")
+    assert default_backend() == "rapidfuzz"
+    rapidfuzz_pairs = {(row, column) for row, column, _ in score_edges(GUESTS, GIFTS, backend="rapidfuzz")}
+    python_pairs = {(row, column) for row, column, _ in score_edges(GUESTS, GIFTS, backend="python")}
+    assert (0, 0) in rapidfuzz_pairs and (0, 0) in python_pairs
+
+
+def test_assign_one_to_one():
+    edges = [(0, 0, 95), (1, 0, 94), (2, 1, 87), (2, 2, 96), (3, 5, 90)]
+    assert assign_one_to_one(edges) == {0: (0, 95), 2: (2, 96), 3: (5, 90)}
+    assert assign_one_to_one([]) == {}
+
+
+def test_greedy():
+    assert greedy([[95, 90], [94, 10]]) == [0, 1]
+    assert greedy([[0, 0], [0, 50]]) == [None, 1]
+
+
+def test_assign_one_to_one_keeps_best_edges_per_query():
+    edges = [(0, column, 90 - column) for column in range(10)]
+    assert assign_one_to_one(edges, max_edges_per_query=1) == {0: (0, 90)}
@@ -0,0 +1,49 @@
+"""
+Created by Cameron Rogers
+"""
+import random
+from benchmark import STAGES, STARTUP_STAGES, compare, measure_startup, run_benchmarks
+from file_loaders import load_csv_rows, load_docx_rows
+from synthetic_data import GUEST_HEADER, add_typo, generate_gifts, generate_guests, write_dataset
+
+
+def test_generate_guests_unique_and_seeded():
+    guests = generate_guests(100, seed=1)
+    assert len({guest[0] for guest in guests}) == 100
+    assert guests == generate_guests(100, seed=1)
+    assert all(len(guest) == len(GUEST_HEADER) for guest in guests)
+
+
+def test_add_typo_changes_name():
+    rng = random.Random(0)
+    for _ in range(20):
+        typo = add_typo("Jesse Sindelar", rng)
+        assert abs(len(typo) - len("Jesse Sindelar")) <= 1
+
+
+def test_generate_gifts_typo_rate():
+    guests = generate_guests(50)
+    assert [name for name, _ in generate_gifts(guests, typo_rate=0)] == [guest[0] for guest in guests]
+    assert [name for name, _ in generate_gifts(guests, typo_rate=1)] != [guest[0] for guest in guests]
+
+
+def test_write_dataset_round_trip(tmp_path):
+    csv_path, docx_path = write_dataset(tmp_path, 20, typo_rate=0)
+    csv_rows = load_csv_rows(csv_path)
+    assert csv_rows[0] == GUEST_HEADER
+    docx_rows = load_docx_rows(docx_path)
+    assert [row[0] for row in docx_rows] == [row[0] for row in csv_rows[1:]]
+
+
+def test_run_benchmarks_and_compare():
+    results = run_benchmarks([20], repeat=1, startup=False)
+    assert set(results["results"]["20"]) == set(STAGES)
+    rows, regressions = compare(results, results)
+    assert len(rows) == len(STAGES)
+    assert regressions == []
+
+
+def test_measure_startup():
+    timings = measure_startup(repeat=1)
+    assert set(timings) == set(STARTUP_STAGES)
+    assert 0 < timings["import"] <= timings["window"] <= timings["process"]
@@ -0,0 +1,25 @@
+"""
+Created by Cameron Rogers
+"""
+from table_model import RowTableModel
+
+ROWS = [["Jane Doe", "Omaha"], ["John Doe"], ["Bob Dahlheim", "North Bend"], ["Ann Lee", "Ames"]]
+
+
+def test_data():
+    model = RowTableModel([list(row) for row in ROWS], 2)
+    assert model.rowCount() == 5
+    assert model.columnCount() == 2
+    assert model.data(model.index(0, 0)) is None
+    assert model.data(model.index(1, 1)) == "Omaha"
+    assert model.data(model.index(2, 1)) is None
+
+
+def test_remove_rows_shares_data():
+    rows = [list(row) for row in ROWS]
+    model = RowTableModel(rows, 2)
+    assert not model.removeRows(0, 1)
+    assert model.removeRows(2, 2)
+    assert rows == [ROWS[0], ROWS[3]]
+    assert model.rowCount() == 3
+    assert model.data(model.index(2, 0)) == "Ann Lee"
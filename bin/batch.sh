@@ -0,0 +1,3 @@
+source ../../bin/activate
+python ../app/cli.py "$@"
+deactivate
@@ -0,0 +1,3 @@
+source ../../bin/activate
+pyside2-uic ../ui/mainwindow.ui > ../app/ui_mainwindow.py
+deactivate